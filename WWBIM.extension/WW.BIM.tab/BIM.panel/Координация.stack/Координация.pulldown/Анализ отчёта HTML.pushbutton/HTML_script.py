@@ -9,6 +9,9 @@ import json
 import datetime
 import xml.etree.ElementTree as ET
 
+import clash_xmlreader
+from clash_history import collect_history
+
 # pyRevit
 try:
     from pyrevit import forms, script
@@ -60,10 +63,10 @@ def normalize_floor(raw):
     if u'кровл' in s_low: return u'Кровля'
     if u'подвал' in s_low or u'цок' in s_low: return u'Подвал'
     if s_low.startswith(u'отм'): return u'0 этаж'
-    m = re.search(ur'[_\s\-]0*([0-9]{1,3})[_\s\-]*этаж', s_low)
+    m = re.search(r'[_\s\-]0*([0-9]{1,3})[_\s\-]*этаж', s_low)
     if m:
         n=int(m.group(1)); return u'%d этаж'%n if n<=150 else u'Нет уровня'
-    m = re.search(ur'этаж[_\s\-]*0*([0-9]{1,3})', s_low)
+    m = re.search(r'этаж[_\s\-]*0*([0-9]{1,3})', s_low)
     if m:
         n=int(m.group(1)); return u'%d этаж'%n if n<=150 else u'Нет уровня'
     return s
@@ -132,7 +135,7 @@ def _iter_nodes_texts_et(pl_elem):
     return out
 
 def _token_is_filename(t):
-    m = re.search(ur'([^\s\\/<>"]+\.(?:nwc|nwd|nwf|rvt))', t, re.I|re.U)
+    m = re.search(r'([^\s\\/<>"]+\.(?:nwc|nwd|nwf|rvt))', t, re.I|re.U)
     return m.group(1) if m else None
 
 def _extract_from_path_nodes(nodes):
@@ -154,7 +157,7 @@ def _extract_from_path_nodes(nodes):
     if fi >= 0:
         for j in range(fi+1, len(nodes)):
             tj = nodes[j]
-            if re.search(ur'(этаж|отм\.?|уров)', tj, re.I|re.U):
+            if re.search(r'(этаж|отм\.?|уров)', tj, re.I|re.U):
                 floor = normalize_floor(tj); floor_idx = j; break
         if floor_idx is None and len(nodes) > fi+1:
             floor = normalize_floor(nodes[fi+1]); floor_idx = fi+1
@@ -179,98 +182,54 @@ def _find_object_id_et(parent):
     return None
 
 # -----------------------------
-# .NET (XDocument) helpers
+# System.Xml.XmlReader (clash_xmlreader)
 # -----------------------------
-def dn_first_child_local(el, local):
-    try:
-        for ch in el.Elements():
-            if ch.Name.LocalName == local:
-                return ch
-    except Exception:
-        pass
-    return None
-
-def dn_text_of(el):
-    if el is None: return u''
-    buf = []
-    try:
-        for nd in el.DescendantNodesAndSelf():
-            nname = nd.GetType().Name
-            if nname in ('XText','XCData'):
-                buf.append(nd.Value)
-    except Exception:
-        try:
-            v = getattr(el, 'Value', None)
-            if v:
-                buf.append(v)
-        except Exception:
-            pass
-    return u''.join(buf)
-
-def _iter_nodes_texts_dn(pl_elem):
-    out = []
-    try:
-        for n in pl_elem.Descendants():
-            try:
-                if n.Name.LocalName != 'node':
-                    continue
-                t = (dn_text_of(n) or u'').strip()
-                if t:
-                    out.append(t)
-            except Exception:
-                continue
-    except Exception:
-        pass
-    return out
-
-def _extract_from_pathlink_dn(pl_elem):
-    nodes = _iter_nodes_texts_dn(pl_elem)
-    return _extract_from_path_nodes(nodes)
-
-def dn_find_object_id(parent):
-    try:
-        for st in parent.Descendants():
-            try:
-                if st.Name.LocalName != 'smarttag':
-                    continue
-                nm = dn_first_child_local(st, 'name')
-                if nm is None:
-                    continue
-                ntext = (dn_text_of(nm) or u'').strip().lower()
-                if ntext in (u'объект id', u'object id'):
-                    val = dn_first_child_local(st, 'value')
-                    if val is not None:
-                        v = (dn_text_of(val) or u'').strip()
-                        if v:
-                            return v
-            except Exception:
-                continue
-    except Exception:
-        pass
-    try:
-        for el in parent.Descendants():
-            try:
-                if el.Name.LocalName not in ('property','objectattribute'):
-                    continue
-                nm = dn_first_child_local(el, 'name')
-                if nm is None:
-                    continue
-                ntext = (dn_text_of(nm) or u'').strip().lower()
-                if ntext in (u'объект id', u'object id', u'id объекта', u'ид объекта', u'id обьекта'):
-                    val = dn_first_child_local(el, 'value')
-                    if val is not None:
-                        v = (dn_text_of(val) or u'').strip()
-                        if v:
-                            return v
-            except Exception:
-                continue
-    except Exception:
-        pass
+_SMARTTAG_ID_NAMES = (u'объект id', u'object id')
+_PROPERTY_ID_NAMES = (u'объект id', u'object id', u'id объекта', u'ид объекта', u'id обьекта')
+
+def _record_object_id(obj):
+    for kind, name, value in obj.properties:
+        names = _SMARTTAG_ID_NAMES if kind == 'smarttag' else _PROPERTY_ID_NAMES
+        if (name or u'').strip().lower() in names and (value or u'').strip():
+            return value.strip()
     return None
 
 # -----------------------------
 # Парсинг XML
 # -----------------------------
+def _make_row(testname, cname, href, status, n1, n2, ida, idb):
+    t1 = u'\n'.join(n1); t2 = u'\n'.join(n2)
+    sig = u'||'.join(sorted([t1, t2]))
+    idsig = u'||'.join(sorted([ida, idb])) if (ida and idb) else u''
+
+    f1, fl1, cat1 = _extract_from_path_nodes(n1)
+    f2, fl2, cat2 = _extract_from_path_nodes(n2)
+    sec1 = section_from_filename(f1)
+    sec2 = section_from_filename(f2)
+    paircats = u' — '.join(sorted([cat1 or u'', cat2 or u''])).strip(' — ')
+
+    return {'status':status, 'fileA':f1,'fileB':f2,
+            'sectionA':sec1,'sectionB':sec2,'floorA':fl1,'floorB':fl2,
+            'paircats':paircats, 'sig':sig, 't1':t1, 't2':t2, 'cname':cname, 'ida':ida, 'idb':idb, 'idsig':idsig,
+            'catA':cat1, 'catB':cat2, 'testname': testname, 'href': href}
+
+def _parse_with_xmlreader(xml_path):
+    """Один проход System.Xml.XmlReader по файлу, без чтения текста в Python."""
+    def consume(events):
+        results = []
+        for kind, cr in events:
+            if kind != 'result' or cr.test_name is None or len(cr.objects) < 2:
+                continue
+            status = map_status((cr.get('status') or u'').strip(), cr.result_status)
+            cname = (cr.get('name') or u'')
+            href = (cr.get('href') or u'').replace('\\', '/')
+            o1, o2 = cr.objects[0], cr.objects[1]
+            results.append(_make_row(cr.test_name, cname, href, status,
+                                     o1.nodes, o2.nodes,
+                                     _record_object_id(o1) or u'', _record_object_id(o2) or u''))
+        return results
+    return clash_xmlreader.read_clash_report(xml_path, consume)
+
 def _parse_with_elementtree(xml_text):
     root = ET.fromstring(xml_text)
     results = []
@@ -300,115 +259,27 @@ def _parse_with_elementtree(xml_text):
             pl2 = _first_child_by_localname(cobjs[1], 'pathlink')
             n1 = _iter_nodes_texts_et(pl1)
             n2 = _iter_nodes_texts_et(pl2)
-            t1 = u'\n'.join(n1); t2 = u'\n'.join(n2)
-            sig = u'||'.join(sorted([t1, t2]))
             ida = _find_object_id_et(cobjs[0]) or u''
             idb = _find_object_id_et(cobjs[1]) or u''
-            idsig = u'||'.join(sorted([ida, idb])) if (ida and idb) else u''
-
-            f1, fl1, cat1 = _extract_from_path_nodes(n1)
-            f2, fl2, cat2 = _extract_from_path_nodes(n2)
-            sec1 = section_from_filename(f1)
-            sec2 = section_from_filename(f2)
-            paircats = u' — '.join(sorted([cat1 or u'', cat2 or u''])).strip(' — ')
-
-            results.append({'status':status, 'fileA':f1,'fileB':f2,
-                            'sectionA':sec1,'sectionB':sec2,'floorA':fl1,'floorB':fl2,
-                            'paircats':paircats, 'sig':sig, 't1':t1, 't2':t2, 'cname':cname, 'ida':ida, 'idb':idb, 'idsig':idsig,
-                            'catA':cat1, 'catB':cat2, 'testname': testname, 'href': href})
+            results.append(_make_row(testname, cname, href, status, n1, n2, ida, idb))
     return results
 
-def _parse_with_dotnet(xml_text):
-    import clr
-    clr.AddReference('System')
-    clr.AddReference('System.Xml')
-    clr.AddReference('System.Xml.Linq')
-    from System.IO import StringReader
-    from System.Xml import XmlReader, XmlReaderSettings, DtdProcessing
-    from System.Xml.Linq import XDocument
-
-    settings = XmlReaderSettings()
-    settings.CheckCharacters = False
-    settings.DtdProcessing = DtdProcessing.Ignore
-
-    reader = XmlReader.Create(StringReader(xml_text), settings)
-    xdoc = XDocument.Load(reader)
-
-    def descendants_by_local(el, local):
-        for d in el.Descendants():
-            try:
-                if d.Name.LocalName == local:
-                    yield d
-            except Exception:
-                pass
-
-    results=[]
-    root = xdoc.Root
-    for ct in descendants_by_local(root, 'clashtest'):
+def parse_xml(xml_path):
+    # В Revit быстрее всего потоковый XmlReader без предварительной очистки
+    if clash_xmlreader.AVAILABLE:
         try:
-            testname = (ct.Attribute('name').Value if ct.Attribute('name') is not None else u'')
+            rows = _parse_with_xmlreader(xml_path)
+            if rows:
+                return rows
         except Exception:
-            testname = u''
-        for cr in descendants_by_local(ct, 'clashresult'):
-            try:
-                st_attr = (cr.Attribute('status').Value if cr.Attribute('status') is not None else u'')
-            except Exception:
-                st_attr = u''
-            rs = dn_first_child_local(cr,'resultstatus')
-            st_text = dn_text_of(rs) if rs is not None else u''
-            status = map_status(st_attr, st_text)
-            try:
-                cname = (cr.Attribute('name').Value if cr.Attribute('name') is not None else u'')
-            except Exception:
-                cname = u''
-            try:
-                href = (cr.Attribute('href').Value if cr.Attribute('href') is not None else u'')
-            except Exception:
-                href = u''
-            href = href.replace('\\', '/')
-
-            objs = dn_first_child_local(cr, 'clashobjects')
-            if objs is None:
-                continue
-            cobjs = [c for c in objs.Elements() if c.Name.LocalName=='clashobject']
-            if len(cobjs) < 2:
-                continue
-
-            pl1 = dn_first_child_local(cobjs[0], 'pathlink')
-            pl2 = dn_first_child_local(cobjs[1], 'pathlink')
-            n1 = _iter_nodes_texts_dn(pl1)
-            n2 = _iter_nodes_texts_dn(pl2)
-            t1 = u'\n'.join(n1); t2 = u'\n'.join(n2)
-            sig = u'||'.join(sorted([t1, t2]))
-            ida = dn_find_object_id(cobjs[0]) or u''
-            idb = dn_find_object_id(cobjs[1]) or u''
-            idsig = u'||'.join(sorted([ida, idb])) if (ida and idb) else u''
-
-            f1, fl1, cat1 = _extract_from_path_nodes(n1)
-            f2, fl2, cat2 = _extract_from_path_nodes(n2)
-            sec1 = section_from_filename(f1)
-            sec2 = section_from_filename(f2)
-            paircats = u' — '.join(sorted([cat1 or u'', cat2 or u''])).strip(' — ')
-
-            results.append({'status':status,'fileA':f1,'fileB':f2,
-                            'sectionA':sec1,'sectionB':sec2,'floorA':fl1,'floorB':fl2,
-                            'paircats':paircats, 'sig':sig, 't1':t1, 't2':t2, 'cname':cname, 'ida':ida, 'idb':idb, 'idsig':idsig,
-                            'catA':cat1, 'catB':cat2, 'testname': testname, 'href': href})
-    return results
-
-def parse_xml(xml_path):
+            pass
+    # XmlReader сам повторяет чтение из очищенного текста; здесь — вне
+    # Revit или если он не нашёл строк
     xml_text = _load_and_sanitize_xml_text(xml_path)
     try:
-        rows = _parse_with_elementtree(xml_text)
-        if rows:
-            return rows
-    except Exception:
-        pass
-    try:
-        rows = _parse_with_dotnet(xml_text)
-        return rows
-    except Exception as ex2:
-        raise Exception(u'Ошибка разбора даже через .NET XmlReader: {0}'.format(ex2))
+        return _parse_with_elementtree(xml_text)
+    except Exception as ex:
+        raise Exception(u'Ошибка разбора XML: {0}'.format(ex))
 
 
 # -----------------------------
@@ -485,7 +356,7 @@ def _ask_since_select(ref_dt):
 # Поиск исторических отчётов (берём максимум 5 последних <= основному)
 # -----------------------------
 
-def _dedup_rows(rows):
+def dedup_rows(rows):
     order = {u'Создать':5, u'Активные':4, u'Подтвержденные':3, u'Проверенные':2, u'Исправленные':1}
     def sort_key(r):
         return (-order.get(r.get('status', u''), 0),
@@ -503,7 +374,30 @@ def _dedup_rows(rows):
             unique.append(r)
     return unique
 
-def find_history_reports(main_xml_path, limit=5, since_dt=None):
+def summarize_rows(rows):
+    """Сводка отчёта для Динамики: итого, статусы и разделы."""
+    unique_rows = dedup_rows(rows)
+    status_counts = {}
+    section_counts = {}
+    for r in unique_rows:
+        st = r.get('status', u'Создать')
+        status_counts[st] = status_counts.get(st, 0) + 1
+        secA = r.get('sectionA', u'Прочее')
+        secB = r.get('sectionB', u'Прочее')
+        if secA:
+            section_counts[secA] = section_counts.get(secA, 0) + 1
+        if secB and secB != secA:
+            section_counts[secB] = section_counts.get(secB, 0) + 1
+    return {'total': len(unique_rows),
+            'statusCounts': status_counts,
+            'sectionCounts': section_counts}
+
+def find_history_reports(main_xml_path, limit=5, since_dt=None, main_rows=None):
+    """Сводки одноимённых отчётов из соседних папок (из журнала истории).
+
+    Старые XML разбираются только при первом появлении или изменении;
+    main_rows — уже разобранные строки текущего отчёта.
+    """
     main_xml_path = os.path.abspath(main_xml_path)
     main_name = os.path.basename(main_xml_path)
     current_dir = os.path.dirname(main_xml_path)            # ...\YYYY.MM.DD
@@ -516,17 +410,17 @@ def find_history_reports(main_xml_path, limit=5, since_dt=None):
     except Exception:
         main_mtime = None
 
+    known = {}
+    if main_rows is not None:
+        known[main_xml_path] = summarize_rows(main_rows)
+    reports = collect_history(base_dir, main_name,
+                              lambda p: summarize_rows(parse_xml(p)),
+                              known)
+
     hits = []
-    for root, dirs, files in os.walk(base_dir):
-        for f in files:
-            if f.lower() == main_name.lower():
-                p = os.path.join(root, f)
-                try:
-                    mtime = os.path.getmtime(p)
-                except Exception:
-                    continue
-                if (main_mtime is None) or (mtime <= main_mtime):
-                    hits.append((p, mtime))
+    for p, mtime, summary in reports:
+        if (main_mtime is None) or (mtime <= main_mtime):
+            hits.append((p, mtime, summary))
 
     if since_dt is not None and main_mtime is not None:
         try:
@@ -540,7 +434,7 @@ def find_history_reports(main_xml_path, limit=5, since_dt=None):
                     return (dt >= since_dt and dt <= main_dt)
                 except Exception:
                     return False
-            hits = [(p, mt) for (p, mt) in hits if _in_range(mt)]
+            hits = [h for h in hits if _in_range(h[1])]
     else:
         hits.sort(key=lambda x: x[1])
         if len(hits) > limit:
@@ -549,33 +443,18 @@ def find_history_reports(main_xml_path, limit=5, since_dt=None):
     hits.sort(key=lambda x: x[1])
 
     history = []
-    for p, mt in hits:
+    for p, mt, summary in hits:
         try:
-            rows = parse_xml(p)
             ts = datetime.datetime.fromtimestamp(mt).strftime('%Y-%m-%d %H:%M')
-            unique_rows = _dedup_rows(rows)
-            status_counts = {}
-            section_counts = {}
-            total = len(unique_rows)
-            for r in unique_rows:
-                st = r.get('status', u'Создать')
-                status_counts[st] = status_counts.get(st, 0) + 1
-                secA = r.get('sectionA', u'Прочее')
-                secB = r.get('sectionB', u'Прочее')
-                if secA:
-                    section_counts[secA] = section_counts.get(secA, 0) + 1
-                if secB and secB != secA:
-                    section_counts[secB] = section_counts.get(secB, 0) + 1
-            
-            history.append({
-                'path': p, 
-                'ts': ts, 
-                'total': total,
-                'statusCounts': status_counts,
-                'sectionCounts': section_counts
-            })
         except Exception:
             continue
+        history.append({
+            'path': p,
+            'ts': ts,
+            'total': summary.get('total', 0),
+            'statusCounts': summary.get('statusCounts') or {},
+            'sectionCounts': summary.get('sectionCounts') or {}
+        })
     return history
 
 # -----------------------------
@@ -649,6 +528,7 @@ HTML_TEMPLATE = u"""<!doctype html>
     background:#111827;
     color:#fff;              /* ← белый и при наведении */
   }
+  .pager{display:flex;align-items:center;gap:8px;padding:10px 0;}
   .preview{max-width:180px;max-height:120px;border:1px solid #1f2937;border-radius:6px;display:block}
 </style>
 </head>
@@ -765,19 +645,46 @@ HTML_TEMPLATE = u"""<!doctype html>
             <tbody id="clashTableBody"></tbody>
           </table>
         </div>
+        <div class="pager">
+          <button class="btn" onclick="setPage(0)">«</button>
+          <button class="btn" onclick="pageBy(-1)">‹</button>
+          <span id="pageInfo" class="muted"></span>
+          <button class="btn" onclick="pageBy(1)">›</button>
+          <button class="btn" onclick="setPage(1e9)">»</button>
+        </div>
       </div>
     </div>
   </div>
   <div id="toastCopy" class="toastcopy">Скопировано</div>
-<script>
-var DATA = {rows: %ROWS%, statusColors: %SCOLORS%, history: %HISTORY%};
-</script>
+<script type="application/json" id="clashData">%DATA%</script>
 <script src="https://cdn.jsdelivr.net/npm/echarts@5.5.0/dist/echarts.min.js"></script>
 
 <script>
 (function(){
-  var rows = (DATA && DATA.rows) ? DATA.rows : [];
+  var DATA = JSON.parse(document.getElementById('clashData').textContent || '{}');
+  var rows = (DATA && DATA.rows) ? decodeRows(DATA.rows) : [];
   var HISTORY = (DATA && DATA.history) ? DATA.history : [];
+  var PAGE_SIZE = 200;
+
+  // Колонки со словарями -> объекты строк; sig, idsig и paircats
+  // вычисляются так же, как в Python (_make_row)
+  function decodeRows(p){
+    var n = p.n || 0, cols = p.cols || {}, enc = p.enc || {}, dicts = p.dicts || {};
+    var names = Object.keys(cols);
+    var out = new Array(n);
+    for(var i=0;i<n;i++){ out[i] = {}; }
+    names.forEach(function(col){
+      var data = cols[col], dict = enc[col] ? dicts[enc[col]] : null;
+      for(var i=0;i<n;i++){ out[i][col] = dict ? dict[data[i]] : data[i]; }
+    });
+    for(var j=0;j<n;j++){
+      var r = out[j];
+      r.sig = [r.t1||'', r.t2||''].sort().join('||');
+      r.idsig = (r.ida && r.idb) ? [r.ida, r.idb].sort().join('||') : '';
+      r.paircats = [r.catA||'', r.catB||''].sort().join(' — ').replace(/^[ —]+|[ —]+$/g, '');
+    }
+    return out;
+  }
 
   function uniq(arr){ return Array.from(new Set(arr)); }
   function by(k){ return function(a,b){ return a[k] > b[k] ? -1 : a[k] < b[k] ? 1 : 0; }; }
@@ -947,6 +854,7 @@ var DATA = {rows: %ROWS%, statusColors: %SCOLORS%, history: %HISTORY%};
     if(SORT_KEY===key){ SORT_ASC = !SORT_ASC; } else { SORT_KEY = key; SORT_ASC = true; }
     updateSortIcons();
     renderTable();
+    var wrap = document.querySelector('#tablePane .scroll'); if(wrap) wrap.scrollTop = 0;
   }
   function sortProjected(arr){
     if(!SORT_KEY) return arr;
@@ -972,20 +880,49 @@ var DATA = {rows: %ROWS%, statusColors: %SCOLORS%, history: %HISTORY%};
   window.setSort = setSort;
   window.copyText = copyText;
 
+  // Таблица рисуется страницами по PAGE_SIZE строк
+  var TABLE_ROWS = []; var PAGE = 0;
+
   function renderTable(filtered){
     filtered = filtered || currentFiltered();
     filtered = dedup(filtered);
     for(var i=0;i<filtered.length;i++){ filtered[i].__n = i+1; }
-    filtered = sortProjected(filtered);
+    TABLE_ROWS = sortProjected(filtered);
+    PAGE = 0;
+    renderPage();
+  }
+
+  function pageCount(){ return Math.max(1, Math.ceil(TABLE_ROWS.length / PAGE_SIZE)); }
+
+  function setPage(page){
+    PAGE = Math.max(0, Math.min(page, pageCount()-1));
+    renderPage();
+  }
+  window.setPage = setPage;
+  window.pageBy = function(delta){ setPage(PAGE + delta); };
+
+  function renderPager(){
+    var info = document.getElementById('pageInfo');
+    if(info){
+      var from = TABLE_ROWS.length ? PAGE*PAGE_SIZE+1 : 0;
+      var to = Math.min(TABLE_ROWS.length, (PAGE+1)*PAGE_SIZE);
+      info.textContent = from+'–'+to+' из '+TABLE_ROWS.length+' (стр. '+(PAGE+1)+' / '+pageCount()+')';
+    }
+  }
+
+  function renderPage(){
+    var filtered = TABLE_ROWS;
     var tbody = document.getElementById('clashTableBody');
     if(!tbody) return;
+    renderPager();
     if(filtered.length===0){
       tbody.innerHTML = '<tr><td colspan="10" class="muted2">Нет записей по текущим фильтрам</td></tr>';
       var counter = document.getElementById('clashCount'); if(counter) counter.textContent = 0;
       return;
     }
     var html = [];
-    for (var i=0;i<filtered.length;i++){
+    var start = PAGE*PAGE_SIZE, stop = Math.min(filtered.length, start+PAGE_SIZE);
+    for (var i=start;i<stop;i++){
       var r = filtered[i];
       var p = resolveAB(r);
       var n = i+1;
@@ -1041,6 +978,8 @@ var DATA = {rows: %ROWS%, statusColors: %SCOLORS%, history: %HISTORY%};
     } else {
       a.classList.add('active');
       document.getElementById('analyticsPane').style.display='block';
+      if(CHARTS_DIRTY){ renderCharts(dedup(currentFiltered())); }
+      resizeAllCharts();
     }
   }
   document.addEventListener('click', function(ev){
@@ -1185,10 +1124,24 @@ var DATA = {rows: %ROWS%, statusColors: %SCOLORS%, history: %HISTORY%};
     return out;
   }
 
+  // Графики аналитики строятся, только когда вкладка видна
+  var CHARTS_DIRTY = true;
+
   function updateAll(){
     var filtered = currentFiltered();
     var uniqRows = dedup(filtered);
 
+    var analytics = document.getElementById('analyticsPane');
+    if (analytics && analytics.style.display!=='none'){ renderCharts(uniqRows); }
+    else { CHARTS_DIRTY = true; }
+
+    if (document.getElementById('tablePane') && document.getElementById('tablePane').style.display!=='none'){ renderTable(filtered); }
+    if (document.getElementById('dynamicPane') && document.getElementById('dynamicPane').style.display!=='none'){ renderDynamic(); }
+  }
+
+  function renderCharts(uniqRows){
+    CHARTS_DIRTY = false;
+
     // KPI
     var el;
     if ((el=document.getElementById('kpiTotal')))    el.textContent = uniqRows.length;
@@ -1303,10 +1256,6 @@ var DATA = {rows: %ROWS%, statusColors: %SCOLORS%, history: %HISTORY%};
         }
       }]
     });
-
-
-    if (document.getElementById('tablePane') && document.getElementById('tablePane').style.display!=='none'){ renderTable(uniqRows); }
-    if (document.getElementById('dynamicPane') && document.getElementById('dynamicPane').style.display!=='none'){ renderDynamic(); }
   }
 
   document.addEventListener('change', function(ev){
@@ -1334,6 +1283,77 @@ var DATA = {rows: %ROWS%, statusColors: %SCOLORS%, history: %HISTORY%};
 </html>
 """
 
+# -----------------------------
+# Данные для HTML: колонки со словарями
+# -----------------------------
+PAYLOAD_FORMAT = 1
+
+# Колонка -> словарь значений (повторяющиеся строки хранятся один раз)
+DICT_COLUMNS = [('status', 'status'), ('testname', 'test'),
+                ('fileA', 'file'), ('fileB', 'file'),
+                ('sectionA', 'section'), ('sectionB', 'section'),
+                ('floorA', 'floor'), ('floorB', 'floor'),
+                ('catA', 'cat'), ('catB', 'cat'),
+                ('t1', 'path'), ('t2', 'path')]
+
+# Почти уникальные значения — как есть; sig, idsig и paircats клиент
+# восстанавливает из путей, ID и категорий
+RAW_COLUMNS = ['cname', 'ida', 'idb', 'href']
+
+# Размер блока при записи HTML на диск
+WRITE_CHUNK = 256 * 1024
+
+def encode_rows(rows):
+    """Строки отчёта в колоночном виде со словарями значений."""
+    dicts = {}
+    index = {}
+    cols = {}
+    for col, name in DICT_COLUMNS:
+        if name not in dicts:
+            dicts[name] = []
+            index[name] = {}
+        values, ids = dicts[name], index[name]
+        codes = []
+        for r in rows:
+            v = r.get(col) or u''
+            code = ids.get(v)
+            if code is None:
+                code = ids[v] = len(values)
+                values.append(v)
+            codes.append(code)
+        cols[col] = codes
+    for col in RAW_COLUMNS:
+        cols[col] = [r.get(col) or u'' for r in rows]
+    return {'v': PAYLOAD_FORMAT, 'n': len(rows), 'dicts': dicts,
+            'enc': dict(DICT_COLUMNS), 'cols': cols}
+
+class _ChunkWriter(object):
+    """Накопление мелких фрагментов и запись блоками по WRITE_CHUNK."""
+    def __init__(self, f):
+        self.f = f
+        self.parts = []
+        self.size = 0
+
+    def write(self, text):
+        if isinstance(text, bytes) and not isinstance(text, type(u'')):
+            text = text.decode('utf-8')
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= WRITE_CHUNK:
+            self.flush()
+
+    def flush(self):
+        if self.parts:
+            self.f.write(u''.join(self.parts))
+            self.parts = []
+            self.size = 0
+
+def _write_json(writer, obj):
+    # «<» внутри <script> экранируется, чтобы строка не закрыла тег
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    for chunk in encoder.iterencode(obj):
+        writer.write(chunk.replace(u'<', u'\\u003c'))
+
 def build_html(xml_path, rows, history):
     # Дата формирования HTML
     ts = datetime.datetime.now().strftime('%Y-%m-%d %H:%M')
@@ -1345,17 +1365,21 @@ def build_html(xml_path, rows, history):
     except Exception:
         xml_date = u'—'
 
-    html = HTML_TEMPLATE.replace('{ts}', ts)\
-                        .replace('{xml_title}', xml_title)\
-                        .replace('{xml_date}', xml_date)
-    html = html.replace('%ROWS%', json.dumps(rows, ensure_ascii=False))
-    html = html.replace('%SCOLORS%', json.dumps(STATUS_COLORS, ensure_ascii=False))
-    html = html.replace('%HISTORY%', json.dumps(history, ensure_ascii=False))
+    head, tail = HTML_TEMPLATE.split('%DATA%', 1)
+    head = head.replace('{ts}', ts)\
+               .replace('{xml_title}', xml_title)\
+               .replace('{xml_date}', xml_date)
     outdir = os.path.dirname(xml_path)
     outname = os.path.splitext(os.path.basename(xml_path))[0] + u'_report.html'
     outpath = os.path.join(outdir, outname)
     with io.open(outpath, 'w', encoding='utf-8') as f:
-        f.write(html)
+        writer = _ChunkWriter(f)
+        writer.write(head)
+        _write_json(writer, {'rows': encode_rows(rows),
+                             'statusColors': STATUS_COLORS,
+                             'history': history})
+        writer.write(tail)
+        writer.flush()
     return outpath
 
 def pick_xml():
@@ -1388,7 +1412,7 @@ def main():
     except Exception:
         _ref_dt = datetime.datetime.now()
     since_dt = _ask_since_select(_ref_dt)
-    history = find_history_reports(xml_path, limit=5, since_dt=since_dt)
+    history = find_history_reports(xml_path, limit=5, since_dt=since_dt, main_rows=rows)
     if since_dt is not None and not history and forms:
         forms.alert(u'По выбранному периоду исторических отчётов не найдено.', title=u'Динамика')
     outpath = build_html(xml_path, rows, history)
@@ -18,6 +18,15 @@ from System.Collections.Generic import List
 # Импорт модулей пакетных операций
 import openbg
 import closebg
+from pipeline_stages import (
+    NwcStage,
+    RvtStage,
+    ScriptStage,
+    make_pipeline,
+    needs_sync,
+    read_export_folder,
+)
+from staging_cache import StagingCache
 
 # ---------- Константы ----------
 
@@ -1086,6 +1095,86 @@ def action_run_python_script(models, scripts):
     )
 
 
+PIPELINE_SCRIPTS = "Python скрипты из библиотеки"
+PIPELINE_NWC = "Экспорт NWC (папка из <объект>_NWC.txt)"
+PIPELINE_RVT = "Экспорт RVT с очисткой (папка из <объект>_RVT.txt)"
+PIPELINE_STAGES = [PIPELINE_SCRIPTS, PIPELINE_NWC, PIPELINE_RVT]
+
+
+def action_run_pipeline(models, object_name, stage_names, scripts):
+    """Скрипты, экспорт NWC и RVT за одно открытие каждой модели.
+
+    Без экспорта RVT модель открывается связанной с хранилищем, и
+    изменения скриптов синхронизируются при закрытии. С экспортом RVT
+    модель открывается отсоединённой: изменения скриптов попадают только
+    в выгрузки. Отсоединённое открытие без экспорта RVT идёт из локальной
+    копии модели (staging_cache), повторные запуски по неизменённым
+    моделям не читают их с сетевого диска.
+    """
+    stages = [ScriptStage(s) for s in scripts or []]
+    if PIPELINE_NWC in stage_names:
+        stages.append(NwcStage(read_export_folder(OBJECTS_DIR, object_name, "NWC")))
+    if PIPELINE_RVT in stage_names:
+        stages.append(RvtStage(read_export_folder(OBJECTS_DIR, object_name, "RVT")))
+
+    out.print_md("## КОНВЕЙЕР (ОДНО ОТКРЫТИЕ НА МОДЕЛЬ)")
+    out.print_md("**Этапы ({}):** {}".format(len(stages), ", ".join(st.name for st in stages)))
+    out.print_md("**Моделей:** {}".format(len(models)))
+    sync = needs_sync(stages)
+    if sync:
+        out.print_md("**Режим:** открытие из хранилища, синхронизация при закрытии")
+    elif PIPELINE_RVT in stage_names:
+        out.print_md("**Режим:** отсоединённое открытие, без синхронизации")
+        if scripts:
+            out.print_md(
+                ":warning: Изменения скриптов попадут только в выгрузки, не в хранилище"
+            )
+    else:
+        out.print_md(
+            "**Режим:** отсоединённое открытие из локальной копии, без синхронизации"
+        )
+    out.print_md("---")
+
+    pipeline = make_pipeline(
+        stages,
+        __revit__,
+        log=out.print_md,
+        staging=None if sync else StagingCache(log=out.print_md),
+        sync=sync,
+        comment="Конвейер: {}".format(", ".join(st.name for st in stages)),
+    )
+    icons = {"done": ":white_check_mark:", "failed": ":x:", "skipped": ":warning:"}
+    success_models = 0
+
+    for i, model_path in enumerate(models):
+        out.print_md(":open_file_folder: **{}**".format(os.path.basename(model_path)))
+        summary = pipeline.run(model_path, object_name)
+        if summary.get("message"):
+            out.print_md(":x: {}".format(summary["message"]))
+        for record in summary["stages"]:
+            line = "  {} {} ({} с)".format(
+                icons.get(record["state"], ""), record["stage"], record["seconds"]
+            )
+            if record.get("output"):
+                line += " — {}".format(record["output"])
+            if record.get("message"):
+                line += " — {}".format(record["message"])
+            out.print_md(line)
+        out.print_md(
+            "  Открытие: {} с, закрытие: {} с".format(
+                summary.get("open", 0), summary.get("close", 0)
+            )
+        )
+        if summary["state"] != "failed":
+            success_models += 1
+        out.update_progress(i + 1, len(models))
+
+    out.print_md("---")
+    out.print_md(
+        "**Готово. Моделей обработано: {}/{}**".format(success_models, len(models))
+    )
+
+
 # ---------- Действия в разработке ----------
 
 
@@ -1143,6 +1232,7 @@ def main():
         "Добавить связь",
         "Выполнение python скриптов из библиотеки",
         "Выполнить python скрипты в открытых документах",
+        "Конвейер: скрипты, NWC, RVT за одно открытие",
         "Создать рабочие наборы (в разработке)",
         "Добавить общие параметры (в разработке)",
     ]
@@ -1155,12 +1245,27 @@ def main():
         script.exit()
 
     selected_scripts = None
+    pipeline_stages = None
+
+    # Конвейер: какие этапы выполнять над каждой моделью
+    if selected_action == "Конвейер: скрипты, NWC, RVT за одно открытие":
+        pipeline_stages = forms.SelectFromList.show(
+            PIPELINE_STAGES,
+            title="Этапы конвейера (по порядку)",
+            multiselect=True,
+            width=500,
+            button_name="Далее",
+        )
+        if not pipeline_stages:
+            script.exit()
+        if not isinstance(pipeline_stages, list):
+            pipeline_stages = [pipeline_stages]
 
     # Если выбрано выполнение python скриптов - сначала выбрать скрипты
     if selected_action in [
         "Выполнение python скриптов из библиотеки",
         "Выполнить python скрипты в открытых документах",
-    ]:
+    ] or (pipeline_stages and PIPELINE_SCRIPTS in pipeline_stages):
         scripts = list_python_scripts()
 
         if not scripts:
@@ -1262,6 +1367,10 @@ def main():
         action_add_link(selected_models)
     elif selected_action == "Выполнение python скриптов из библиотеки":
         action_run_python_script(selected_models, selected_scripts)
+    elif pipeline_stages:
+        action_run_pipeline(
+            selected_models, selected_object, pipeline_stages, selected_scripts
+        )
     elif "Создать рабочие наборы" in selected_action:
         action_create_worksets(selected_models)
     elif "Добавить общие параметры" in selected_action:
@@ -18,6 +18,9 @@ from datetime import datetime
 from pyrevit import forms, script
 from Autodesk.Revit.DB import ElementId
 
+import clash_xmlreader
+from category_matcher import CategoryMatcher
+
 
 # =============================================================================
 # КОНСТАНТЫ И НАСТРОЙКИ
@@ -146,6 +149,7 @@ class ElementCache:
         self._doc = document
         self._cache = {}
         self._category_keys = self._build_category_keys()
+        self._category_matcher = CategoryMatcher(self._category_keys)
         self._doc_title_key = self._normalize_key(document.Title)
 
     def _normalize_key(self, text):
@@ -207,16 +211,8 @@ class ElementCache:
         return ""
 
     def find_category_in_path(self, segment_normalized):
-        """Ищет категорию документа в сегменте пути."""
-        if not segment_normalized or len(segment_normalized) < 4:
-            return None
-
-        for cat_key in self._category_keys:
-            if not cat_key or len(cat_key) < 4:
-                continue
-            if cat_key in segment_normalized or segment_normalized in cat_key:
-                return cat_key
-        return None
+        """Ищет категорию документа в сегменте пути (вхождение в обе стороны)."""
+        return self._category_matcher.find(segment_normalized)
 
     @property
     def doc_title_key(self):
@@ -319,6 +315,11 @@ class NavisworksReportParser:
 
     def parse(self):
         """Парсит отчёт и возвращает dict: test_name -> [ClashRow, ...]."""
+        if clash_xmlreader.AVAILABLE:
+            try:
+                return self._parse_with_dotnet()
+            except Exception:
+                pass
         try:
             return self._parse_with_xml_parser()
         except Exception as e:
@@ -346,6 +347,44 @@ class NavisworksReportParser:
 
         return groups
 
+    def _parse_with_dotnet(self):
+        """Один проход System.Xml.XmlReader без построения дерева."""
+
+        def consume(events):
+            groups = {}
+            for kind, item in events:
+                if kind == "test":
+                    groups.setdefault(item, [])
+                    continue
+
+                test_name = None
+                for attr in ("testname", "test", "groupname"):
+                    test_name = item.get(attr)
+                    if test_name:
+                        break
+                test_name = test_name or item.parent_name or "(Без названия проверки)"
+
+                objects = []
+                for record in item.objects:
+                    element_id = record.element_id(OBJECT_ID_NAMES)
+                    if element_id is not None:
+                        objects.append(
+                            ClashObject(element_id=element_id, path=record.path())
+                        )
+                if not objects:
+                    continue
+
+                rows = groups.setdefault(test_name, [])
+                self._add_rows(
+                    rows,
+                    item.get("name") or "Без имени",
+                    self._resolve_image_path(item.get("href")),
+                    objects,
+                )
+            return groups
+
+        return clash_xmlreader.read_clash_report(self.xml_path, consume)
+
     def _collect_test_names(self, root):
         """Собирает имена всех тестов."""
         names = set()
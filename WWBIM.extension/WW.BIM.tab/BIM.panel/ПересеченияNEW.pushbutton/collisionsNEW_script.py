@@ -13,16 +13,23 @@ __persistentengine__ = True
 
 import os
 import re
-import json
+import hashlib
 import clr
-from collections import namedtuple
-from datetime import datetime
+from collections import namedtuple, OrderedDict
 
 clr.AddReference("System.Data")
 clr.AddReference("RevitAPIUI")
 
 from pyrevit import forms, script
-from Autodesk.Revit.DB import ElementId, View3D, BoundingBoxXYZ, XYZ, Transaction
+from Autodesk.Revit.DB import (
+    BoundingBoxXYZ,
+    ElementId,
+    ElementIdSetFilter,
+    FilteredElementCollector,
+    Transaction,
+    View3D,
+    XYZ,
+)
 from Autodesk.Revit.UI import IExternalEventHandler, ExternalEvent
 from System.Data import DataTable
 from System.Collections.Generic import List
@@ -37,11 +44,53 @@ from System.Windows.Controls import (
     TextBlock,
 )
 from System.Windows import DataTemplate
-from System.Windows.Data import Binding
+from System.Windows.Data import Binding, IValueConverter
 from System.Windows.Media import Stretch
 from System.Windows.Media import Brushes
-from System.Windows.Media.Imaging import BitmapImage, BitmapCacheOption
-from System import Uri, UriKind
+from System.Windows.Media.Imaging import (
+    BitmapCacheOption,
+    BitmapFrame,
+    BitmapImage,
+    JpegBitmapEncoder,
+)
+from System.Windows.Threading import DispatcherTimer
+from System.IO import FileMode, FileStream
+from System import TimeSpan, Uri, UriKind
+
+from category_matcher import CategoryMatcher
+from clash_cache import ReportCache
+from file_io import acquire_lock, release_lock, replace_file, temp_path
+from clash_diff import (
+    PERSISTING,
+    REAPPEARED,
+    STATE_TITLES,
+    carry_forward,
+    clash_keys,
+    diff_keys,
+    find_previous_report,
+    load_diff,
+    save_diff,
+)
+from clash_journal import (
+    COMPACT_LOCK_TIMEOUT,
+    CommentJournal,
+    StatusJournal,
+    comment_journal_path,
+)
+from clash_report import (
+    ALLOWED_STATUSES,
+    PARSER_VERSION,
+    NavisworksReportParser,
+    Patterns,
+    _extract_object_id_from_xml_object,
+    build_clash_key,
+    deduplicate_groups_by_clash_key,
+    extract_report_datetime,
+    normalize_status,
+)
+from clash_xml import patch_clash_statuses
+from clash_zones import cluster_boxes, union_box
+from text_index import SubstringIndex
 
 
 # =============================================================================
@@ -52,26 +101,16 @@ from System import Uri, UriKind
 FILTER_BY_FILE = True  # Сверка файла из pathlink с текущей моделью
 FILTER_BY_CATEGORY = False  # Дополнительная сверка категории в тексте pathlink
 
-# Имена атрибутов для поиска ID объекта
-OBJECT_ID_NAMES = frozenset(
-    ["объект id", "object id", "object 1 id", "object 2 id", "id объекта"]
-)
+# Миниатюры снимков в навигаторе
+THUMBNAIL_WIDTH = 96  # Ширина декодирования, px
+THUMBNAIL_MEMORY_LIMIT = 300  # Сколько миниатюр держать в памяти
 
-# Атрибуты даты в XML
-DATE_ATTRIBUTES = (
-    "date",
-    "created",
-    "generated",
-    "exported",
-    "timestamp",
-    "time",
-    "start",
-    "lastsaved",
-    "creationtime",
-    "modificationtime",
-)
+# Пауза после ввода в строке фильтра перед пересчётом, мс
+FILTER_DEBOUNCE_MS = 250
 
-ALLOWED_STATUSES = ("Новая", "В работе", "Закрыта")
+# Зоны коллизий: запас вокруг габарита и наибольший размер зоны, футы
+ZONE_PAD = 1.0
+ZONE_MAX_EXTENT = 30.0
 
 # CSS-стиль для подсветки категорий
 BADGE_STYLE = "background:#2f3b4a; color:#fff; padding:1px 6px; border-radius:3px; font-weight:600;"
@@ -79,64 +118,10 @@ MODEL_HEADER_LABEL_STYLE = "background:#0d6efd; color:#ffffff; padding:3px 10px;
 MODEL_HEADER_NAME_STYLE = "background:#e7f1ff; color:#0b3d91; padding:3px 10px; border-radius:6px; font-weight:700; border:1px solid #b6d4fe;"
 
 
-# =============================================================================
-# РЕГУЛЯРНЫЕ ВЫРАЖЕНИЯ
-# =============================================================================
-
-
-class Patterns:
-    """Скомпилированные регулярные выражения для парсинга."""
-
-    # Экранирование некорректных амперсандов в XML
-    BAD_AMPERSAND = re.compile(
-        "&(?!amp;|lt;|gt;|apos;|quot;|#\\d+;|#x[0-9A-Fa-f]+;)", re.UNICODE
-    )
-
-    # Имя файла модели
-    MODEL_FILE = re.compile(".+\\.(nwc|nwd|nwf|rvt)$", re.IGNORECASE)
-
-    # Атрибут даты в XML-тексте
-    DATE_ATTR = re.compile(
-        r"\b(?:date|created|generated|export(?:date|ed)?|timestamp|time|"
-        r'start|lastsaved|creationtime|modificationtime)\s*=\s*"([^"]+)"',
-        re.IGNORECASE,
-    )
-
-    # Fallback-парсер: блоки и атрибуты
-    CLASHTEST_BLOCK = re.compile(
-        r"<clashtest\b[^>]*>.*?</clashtest>", re.DOTALL | re.IGNORECASE
-    )
-    TEST_BLOCK = re.compile(r"<test\b[^>]*>.*?</test>", re.DOTALL | re.IGNORECASE)
-    CLASHRESULT_BLOCK = re.compile(
-        r"<clashresult\b[^>]*>.*?</clashresult>", re.DOTALL | re.IGNORECASE
-    )
-    CLASHOBJECT_BLOCK = re.compile(
-        r"<clashobject\b[^>]*>.*?</clashobject>", re.DOTALL | re.IGNORECASE
-    )
-
-    ATTR_NAME = re.compile(r"\bname=\"([^\"]+)\"", re.IGNORECASE)
-    ATTR_TESTNAME = re.compile(r"\btestname=\"([^\"]+)\"", re.IGNORECASE)
-    ATTR_HREF = re.compile(r"\bhref=\"([^\"]*)\"", re.IGNORECASE)
-    ATTR_WW_STATUS = re.compile(r"\bww_status=\"([^\"]*)\"", re.IGNORECASE)
-
-    SMARTTAG_PAIR = re.compile(
-        r"<smarttag>.*?<name>(.*?)</name>.*?<value>(.*?)</value>.*?</smarttag>",
-        re.DOTALL | re.IGNORECASE,
-    )
-    OBJECTATTR_PAIR = re.compile(
-        r"<objectattribute>.*?<name>(.*?)</name>.*?<value>(.*?)</value>.*?</objectattribute>",
-        re.DOTALL | re.IGNORECASE,
-    )
-    PATHLINK_BLOCK = re.compile(r"<pathlink>.*?</pathlink>", re.DOTALL | re.IGNORECASE)
-    NODE_TEXT = re.compile(r"<node>(.*?)</node>", re.DOTALL | re.IGNORECASE)
-    HTML_TAGS = re.compile(r"<[^>]+>")
-
-
 # =============================================================================
 # СТРУКТУРЫ ДАННЫХ
 # =============================================================================
 
-ClashObject = namedtuple("ClashObject", ["element_id", "path"])
 ClashRow = namedtuple(
     "ClashRow",
     [
@@ -179,7 +164,9 @@ class ElementCache:
     def __init__(self, document):
         self._doc = document
         self._cache = {}
+        self._boxes = {}
         self._category_keys = self._build_category_keys()
+        self._category_matcher = CategoryMatcher(self._category_keys)
         self._doc_title_key = self._normalize_key(document.Title)
 
     def _normalize_key(self, text):
@@ -202,21 +189,91 @@ class ElementCache:
             pass
         return keys
 
-    def get_element_and_category(self, element_id):
-        """Возвращает (element, category_name) для заданного ID."""
-        if element_id in self._cache:
-            return self._cache[element_id]
-
+    def _make_entry(self, element):
+        """(element, category_name, is_valid) для записи в кэш."""
+        if element is None:
+            return None, "", False
         try:
-            element = self._doc.GetElement(ElementId(element_id))
             category = ""
-            if element and element.Category:
+            if element.Category:
                 category = element.Category.Name or ""
+            return element, category, bool(element.IsValidObject)
         except Exception:
-            element, category = None, ""
+            return element, "", False
+
+    def preload(self, groups):
+        """Разрешает все ID из групп одним проходом коллектора.
+
+        Вместо doc.GetElement на каждую строку собираются уникальные ID,
+        и кэш заполняется через ElementIdSetFilter. ID, которых нет
+        в документе, кэшируются как недействительные.
+        """
+        ids = set()
+        for rows in groups.values():
+            for row in rows:
+                for field in ("id", "id_other"):
+                    try:
+                        ids.add(int(row.get(field)))
+                    except (TypeError, ValueError):
+                        pass
+        ids.difference_update(self._cache)
+        if not ids:
+            return 0
+
+        try:
+            id_list = List[ElementId]()
+            for element_id in ids:
+                id_list.Add(ElementId(element_id))
+            collector = FilteredElementCollector(self._doc).WherePasses(
+                ElementIdSetFilter(id_list)
+            )
+            found = {}
+            for element in collector:
+                found[element.Id.IntegerValue] = element
+        except Exception:
+            # Останется поштучное разрешение в get_element_and_category
+            return 0
+
+        for element_id in ids:
+            self._cache[element_id] = self._make_entry(found.get(element_id))
+        return len(found)
+
+    def get_element_and_category(self, element_id):
+        """Возвращает (element, category_name) для заданного ID."""
+        entry = self._cache.get(element_id)
+        if entry is None:
+            try:
+                entry = self._make_entry(self._doc.GetElement(ElementId(element_id)))
+            except Exception:
+                entry = (None, "", False)
+            self._cache[element_id] = entry
 
-        self._cache[element_id] = (element, category)
-        return element, category
+        element, category, valid = entry
+        return (element if valid else None), category
+
+    def get_bounding_box(self, element_id):
+        """Габарит элемента (min_x, min_y, min_z, max_x, max_y, max_z) или None."""
+        if element_id in self._boxes:
+            return self._boxes[element_id]
+
+        box = None
+        element, _ = self.get_element_and_category(element_id)
+        if element is not None:
+            try:
+                bbox = element.get_BoundingBox(None)
+                if bbox:
+                    box = (
+                        bbox.Min.X,
+                        bbox.Min.Y,
+                        bbox.Min.Z,
+                        bbox.Max.X,
+                        bbox.Max.Y,
+                        bbox.Max.Z,
+                    )
+            except Exception:
+                box = None
+        self._boxes[element_id] = box
+        return box
 
     def matches_current_model(self, path_text):
         """Проверяет, относится ли путь к текущей модели."""
@@ -241,16 +298,8 @@ class ElementCache:
         return ""
 
     def find_category_in_path(self, segment_normalized):
-        """Ищет категорию документа в сегменте пути."""
-        if not segment_normalized or len(segment_normalized) < 4:
-            return None
-
-        for cat_key in self._category_keys:
-            if not cat_key or len(cat_key) < 4:
-                continue
-            if cat_key in segment_normalized or segment_normalized in cat_key:
-                return cat_key
-        return None
+        """Ищет категорию документа в сегменте пути (вхождение в обе стороны)."""
+        return self._category_matcher.find(segment_normalized)
 
     @property
     def doc_title_key(self):
@@ -264,117 +313,6 @@ class ElementCache:
 element_cache = ElementCache(doc)
 
 
-# =============================================================================
-# ЧТЕНИЕ И ОЧИСТКА XML
-# =============================================================================
-
-
-class XmlReader:
-    """Класс для безопасного чтения XML-файлов."""
-
-    ENCODINGS = ("utf-8-sig", "utf-16", "utf-8", "cp1251")
-
-    @classmethod
-    def read_file(cls, path):
-        """Читает файл с автоопределением кодировки."""
-        with open(path, "rb") as f:
-            data = f.read()
-
-        for encoding in cls.ENCODINGS:
-            try:
-                return data.decode(encoding)
-            except Exception:
-                pass
-        return data.decode("utf-8", "ignore")
-
-    @classmethod
-    def sanitize(cls, text):
-        """Очищает текст от некорректных XML-символов."""
-        # Нормализация переносов строк
-        text = text.replace("\r\n", "\n").replace("\r", "\n")
-        text = text.replace("\ufeff", " ")
-
-        # Удаление недопустимых символов
-        text = cls._strip_invalid_chars(text)
-
-        # Экранирование амперсандов
-        text = Patterns.BAD_AMPERSAND.sub("&amp;", text)
-
-        # Обрезка до начала XML
-        start = text.find("<")
-        if start > 0:
-            text = text[start:]
-
-        return text
-
-    @staticmethod
-    def _strip_invalid_chars(text):
-        """Удаляет недопустимые XML-символы."""
-        result = []
-        for char in text:
-            code = ord(char)
-            if (
-                code == 0x9
-                or code == 0xA
-                or code == 0xD
-                or (0x20 <= code <= 0xD7FF)
-                or (0xE000 <= code <= 0xFFFD)
-                or (0x10000 <= code <= 0x10FFFF)
-            ):
-                result.append(char)
-            else:
-                result.append(" ")
-        return "".join(result)
-
-    @classmethod
-    def parse(cls, xml_path):
-        """Парсит XML-файл и возвращает корневой элемент."""
-        try:
-            from lxml import etree as ET
-        except ImportError:
-            import xml.etree.ElementTree as ET
-
-        raw_text = cls.read_file(xml_path)
-        cleaned_text = cls.sanitize(raw_text)
-        return ET.fromstring(cleaned_text)
-
-
-def build_clash_key(test_name, clash_name, id1, id2):
-    """Строит стабильный ключ коллизии для статуса/комментария."""
-    try:
-        a = int(id1) if id1 is not None else 0
-    except Exception:
-        a = 0
-    try:
-        b = int(id2) if id2 is not None else 0
-    except Exception:
-        b = 0
-
-    if a and b:
-        lo, hi = (a, b) if a < b else (b, a)
-        pair = "{}:{}".format(lo, hi)
-    else:
-        pair = "{}:{}".format(a, b)
-
-    return "{}|{}|{}".format(
-        (test_name or "").strip(), (clash_name or "").strip(), pair
-    )
-
-
-def normalize_status(raw_status):
-    """Нормализует текст статуса к одному из допустимых значений."""
-    status = (raw_status or "").strip().lower()
-    if not status:
-        return ALLOWED_STATUSES[0]
-    if status in ("новая", "новый", "new"):
-        return "Новая"
-    if status in ("в работе", "work", "in progress", "in_work"):
-        return "В работе"
-    if status in ("закрыта", "закрыто", "closed", "done"):
-        return "Закрыта"
-    return ALLOWED_STATUSES[0]
-
-
 def comments_json_path(xml_path):
     """Путь к json с комментариями рядом с XML."""
     base, _ = os.path.splitext(xml_path)
@@ -382,474 +320,206 @@ def comments_json_path(xml_path):
 
 
 def load_comments_map(json_path):
-    """Загружает комментарии из JSON: clash_key -> comment."""
-    if not json_path or not os.path.exists(json_path):
+    """Загружает комментарии (снимок + журнал): clash_key -> comment."""
+    if not json_path:
         return {}
     try:
-        with open(json_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        return CommentJournal(json_path).load()
     except Exception:
         return {}
 
-    if not isinstance(data, dict):
-        return {}
-
-    result = {}
-    for key, value in data.items():
-        if isinstance(value, dict):
-            comment = str(value.get("comment") or "")
-        else:
-            comment = str(value or "")
-        result[str(key)] = comment
-    return result
-
 
-def save_comments_map(json_path, comments_map):
-    """Сохраняет комментарии в JSON рядом с XML."""
-    payload = {}
-    for key, comment in comments_map.items():
-        text = (comment or "").strip()
-        if text:
-            payload[key] = {"comment": text}
+def save_comments_map(json_path, comments_map, baseline):
+    """Дописывает в журнал комментарии, изменённые относительно baseline.
 
-    with open(json_path, "w", encoding="utf-8") as f:
-        json.dump(payload, f, ensure_ascii=False, indent=2)
+    baseline — комментарии на момент загрузки; чужие правки других
+    ключей при этом сохраняются.
+    """
+    return CommentJournal(json_path).save(comments_map, baseline)
 
 
 # =============================================================================
-# ПАРСИНГ XML-ОТЧЁТА
+# СЕССИЯ ОТЧЁТА
 # =============================================================================
 
 
-class NavisworksReportParser:
-    """Парсер XML-отчётов Navisworks."""
+class ReportSession:
+    """Один XML-отчёт на время работы навигатора.
+
+    Строки и дата берутся из кэша или из одного потокового разбора.
+    Изменённые статусы дописываются в журнал рядом с отчётом и
+    накладываются на строки при загрузке; сам XML переписывается
+    только по явной команде compact().
+    """
 
     def __init__(self, xml_path):
         self.xml_path = xml_path
-        self.base_dir = os.path.dirname(xml_path)
-
-    def parse(self):
-        """Парсит отчёт и возвращает dict: test_name -> [ClashRow, ...]."""
-        try:
-            return self._parse_with_xml_parser()
-        except Exception:
-            return self._parse_with_regex()
-
-    def _parse_with_xml_parser(self):
-        """Основной парсер на базе XML."""
-        root = XmlReader.parse(self.xml_path)
-
-        # Собираем имена всех тестов
-        test_names = self._collect_test_names(root)
-        groups = {name: [] for name in test_names}
-
-        # Строим карту родительских элементов
-        parent_map = self._build_parent_map(root)
-
-        # Парсим результаты
-        for clash_result in root.findall(".//clashresult"):
-            self._process_clash_result(clash_result, groups, parent_map)
-
-        return groups
-
-    def _collect_test_names(self, root):
-        """Собирает имена всех тестов."""
-        names = set()
-        for tag in ("clashtest", "test"):
-            for element in root.findall(".//{}".format(tag)):
-                name = element.get("name") or element.get("displayname")
-                if name:
-                    names.add(name)
-        return names
-
-    def _build_parent_map(self, root):
-        """Строит карту ребёнок -> родитель."""
-        parent_map = {}
-        for parent in root.iter():
-            for child in list(parent):
-                parent_map[child] = parent
-        return parent_map
-
-    def _process_clash_result(self, clash_result, groups, parent_map):
-        """Обрабатывает один clashresult."""
-        test_name = self._get_test_name(clash_result, parent_map)
-        clash_name = clash_result.get("name") or "Без имени"
-        status = normalize_status(
-            clash_result.get("ww_status") or clash_result.get("status")
-        )
-        image_path = self._resolve_image_path(clash_result.get("href"))
-
-        objects = []
-        for clash_object in clash_result.findall("./clashobjects/clashobject"):
-            obj = self._parse_clash_object(clash_object)
-            if obj:
-                objects.append(obj)
-
-        if not objects:
-            return
-
-        rows = groups.setdefault(test_name, [])
-        self._add_rows(rows, test_name, clash_name, image_path, objects, status)
-
-    def _get_test_name(self, clash_result, parent_map):
-        """Определяет имя теста для clashresult."""
-        # Сначала ищем в атрибутах самого элемента
-        for attr in ("testname", "test", "groupname"):
-            name = clash_result.get(attr)
-            if name:
-                return name
-
-        # Ищем в родительских элементах
-        parent = parent_map.get(clash_result)
-        while parent is not None:
-            name = (
-                parent.get("name")
-                or parent.get("displayname")
-                or parent.get("testname")
-            )
-            if name:
-                return name
-            parent = parent_map.get(parent)
-
-        return "(Без названия проверки)"
-
-    def _parse_clash_object(self, element):
-        """Парсит clashobject и возвращает ClashObject."""
-        element_id = self._extract_object_id(element)
-        if element_id is None:
-            return None
-
-        path = self._extract_pathlink(element)
-        return ClashObject(element_id=element_id, path=path)
-
-    def _extract_object_id(self, element):
-        """Извлекает ID объекта из smarttags или objectattribute."""
-        # Ищем в smarttags
-        for smarttag in element.findall("./smarttags/smarttag"):
-            name = (smarttag.findtext("name") or "").strip().lower()
-            if name in OBJECT_ID_NAMES:
-                value = (smarttag.findtext("value") or "").strip()
-                if value.isdigit():
-                    return int(value)
-
-        # Ищем в objectattribute
-        for obj_attr in element.findall("./objectattribute"):
-            name = (obj_attr.findtext("name") or "").strip().lower()
-            if name in OBJECT_ID_NAMES:
-                value = (obj_attr.findtext("value") or "").strip()
-                if value.isdigit():
-                    return int(value)
-
-        return None
-
-    def _extract_pathlink(self, element):
-        """Извлекает путь из pathlink."""
-        parts = []
-
-        # Пробуем node
-        for node in element.findall("./pathlink/node"):
-            text = (node.text or "").strip()
-            if text:
-                parts.append(text)
-
-        # Если не нашли, пробуем path
-        if not parts:
-            for path in element.findall("./pathlink/path"):
-                text = (path.text or "").strip()
-                if text:
-                    parts.append(text)
-
-        return " / ".join(parts)
-
-    def _resolve_image_path(self, href):
-        """Преобразует относительный путь к изображению в абсолютный."""
-        if not href:
-            return ""
-        href = href.replace("\\", "/").lstrip("./")
-        return os.path.normpath(os.path.join(self.base_dir, href))
-
-    def _add_rows(self, rows, test_name, clash_name, image_path, objects, status):
-        """Добавляет строки для пары объектов."""
-        if len(objects) >= 2:
-            obj_a, obj_b = objects[0], objects[1]
-            clash_key = build_clash_key(
-                test_name, clash_name, obj_a.element_id, obj_b.element_id
-            )
-            # Добавляем обе перестановки
-            rows.append(
-                {
-                    "name": clash_name,
-                    "img": image_path,
-                    "id": obj_a.element_id,
-                    "id_other": obj_b.element_id,
-                    "path": obj_a.path,
-                    "path_other": obj_b.path,
-                    "status": status,
-                    "clash_key": clash_key,
-                }
-            )
-            rows.append(
-                {
-                    "name": clash_name,
-                    "img": image_path,
-                    "id": obj_b.element_id,
-                    "id_other": obj_a.element_id,
-                    "path": obj_b.path,
-                    "path_other": obj_a.path,
-                    "status": status,
-                    "clash_key": clash_key,
-                }
-            )
+        self.groups = {}
+        self.report_date = ("", "")
+        self.journal = StatusJournal.for_report(xml_path)
+        self._cache = ReportCache(xml_path, PARSER_VERSION)
+        self._statuses = {}
+
+    def load(self):
+        """Возвращает dict: test_name -> [rows] (из кэша или XML + журнал)."""
+        cached = self._cache.load()
+        if cached is not None:
+            self.groups = cached.groups
+            self.report_date = cached.report_date
         else:
-            obj = objects[0]
-            clash_key = build_clash_key(test_name, clash_name, obj.element_id, None)
-            rows.append(
-                {
-                    "name": clash_name,
-                    "img": image_path,
-                    "id": obj.element_id,
-                    "id_other": None,
-                    "path": obj.path,
-                    "path_other": "",
-                    "status": status,
-                    "clash_key": clash_key,
-                }
-            )
-
-    def _parse_with_regex(self):
-        """Fallback-парсер на базе регулярных выражений."""
-        text = XmlReader.sanitize(XmlReader.read_file(self.xml_path))
-        groups = {}
-
-        # Ищем блоки тестов
-        blocks = list(Patterns.CLASHTEST_BLOCK.finditer(text))
-        if not blocks:
-            blocks = list(Patterns.TEST_BLOCK.finditer(text))
-        if not blocks:
-            # Обрабатываем весь текст как один блок
-            blocks = [type("FakeMatch", (), {"group": lambda self, n=0: text})()]
-
-        for block_match in blocks:
-            block_text = (
-                block_match.group(0)
-                if hasattr(block_match, "group")
-                else str(block_match)
-            )
-
-            # Определяем имя теста
-            name_match = Patterns.ATTR_NAME.search(block_text)
-            default_test_name = (
-                name_match.group(1) if name_match else "(Без названия проверки)"
+            parser = NavisworksReportParser(self.xml_path)
+            self.groups = parser.parse()
+            self.report_date = parser.report_date or extract_report_datetime(
+                self.xml_path
             )
-            groups.setdefault(default_test_name, [])
-
-            # Парсим результаты
-            for result_match in Patterns.CLASHRESULT_BLOCK.finditer(block_text):
-                self._process_regex_result(
-                    result_match.group(0), groups, default_test_name
-                )
-
-        return groups
-
-    def _process_regex_result(self, result_text, groups, default_test_name):
-        """Обрабатывает clashresult через regex."""
-        # Имя теста
-        testname_match = Patterns.ATTR_TESTNAME.search(result_text)
-        test_name = testname_match.group(1) if testname_match else default_test_name
-
-        # Путь к изображению
-        href_match = Patterns.ATTR_HREF.search(result_text)
-        image_path = self._resolve_image_path(href_match.group(1) if href_match else "")
-
-        # Имя коллизии
-        name_match = Patterns.ATTR_NAME.search(result_text)
-        clash_name = name_match.group(1) if name_match else "Без имени"
-        status_match = Patterns.ATTR_WW_STATUS.search(result_text)
-        status = normalize_status(status_match.group(1) if status_match else "")
-
-        # Парсим объекты
-        objects = []
-        for obj_match in Patterns.CLASHOBJECT_BLOCK.finditer(result_text):
-            obj = self._parse_regex_object(obj_match.group(0))
-            if obj:
-                objects.append(obj)
-
-        if not objects:
-            return
-
-        rows = groups.setdefault(test_name, [])
-        self._add_rows(rows, test_name, clash_name, image_path, objects, status)
-
-    def _parse_regex_object(self, obj_text):
-        """Парсит clashobject через regex."""
-        element_id = None
-
-        # Ищем в smarttags
-        for name, value in Patterns.SMARTTAG_PAIR.findall(obj_text):
-            if (name or "").strip().lower() in OBJECT_ID_NAMES:
-                v = (value or "").strip()
-                if v.isdigit():
-                    element_id = int(v)
-                    break
-
-        # Ищем в objectattribute
-        if element_id is None:
-            for name, value in Patterns.OBJECTATTR_PAIR.findall(obj_text):
-                if (name or "").strip().lower() in OBJECT_ID_NAMES:
-                    v = (value or "").strip()
-                    if v.isdigit():
-                        element_id = int(v)
-                        break
-
-        if element_id is None:
-            return None
-
-        # Извлекаем путь
-        path = ""
-        pathlink_match = Patterns.PATHLINK_BLOCK.search(obj_text)
-        if pathlink_match:
-            nodes = Patterns.NODE_TEXT.findall(pathlink_match.group(0))
-            parts = [Patterns.HTML_TAGS.sub("", n).strip() for n in nodes if n.strip()]
-            path = " / ".join(parts)
-
-        return ClashObject(element_id=element_id, path=path)
-
-
-def _extract_object_id_from_xml_object(clash_object):
-    """Извлекает ID из XML-узла clashobject."""
-    for smarttag in clash_object.findall("./smarttags/smarttag"):
-        name = (smarttag.findtext("name") or "").strip().lower()
-        if name in OBJECT_ID_NAMES:
-            value = (smarttag.findtext("value") or "").strip()
-            if value.isdigit():
-                return int(value)
-
-    for obj_attr in clash_object.findall("./objectattribute"):
-        name = (obj_attr.findtext("name") or "").strip().lower()
-        if name in OBJECT_ID_NAMES:
-            value = (obj_attr.findtext("value") or "").strip()
-            if value.isdigit():
-                return int(value)
-
-    return None
-
-
-def save_statuses_to_xml(xml_path, statuses_map):
-    """Сохраняет статусы коллизий в XML как атрибут ww_status у clashresult."""
-    if not statuses_map:
-        return
-
-    try:
+            if self.groups:
+                self._cache.save(self.groups, self.report_date)
+
+        journal = self.journal.load()
+        self._statuses = {}
+        for rows in self.groups.values():
+            for row in rows:
+                key = row.get("clash_key")
+                if key in journal:
+                    row["status"] = normalize_status(journal[key])
+                self._statuses[key] = row.get("status")
+        return self.groups
+
+    def statuses(self):
+        """Текущие статусы: clash_key -> статус."""
+        return dict(self._statuses)
+
+    def pending_count(self):
+        """Число коллизий, статусы которых ещё не записаны в XML."""
+        return len(self.journal.load())
+
+    def save_statuses(self, statuses_map):
+        """Дописывает в журнал только изменившиеся статусы."""
+        changed = {}
+        for key, status in statuses_map.items():
+            status = normalize_status(status)
+            if key in self._statuses and self._statuses[key] != status:
+                changed[key] = status
+        if not changed:
+            return 0
+
+        self.journal.append(changed)
+        self._statuses.update(changed)
+        for rows in self.groups.values():
+            for row in rows:
+                status = changed.get(row.get("clash_key"))
+                if status:
+                    row["status"] = status
+        return len(changed)
+
+    def compact(self):
+        """Переносит статусы из журнала в ww_status XML за один проход.
+
+        Выполняется под файлом-блокировкой отчёта. Журнал сначала
+        переименовывается в хвост .compacting (статусы, записанные в это
+        время другими пользователями, пойдут в новый журнал), в XML
+        переносятся только хвосты. Отчёт копируется потоково во
+        временный файл и подменяется атомарно; хвосты удаляются только
+        после успешной подмены, при сбое они читаются вместе с журналом.
+        """
+        lock_path = self.xml_path + ".lock"
+        if not acquire_lock(lock_path, stale_seconds=COMPACT_LOCK_TIMEOUT):
+            raise Exception("Отчёт сейчас записывает другой пользователь")
         try:
-            from lxml import etree as ET
-        except ImportError:
-            import xml.etree.ElementTree as ET
-
-        root = XmlReader.parse(xml_path)
-
-        parent_map = {}
-        for parent in root.iter():
-            for child in list(parent):
-                parent_map[child] = parent
-
-        parser_stub = NavisworksReportParser(xml_path)
-
-        modified = 0
-        for clash_result in root.findall(".//clashresult"):
-            test_name = parser_stub._get_test_name(clash_result, parent_map)
-            clash_name = clash_result.get("name") or "Без имени"
-
-            ids = []
-            for clash_object in clash_result.findall("./clashobjects/clashobject"):
-                obj_id = _extract_object_id_from_xml_object(clash_object)
-                if obj_id is not None:
-                    ids.append(obj_id)
+            segments = self.journal.detach()
+            patched = self._patch_xml(self.journal.load(segments))
+            self.journal.remove_segments(segments)
+        finally:
+            release_lock(lock_path)
 
-            id1 = ids[0] if len(ids) > 0 else None
-            id2 = ids[1] if len(ids) > 1 else None
-            key = build_clash_key(test_name, clash_name, id1, id2)
+        self._cache.save(self.groups, self.report_date)
+        return patched
 
-            if key in statuses_map:
-                clash_result.set("ww_status", normalize_status(statuses_map[key]))
-                modified += 1
+    def _patch_xml(self, pending):
+        if not pending:
+            return 0
 
-        if modified == 0:
-            return
+        statuses = dict(
+            (key, normalize_status(status)) for key, status in pending.items()
+        )
+        parser = NavisworksReportParser(self.xml_path)
 
-        xml_bytes = ET.tostring(root, encoding="utf-8")
-        with open(xml_path, "wb") as f:
-            f.write(xml_bytes)
-    except Exception as exc:
-        out.print_md(":warning: Не удалось сохранить статусы в XML: `{}`".format(exc))
-
-
-def deduplicate_groups_by_clash_key(groups):
-    """Убирает дубли пар (A-B и B-A), оставляя одну строку на clash_key."""
-    result = {}
-    for test_name, rows in groups.items():
-        seen = set()
-        deduped = []
-        for item in rows:
-            clash_key = item.get("clash_key") or build_clash_key(
-                test_name,
-                item.get("name"),
-                item.get("id"),
-                item.get("id_other"),
+        def key_func(clash_result, inherited_name):
+            test_name = (
+                parser._get_own_test_name(clash_result)
+                or inherited_name
+                or "(Без названия проверки)"
             )
-            if clash_key in seen:
-                continue
-            seen.add(clash_key)
-
-            row = dict(item)
-            row["clash_key"] = clash_key
-            deduped.append(row)
-        result[test_name] = deduped
-    return result
-
-
-# =============================================================================
-# ИЗВЛЕЧЕНИЕ ДАТЫ ОТЧЁТА
-# =============================================================================
+            return self._clash_key(clash_result, test_name)
 
+        tmp_path = temp_path(self.xml_path)
+        try:
+            patched = patch_clash_statuses(
+                self.xml_path, tmp_path, statuses, key_func
+            )
+            replace_file(tmp_path, self.xml_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return patched
 
-def extract_report_datetime(xml_path):
-    """Извлекает дату отчёта из XML или метаданных файла."""
-    # Пробуем из XML-атрибутов
-    try:
-        root = XmlReader.parse(xml_path)
+    def _clash_key(self, clash_result, test_name):
+        clash_name = clash_result.get("name") or "Без имени"
+        ids = []
+        for clash_object in clash_result.findall("./clashobjects/clashobject"):
+            obj_id = _extract_object_id_from_xml_object(clash_object)
+            if obj_id is not None:
+                ids.append(obj_id)
+
+        id1 = ids[0] if len(ids) > 0 else None
+        id2 = ids[1] if len(ids) > 1 else None
+        return build_clash_key(test_name, clash_name, id1, id2)
+
+
+def apply_report_diff(session, comments_path):
+    """Сравнивает отчёт с предыдущим одноимённым и размечает строки.
+
+    Сравнение выполняется при первом открытии отчёта: статусы оставшихся
+    коллизий и комментарии оставшихся и вернувшихся переносятся из
+    предыдущего отчёта. Результат хранится в <отчёт>.diff.json, при
+    следующих открытиях строки размечаются по нему, пока предыдущим
+    остаётся тот же отчёт.
+    """
+    previous_path = find_previous_report(session.xml_path)
+    if previous_path is None:
+        return None
 
-        # Ищем в корневом элементе
-        for attr in DATE_ATTRIBUTES:
-            value = root.get(attr)
-            if value:
-                return value, "из XML"
-
-        # Ищем в дочерних элементах
-        for tag in ("report", "batchtest", "tests"):
-            for element in root.findall(".//{}".format(tag)):
-                for attr in DATE_ATTRIBUTES:
-                    value = element.get(attr)
-                    if value:
-                        return value, "из XML"
-    except Exception:
-        pass
+    diff = load_diff(session.xml_path)
+    if diff is None or not diff.compares_with(previous_path):
+        previous = ReportSession(previous_path)
+        previous_groups = previous.load()
+        previous_diff = load_diff(previous_path)
+        diff = diff_keys(
+            clash_keys(session.groups),
+            clash_keys(previous_groups),
+            previous_diff.resolved if previous_diff else (),
+            previous_path,
+        )
 
-    # Пробуем regex-поиск
-    try:
-        text = XmlReader.sanitize(XmlReader.read_file(xml_path))
-        match = Patterns.DATE_ATTR.search(text)
-        if match:
-            return match.group(1).strip(), "из XML"
-    except Exception:
-        pass
+        session.save_statuses(
+            carry_forward(diff, previous.statuses(), session.journal.load())
+        )
+        comments_map = load_comments_map(comments_path)
+        carried = carry_forward(
+            diff,
+            load_comments_map(comments_json_path(previous_path)),
+            comments_map,
+            states=(PERSISTING, REAPPEARED),
+        )
+        if carried:
+            save_comments_map(comments_path, carried, comments_map)
+        save_diff(session.xml_path, diff)
 
-    # Берём дату изменения файла
-    try:
-        timestamp = os.path.getmtime(xml_path)
-        dt = datetime.fromtimestamp(timestamp)
-        return dt.strftime("%d.%m.%Y %H:%M"), "по дате изменения файла"
-    except Exception:
-        return "", ""
+    for rows in session.groups.values():
+        for row in rows:
+            row["change"] = STATE_TITLES.get(diff.states.get(row.get("clash_key")), "")
+    return diff
 
 
 # =============================================================================
@@ -1113,15 +783,18 @@ class SelectElementExternalEventHandler(IExternalEventHandler):
     def __init__(self):
         self._element_id = None
         self._action = "select"
+        self._box = None
         self._last_error = ""
 
-    def set_target(self, element_id, action):
+    def set_target(self, element_id, action, box=None):
+        """element_id — ID или список ID (зона); box — готовый габарит подрезки."""
         self._element_id = element_id
         self._action = action or "select"
+        self._box = box
 
     def Execute(self, uiapp):
         self._last_error = ""
-        if self._element_id is None:
+        if self._element_id is None or self._element_id == []:
             self._last_error = "Не задан ID элемента для действия."
             return
 
@@ -1131,7 +804,9 @@ class SelectElementExternalEventHandler(IExternalEventHandler):
                 self._last_error = "Нет активного документа Revit."
                 return
 
-            _perform_revit_action(active_uidoc, int(self._element_id), self._action)
+            _perform_revit_action(
+                active_uidoc, self._element_id, self._action, self._box
+            )
         except Exception as exc:
             self._last_error = str(exc)
 
@@ -1139,12 +814,22 @@ class SelectElementExternalEventHandler(IExternalEventHandler):
         return "WWBIM Select Element External Event"
 
 
-def _perform_revit_action(uidoc, element_id, action):
-    """Выполняет выделение/подрезку в контексте Revit API."""
+def _perform_revit_action(uidoc, element_id, action, box=None):
+    """Выполняет выделение/подрезку в контексте Revit API.
+
+    element_id — один ID или список ID зоны: все они выделяются, а вид
+    подрезается один раз по общему габариту (box, если он уже известен).
+    """
+    if isinstance(element_id, (list, tuple)):
+        element_ids = [int(value) for value in element_id]
+    else:
+        element_ids = [int(element_id)]
+
     ids = List[ElementId]()
-    ids.Add(ElementId(int(element_id)))
+    for value in element_ids:
+        ids.Add(ElementId(value))
     uidoc.Selection.SetElementIds(ids)
-    uidoc.ShowElements(ElementId(int(element_id)))
+    uidoc.ShowElements(ids)
 
     if action != "crop":
         return
@@ -1154,18 +839,35 @@ def _perform_revit_action(uidoc, element_id, action):
     if not isinstance(view, View3D) or view.IsTemplate:
         raise Exception("Подрезка работает только в активном 3D-виде.")
 
-    element = doc.GetElement(ElementId(int(element_id)))
-    if not element:
-        raise Exception("Элемент с ID {} не найден в документе.".format(element_id))
-
-    bbox = element.get_BoundingBox(view) or element.get_BoundingBox(None)
-    if not bbox:
-        raise Exception("Не удалось получить bounding box элемента.")
+    if box is None:
+        for value in element_ids:
+            element = doc.GetElement(ElementId(value))
+            if not element:
+                continue
+            bbox = element.get_BoundingBox(view) or element.get_BoundingBox(None)
+            if bbox:
+                box = union_box(
+                    box,
+                    (
+                        bbox.Min.X,
+                        bbox.Min.Y,
+                        bbox.Min.Z,
+                        bbox.Max.X,
+                        bbox.Max.Y,
+                        bbox.Max.Z,
+                    ),
+                )
+    if box is None:
+        if len(element_ids) == 1:
+            raise Exception(
+                "Не удалось получить bounding box элемента {}.".format(element_ids[0])
+            )
+        raise Exception("Не удалось получить bounding box элементов зоны.")
 
     pad = 1.0
     section = BoundingBoxXYZ()
-    section.Min = XYZ(bbox.Min.X - pad, bbox.Min.Y - pad, bbox.Min.Z - pad)
-    section.Max = XYZ(bbox.Max.X + pad, bbox.Max.Y + pad, bbox.Max.Z + pad)
+    section.Min = XYZ(box[0] - pad, box[1] - pad, box[2] - pad)
+    section.Max = XYZ(box[3] + pad, box[4] + pad, box[5] + pad)
 
     tx = Transaction(doc, "WWBIM Подрезка коллизии")
     tx.Start()
@@ -1179,6 +881,123 @@ def _perform_revit_action(uidoc, element_id, action):
         raise
 
 
+# =============================================================================
+# МИНИАТЮРЫ СНИМКОВ
+# =============================================================================
+
+
+class ThumbnailCache:
+    """Миниатюры снимков: LRU в памяти и JPEG-кэш на диске рядом с отчётом.
+
+    Снимок декодируется сразу в уменьшенном виде (DecodePixelWidth) и
+    только когда строка таблицы появляется на экране.
+    """
+
+    def __init__(self, xml_path, width=THUMBNAIL_WIDTH, limit=THUMBNAIL_MEMORY_LIMIT):
+        base, _ = os.path.splitext(xml_path)
+        self.cache_dir = base + ".thumbs"
+        self.width = width
+        self.limit = limit
+        self._items = OrderedDict()
+        self._missing = set()
+
+    def get(self, image_path):
+        """Возвращает замороженный BitmapImage или None."""
+        if not image_path or image_path in self._missing:
+            return None
+
+        bmp = self._items.pop(image_path, None)
+        if bmp is None:
+            bmp = self._load(image_path)
+            if bmp is None:
+                self._missing.add(image_path)
+                return None
+
+        self._items[image_path] = bmp
+        while len(self._items) > self.limit:
+            self._items.popitem(last=False)
+        return bmp
+
+    def _load(self, image_path):
+        thumb_path = self._thumb_path(image_path)
+        if thumb_path is None:
+            return None
+
+        if os.path.exists(thumb_path):
+            bmp = self._decode(thumb_path, None)
+            if bmp is not None:
+                return bmp
+
+        bmp = self._decode(image_path, self.width)
+        if bmp is not None:
+            self._save(bmp, thumb_path)
+        return bmp
+
+    def _thumb_path(self, image_path):
+        """Имя миниатюры зависит от пути, размера и даты снимка."""
+        try:
+            st = os.stat(image_path)
+        except Exception:
+            return None
+        signature = "{}|{}|{}|{}".format(
+            os.path.normcase(image_path), st.st_size, int(st.st_mtime), self.width
+        )
+        digest = hashlib.sha1(signature.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest[:20] + ".jpg")
+
+    def _decode(self, path, width):
+        try:
+            bmp = BitmapImage()
+            bmp.BeginInit()
+            bmp.UriSource = Uri(path, UriKind.Absolute)
+            if width:
+                bmp.DecodePixelWidth = width
+            bmp.CacheOption = BitmapCacheOption.OnLoad
+            bmp.EndInit()
+            bmp.Freeze()
+            return bmp
+        except Exception:
+            return None
+
+    def _save(self, bmp, thumb_path):
+        """Пишет миниатюру на диск; папка отчёта может быть только для чтения."""
+        tmp_path = temp_path(thumb_path)
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            encoder = JpegBitmapEncoder()
+            encoder.QualityLevel = 85
+            encoder.Frames.Add(BitmapFrame.Create(bmp))
+            stream = FileStream(tmp_path, FileMode.Create)
+            try:
+                encoder.Save(stream)
+            finally:
+                stream.Close()
+            replace_file(tmp_path, thumb_path)
+        except Exception:
+            try:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            except Exception:
+                pass
+
+
+class ThumbnailConverter(IValueConverter):
+    """Путь к снимку -> миниатюра; вызывается только для видимых строк."""
+
+    def __init__(self, cache):
+        self._cache = cache
+
+    def Convert(self, value, target_type, parameter, culture):
+        try:
+            return self._cache.get(str(value or ""))
+        except Exception:
+            return None
+
+    def ConvertBack(self, value, target_type, parameter, culture):
+        return None
+
+
 class ClashNavigatorWindow(forms.WPFWindow):
     """Интерактивный навигатор коллизий (WPF: сортировка + фильтр)."""
 
@@ -1189,24 +1008,56 @@ class ClashNavigatorWindow(forms.WPFWindow):
         "ID",
         "ID_2",
         "Статус",
+        "Изменение",
+        "Зона",
+        "Категория",
+        "Категория_2",
+    )
+
+    # Колонки, по которым работает текстовый поиск
+    SEARCH_COLUMNS = (
+        "Модель NWC",
+        "Проверка",
+        "Пересечение",
+        "ID",
+        "ID_2",
         "Категория",
         "Категория_2",
+        "Путь элемента",
+        "Путь второго",
     )
 
-    def __init__(self, rows, uidoc, xaml_path, xml_path, comments_path):
+    # Служебная колонка: строка прошла фильтры ("1")
+    MATCH_COLUMN = "_match"
+
+    def __init__(self, rows, uidoc, xaml_path, session, comments_path, zones=None):
         self._uidoc = uidoc
         self._rows = rows
-        self._xml_path = xml_path
+        # Метка зоны -> ([ID элементов], габарит)
+        self._zones = zones or {}
+        self._session = session
+        self._xml_path = session.xml_path
         self._comments_path = comments_path
+        # Комментарии на момент загрузки: в журнал уходят только отличия
+        self._comments = dict(
+            (row.get("clash_key"), row.get("comment") or "") for row in rows
+        )
         self._source_table = None
         self._view = None
         self._suspend_filter_events = False
         self._column_value_filters = {}
         self._header_filter_buttons = {}
+        self._search_index = SubstringIndex()
+        self._value_index = {}
+        self._matched_rows = None
         self._select_handler = SelectElementExternalEventHandler()
+        self._thumbnail_converter = ThumbnailConverter(
+            ThumbnailCache(session.xml_path)
+        )
         self._select_external_event = None
 
         forms.WPFWindow.__init__(self, xaml_path)
+        self._set_title(session.report_date)
 
         try:
             self._select_external_event = ExternalEvent.Create(self._select_handler)
@@ -1216,17 +1067,30 @@ class ClashNavigatorWindow(forms.WPFWindow):
                 title="Пересечения",
             )
 
+        self._filter_timer = DispatcherTimer()
+        self._filter_timer.Interval = TimeSpan.FromMilliseconds(FILTER_DEBOUNCE_MS)
+        self._filter_timer.Tick += self._on_filter_timer_tick
+
         self.FilterTextBox.TextChanged += self._on_filter_changed
         self.ResetFilterButton.Click += self._on_reset_clicked
         self.SaveChangesButton.Click += self._on_save_changes_clicked
+        self.CompactButton.Click += self._on_compact_clicked
         self.SelectElementButton.Click += self._on_select_element_clicked
         self.CropToElementButton.Click += self._on_crop_to_element_clicked
+        self.CropToZoneButton.Click += self._on_crop_to_zone_clicked
         self.ClashesGrid.AutoGeneratingColumn += self._on_grid_auto_generating_column
         self.ClashesGrid.AutoGeneratedColumns += self._on_grid_auto_generated_columns
         self.ClashesGrid.MouseDoubleClick += self._on_grid_double_click
 
         self._bind_data()
 
+    def _set_title(self, report_date):
+        date_value = report_date[0] if report_date else ""
+        title = "{} — {}".format(self.Title, os.path.basename(self._xml_path))
+        if date_value:
+            title += " (отчёт от {})".format(date_value)
+        self.Title = title
+
     def _bind_data(self):
         table = DataTable("Clashes")
         columns = [
@@ -1237,18 +1101,34 @@ class ClashNavigatorWindow(forms.WPFWindow):
             "ID",
             "ID_2",
             "Статус",
+            "Изменение",
+            "Зона",
             "Комментарий",
             "Категория",
             "Категория_2",
             "Путь элемента",
             "Путь второго",
             "Снимок",
+            self.MATCH_COLUMN,
         ]
         for col_name in columns:
             table.Columns.Add(col_name)
 
-        for row in self._rows:
+        search_index = SubstringIndex()
+        for row_id, row in enumerate(self._rows):
             test_name = (row.get("test") or "").strip()
+            values = (
+                row.get("model", ""),
+                test_name,
+                row.get("name", ""),
+                str(row.get("id", "") or ""),
+                str(row.get("id_other", "") or ""),
+                row.get("cat", "") or "",
+                row.get("cat_other", "") or "",
+                row.get("path", "") or "",
+                row.get("path_other", "") or "",
+            )
+            search_index.add(row_id, values)
             table.Rows.Add(
                 row.get("clash_key", ""),
                 row.get("model", ""),
@@ -1257,21 +1137,28 @@ class ClashNavigatorWindow(forms.WPFWindow):
                 str(row.get("id", "") or ""),
                 str(row.get("id_other", "") or ""),
                 normalize_status(row.get("status", "")),
+                row.get("change", "") or "",
+                row.get("zone", "") or "",
                 row.get("comment", "") or "",
                 row.get("cat", "") or "",
                 row.get("cat_other", "") or "",
                 row.get("path", "") or "",
                 row.get("path_other", "") or "",
-                self._build_preview_image(row.get("img", "") or ""),
+                row.get("img", "") or "",
+                "1",
             )
 
         self._source_table = table
+        self._search_index = search_index
+        self._value_index = {}
+        self._matched_rows = None
+        table.ColumnChanged += self._on_table_column_changed
         self._view = table.DefaultView
         self.ClashesGrid.ItemsSource = self._view
 
     def _on_grid_auto_generating_column(self, sender, args):
         header = str(args.Column.Header)
-        if header == "Ключ":
+        if header in ("Ключ", self.MATCH_COLUMN):
             args.Cancel = True
             return
 
@@ -1279,7 +1166,9 @@ class ClashNavigatorWindow(forms.WPFWindow):
             template_column = DataGridTemplateColumn()
             template_column.Header = "Снимок"
             image_factory = FrameworkElementFactory(Image)
-            image_factory.SetBinding(Image.SourceProperty, Binding("[Снимок]"))
+            image_binding = Binding("[Снимок]")
+            image_binding.Converter = self._thumbnail_converter
+            image_factory.SetBinding(Image.SourceProperty, image_binding)
             image_factory.SetValue(Image.WidthProperty, 96.0)
             image_factory.SetValue(Image.HeightProperty, 72.0)
             image_factory.SetValue(Image.StretchProperty, Stretch.Uniform)
@@ -1414,21 +1303,6 @@ class ClashNavigatorWindow(forms.WPFWindow):
         except Exception:
             pass
 
-    def _build_preview_image(self, image_path):
-        if not image_path or not os.path.exists(image_path):
-            return None
-
-        try:
-            bmp = BitmapImage()
-            bmp.BeginInit()
-            bmp.UriSource = Uri(image_path, UriKind.Absolute)
-            bmp.CacheOption = BitmapCacheOption.OnLoad
-            bmp.EndInit()
-            bmp.Freeze()
-            return bmp
-        except Exception:
-            return None
-
     def _on_save_changes_clicked(self, sender, args):
         statuses_map = {}
         comments_map = {}
@@ -1447,8 +1321,7 @@ class ClashNavigatorWindow(forms.WPFWindow):
 
                 data_row["Статус"] = status
                 statuses_map[key] = status
-                if comment:
-                    comments_map[key] = comment
+                comments_map[key] = comment
         except Exception as exc:
             forms.alert(
                 "Не удалось собрать изменения: {}".format(exc),
@@ -1456,9 +1329,17 @@ class ClashNavigatorWindow(forms.WPFWindow):
             )
             return
 
-        save_statuses_to_xml(self._xml_path, statuses_map)
         try:
-            save_comments_map(self._comments_path, comments_map)
+            self._session.save_statuses(statuses_map)
+        except Exception as exc:
+            forms.alert(
+                "Не удалось сохранить статусы: {}".format(exc),
+                title="Пересечения",
+            )
+            return
+        try:
+            save_comments_map(self._comments_path, comments_map, self._comments)
+            self._comments.update(comments_map)
         except Exception as exc:
             forms.alert(
                 "Не удалось сохранить комментарии JSON: {}".format(exc),
@@ -1467,8 +1348,31 @@ class ClashNavigatorWindow(forms.WPFWindow):
             return
 
         out.print_md(
-            "✅ Сохранено: статусы в XML, комментарии в `{}`".format(
-                self._comments_path
+            "✅ Сохранено: статусы в `{}`, комментарии в `{}`".format(
+                self._session.journal.path, comment_journal_path(self._comments_path)
+            )
+        )
+
+    def _on_compact_clicked(self, sender, args):
+        self._on_save_changes_clicked(sender, args)
+
+        pending = self._session.pending_count()
+        if not pending:
+            out.print_md("Статусы в XML уже актуальны.")
+            return
+
+        try:
+            patched = self._session.compact()
+        except Exception as exc:
+            forms.alert(
+                "Не удалось записать статусы в XML: {}".format(exc),
+                title="Пересечения",
+            )
+            return
+
+        out.print_md(
+            "✅ Статусы записаны в XML: {} коллизий ({} в журнале)".format(
+                patched, pending
             )
         )
 
@@ -1505,63 +1409,79 @@ class ClashNavigatorWindow(forms.WPFWindow):
     def _on_filter_changed(self, sender, args):
         if self._suspend_filter_events:
             return
+        # Промежуточные нажатия только перезапускают таймер
+        self._filter_timer.Stop()
+        self._filter_timer.Start()
+
+    def _on_filter_timer_tick(self, sender, args):
+        self._filter_timer.Stop()
         self._apply_filters()
 
+    def _on_table_column_changed(self, sender, args):
+        # Статус редактируется в таблице — индекс значений колонки устарел
+        self._value_index.pop(str(args.Column.ColumnName), None)
+
     def _apply_filters(self):
         if self._view is None:
             return
 
+        self._filter_timer.Stop()
         term = (self.FilterTextBox.Text or "").strip()
-        parts = []
-
-        if term:
-            escaped = self._escape_row_filter_value(term)
-            parts.append(
-                "("
-                "[Модель NWC] LIKE '%{0}%' OR "
-                "[Проверка] LIKE '%{0}%' OR "
-                "[Пересечение] LIKE '%{0}%' OR "
-                "[ID] LIKE '%{0}%' OR "
-                "[ID_2] LIKE '%{0}%' OR "
-                "[Категория] LIKE '%{0}%' OR "
-                "[Категория_2] LIKE '%{0}%' OR "
-                "[Путь элемента] LIKE '%{0}%' OR "
-                "[Путь второго] LIKE '%{0}%'"
-                ")".format(escaped)
-            )
+        matched = self._search_index.search(term)
 
         for col_name, selected_values in self._column_value_filters.items():
-            escaped_col = self._escape_row_filter_column(col_name)
-            exprs = []
-            for value in selected_values:
-                escaped_val = self._escape_row_filter_literal(value)
-                exprs.append("[{}] = '{}'".format(escaped_col, escaped_val))
-            if exprs:
-                parts.append("({})".format(" OR ".join(exprs)))
-
-        if not parts:
-            self._view.RowFilter = ""
-            return
+            rows = self._rows_with_values(col_name, selected_values)
+            matched = rows if matched is None else matched & rows
 
-        try:
-            self._view.RowFilter = " AND ".join(parts)
-        except Exception:
+        if matched is None:
             self._view.RowFilter = ""
+            return
 
-    def _escape_row_filter_value(self, value):
-        value = value.replace("'", "''")
-        value = value.replace("[", "[[]")
-        value = value.replace("]", "[]]")
-        value = value.replace("%", "[%]")
-        value = value.replace("_", "[_]")
-        value = value.replace("*", "[*]")
-        return value
-
-    def _escape_row_filter_literal(self, value):
-        return value.replace("'", "''")
+        self._set_matched_rows(matched)
+        if not self._view.RowFilter:
+            self._view.RowFilter = "[{}] = '1'".format(self.MATCH_COLUMN)
+
+    def _rows_with_values(self, column_name, selected_values):
+        """Номера строк, где значение колонки входит в selected_values."""
+        values = self._value_index.get(column_name)
+        if values is None:
+            values = {}
+            for row_id, data_row in enumerate(self._source_table.Rows):
+                value = str(data_row[column_name] or "").strip()
+                values.setdefault(value, set()).add(row_id)
+            self._value_index[column_name] = values
+
+        rows = set()
+        for value in selected_values:
+            rows.update(values.get(value, ()))
+        return rows
+
+    def _set_matched_rows(self, matched):
+        """Меняет служебную колонку только у строк, сменивших видимость.
+
+        _matched_rows — строки с "1" в служебной колонке (None — все).
+        """
+        previous = self._matched_rows
+        if previous is None:
+            previous = set(range(self._search_index.row_count))
+        shown = matched - previous
+        hidden = previous - matched
+        self._matched_rows = matched
+        if not shown and not hidden:
+            return
 
-    def _escape_row_filter_column(self, value):
-        return value.replace("]", "]]")
+        table = self._source_table
+        table.ColumnChanged -= self._on_table_column_changed
+        table.BeginLoadData()
+        try:
+            rows = table.Rows
+            for row_id in shown:
+                rows[row_id][self.MATCH_COLUMN] = "1"
+            for row_id in hidden:
+                rows[row_id][self.MATCH_COLUMN] = ""
+        finally:
+            table.EndLoadData()
+            table.ColumnChanged += self._on_table_column_changed
 
     def _on_grid_double_click(self, sender, args):
         self._run_action_on_selected("select")
@@ -1572,8 +1492,17 @@ class ClashNavigatorWindow(forms.WPFWindow):
     def _on_crop_to_element_clicked(self, sender, args):
         self._run_action_on_selected("crop")
 
-    def _run_action_on_selected(self, action):
-        element_id = self._get_selected_element_id()
+    def _on_crop_to_zone_clicked(self, sender, args):
+        zone = self._zones.get(self._get_selected_value("Зона"))
+        if zone is None:
+            forms.alert("Выберите строку с зоной.", title="Пересечения")
+            return
+        element_ids, box = zone
+        self._run_action_on_selected("crop", element_ids, box)
+
+    def _run_action_on_selected(self, action, element_id=None, box=None):
+        if element_id is None:
+            element_id = self._get_selected_element_id()
         if element_id is None:
             forms.alert("Выберите строку с валидным ID.", title="Пересечения")
             return
@@ -1587,7 +1516,7 @@ class ClashNavigatorWindow(forms.WPFWindow):
             return
 
         try:
-            self._select_handler.set_target(element_id, action)
+            self._select_handler.set_target(element_id, action, box)
             result = self._select_external_event.Raise()
             if str(result) not in ("Accepted", "Pending"):
                 forms.alert(
@@ -1600,25 +1529,76 @@ class ClashNavigatorWindow(forms.WPFWindow):
                 title="Пересечения",
             )
 
-    def _get_selected_element_id(self):
+    def _get_selected_value(self, column_name):
         selected = self.ClashesGrid.SelectedItem
         if selected is None:
             return None
 
         try:
-            id_value = selected["ID"]
+            value = selected[column_name]
         except Exception:
             try:
-                id_value = selected.Row["ID"]
+                value = selected.Row[column_name]
             except Exception:
                 return None
+        return str(value or "")
+
+    def _get_selected_element_id(self):
+        id_value = self._get_selected_value("ID")
+        if id_value is None:
+            return None
 
         try:
-            return int(str(id_value))
+            return int(id_value)
         except Exception:
             return None
 
 
+def build_zones(rows, cache):
+    """Группирует коллизии строк навигатора в пространственные зоны.
+
+    Габарит коллизии — общий габарит её элементов из текущего документа.
+    id_other учитывается, только если path_other относится к текущей
+    модели: иначе это ID из связанной модели, и в текущем документе под
+    ним окажется чужой элемент.
+    Проставляет row["zone"] и возвращает {метка: ([ID элементов], габарит)}.
+    """
+    boxes = OrderedDict()
+    element_ids = {}
+    for row in rows:
+        key = row.get("clash_key")
+        fields = ["id"]
+        if cache.matches_current_model(row.get("path_other") or ""):
+            fields.append("id_other")
+        for field in fields:
+            try:
+                element_id = int(row.get(field))
+            except (TypeError, ValueError):
+                continue
+            box = cache.get_bounding_box(element_id)
+            if box is None:
+                continue
+            boxes[key] = union_box(boxes.get(key), box)
+            ids = element_ids.setdefault(key, [])
+            if element_id not in ids:
+                ids.append(element_id)
+
+    zones = {}
+    zone_of = {}
+    for zone in cluster_boxes(boxes.items(), ZONE_PAD, ZONE_MAX_EXTENT):
+        ids = []
+        for key in zone.keys:
+            zone_of[key] = zone.label
+            for element_id in element_ids[key]:
+                if element_id not in ids:
+                    ids.append(element_id)
+        zones[zone.label] = (ids, zone.box)
+
+    for row in rows:
+        row["zone"] = zone_of.get(row.get("clash_key"), "")
+    return zones
+
+
 def build_navigator_rows(grouped_by_model, comments_map):
     """Преобразует grouped_by_model в плоский набор строк для интерактивного грида."""
     rows = []
@@ -1761,15 +1741,31 @@ def main():
         forms.alert("Файл не выбран.", title="Пересечения")
         return
 
-    # Парсинг
-    parser = NavisworksReportParser(xml_path)
-    groups = parser.parse()
+    # Парсинг (или чтение из кэша)
+    session = ReportSession(xml_path)
+    groups = session.load()
 
     if not groups:
         forms.alert("Не удалось извлечь данные из отчёта.", title="Пересечения")
         return
 
+    # Сравнение с предыдущим отчётом
+    comments_path = comments_json_path(xml_path)
+    diff = apply_report_diff(session, comments_path)
+    if diff is not None:
+        counts = diff.counts()
+        out.print_md(
+            "**Сравнение с `{}`:** {}".format(
+                os.path.basename(os.path.dirname(diff.previous_path or "")),
+                ", ".join(
+                    "{} — {}".format(title, counts[state])
+                    for state, title in sorted(STATE_TITLES.items())
+                ),
+            )
+        )
+
     # Инициализация компонентов
+    element_cache.preload(groups)
     result_filter = ResultFilter(element_cache)
     model_grouping_builder = ModelGroupingBuilder(element_cache)
 
@@ -1780,7 +1776,6 @@ def main():
     filtered_groups = deduplicate_groups_by_clash_key(filtered_groups)
 
     grouped_by_model = model_grouping_builder.build(filtered_groups)
-    comments_path = comments_json_path(xml_path)
     comments_map = load_comments_map(comments_path)
 
     navigator_rows = build_navigator_rows(grouped_by_model, comments_map)
@@ -1794,12 +1789,22 @@ def main():
         forms.alert("Не найден Navigator.xaml рядом со скриптом.", title="Пересечения")
         return
 
+    # Габариты читаются здесь, в контексте Revit API, а не из окна
+    zones = build_zones(navigator_rows, element_cache)
+    if zones:
+        out.print_md(
+            "**Зоны:** {} на {} коллизий".format(
+                len(zones), len(set(row.get("clash_key") for row in navigator_rows))
+            )
+        )
+
     NAVIGATOR_WINDOW = ClashNavigatorWindow(
         navigator_rows,
         uidoc,
         NAVIGATOR_XAML_PATH,
-        xml_path,
+        session,
         comments_path,
+        zones,
     )
     NAVIGATOR_WINDOW.show(modal=False)
 
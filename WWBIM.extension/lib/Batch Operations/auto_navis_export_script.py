@@ -32,6 +32,7 @@ from Autodesk.Revit.DB import (
     Category,
     ElementId,
     ImportInstance,
+    ElementMulticategoryFilter,
     Options,
     GeometryElement,
     Solid,
@@ -44,12 +45,22 @@ from System.Collections.Generic import List
 # ваши либы
 import openbg
 import closebg
+from export_manifest import DONE, FAILED, SKIPPED, ExportManifest, run_date
+from export_queue import ExportQueue, default_owner, run_jobs
+from file_io import host_name
+from run_log import RunLogger
+from staging_cache import StagingCache
+from export_metrics import MetricsStore, find_regressions, format_report
+from export_records import ExportRecords, RevisionProbe
 
 SAVE_CREATED_VIEW = False
 
 OBJECTS_FILE = r"Y:\BIM\Scripts\Objects\AUTO_NWC\AUTO_NWC_Objects.txt"
 OBJECTS_BASE_DIR = r"Y:\BIM\Scripts\Objects"
 
+# Последние успешные экспорты моделей (ревизия исходника, путь NWC)
+EXPORT_RECORDS_FILE = r"Y:\BIM\Scripts\Objects\AUTO_NWC\export_records.json"
+
 # Логирование
 LOG_DIR = r"Y:\BIM\Scripts\Objects\AUTO_NWC\logs"
 
@@ -61,44 +72,79 @@ if not os.path.exists(LOG_DIR):
 
 today = datetime.datetime.now().strftime("%Y-%m-%d")
 log_file = os.path.join(LOG_DIR, "export_log_{}.txt".format(today))
+# Манифест ночного запуска этой машины (состояния моделей для продолжения после сбоя).
+# Ключ — дата ночи, а не календарная: сбой после полуночи продолжает тот же запуск
+RUN_DATE = run_date()
+MANIFEST_FILE = os.path.join(
+    LOG_DIR,
+    "manifest_{}_{}.json".format(RUN_DATE, host_name()),
+)
+
+# Общая очередь: несколько машин делят модели запуска без повторов.
+# Папка — по дате ночи, чтобы машины до и после полуночи попали в одну очередь
+USE_SHARED_QUEUE = True
+QUEUE_DIR = os.path.join(r"Y:\BIM\Scripts\Objects\AUTO_NWC\queue", RUN_DATE)
 service_log_file = os.path.join(LOG_DIR, "service_{}.txt".format(today))
 
+# История метрик моделей для отчёта о деградации: в общей папке, файл на машину
+METRICS_DIR = r"Y:\BIM\Scripts\Objects\AUTO_NWC\metrics"
+METRICS_KIND = "nwc"
+RUN_ID = "{} {}".format(
+    datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), default_owner()
+)
+_metrics_store = MetricsStore(METRICS_DIR, owner=host_name())
 
-def log(msg):
-    with codecs.open(log_file, "a", encoding="utf-8") as f:
-        ts = datetime.datetime.now().strftime("[%H:%M:%S]")
-        f.write("{} {}\n".format(ts, msg))
-    try:
-        print(msg)
-    except:
-        pass
+# Локальная копия исходной модели (staging_cache.py). Выключено: ночной
+# экспорт открывает только модели, изменённые после прошлой выгрузки, копия
+# каждый раз делается заново и лишь добавляет чтение модели с сетевого диска
+USE_STAGING_CACHE = False
+
+
+# Журнал пишется на сетевой диск пачками (текст + JSON-lines)
+run_logger = RunLogger(
+    log_file, os.path.join(LOG_DIR, "export_log_{}.jsonl".format(today))
+)
+service_logger = RunLogger(
+    service_log_file,
+    prefix="[auto_nwis_export]",
+    time_format="[%Y-%m-%d %H:%M:%S]",
+)
+
+
+def log(msg, **fields):
+    run_logger.write(msg, **fields)
 
 
 def service_log(msg):
     try:
-        ts = datetime.datetime.now().strftime("[%Y-%m-%d %H:%M:%S]")
-        log_line = "[auto_nwis_export] {} {}".format(ts, msg)
-        with codecs.open(service_log_file, "a", encoding="utf-8") as f:
-            f.write("{}\n".format(log_line))
-        print(log_line)
+        service_logger.write(msg)
     except:
         pass
 
 
 separator = "=" * 40
-with codecs.open(log_file, "a", encoding="utf-8") as f:
-    f.write("{}\n".format(separator))
-    f.write(
-        "NWC Export - {} {}\n".format(
-            today, datetime.datetime.now().strftime("%H:%M:%S")
-        )
-    )
-    f.write("{}\n\n".format(separator))
+run_logger.banner(
+    [
+        separator,
+        "NWC Export - {} {}".format(today, datetime.datetime.now().strftime("%H:%M:%S")),
+        separator,
+        "",
+    ]
+)
 
 log("File: {}".format(OBJECTS_FILE))
 log("Log: {}".format(log_file))
 service_log("Export process started")
 
+# Ревизии моделей Revit Server и записи о прошлых экспортах
+try:
+    _revision_probe = RevisionProbe(__revit__.Application.VersionNumber, log=log)
+except Exception:
+    _revision_probe = None
+
+_staging = StagingCache(log=log) if USE_STAGING_CACHE else None
+_export_records = ExportRecords(EXPORT_RECORDS_FILE)
+
 
 # Пункт 4: Подавление диалогов (из C# DailyNwcExport)
 class DialogSuppressor:
@@ -313,8 +359,23 @@ def normalize_revit_server_path(path):
     return path
 
 
+def get_source_revision(rvt_path, path_type, rvt_date):
+    """Ревизия исходной модели: для Revit Server — через REST API, иначе дата файла."""
+    if path_type == "revit_server":
+        if _revision_probe is None:
+            return None
+        return _revision_probe.revision(normalize_revit_server_path(rvt_path))
+    if rvt_date:
+        return rvt_date.strftime("%Y-%m-%d %H:%M:%S")
+    return None
+
+
 def check_need_export(rvt_path, nwc_folder, object_name):
-    """Проверяет, нужен ли экспорт (аналог C# CheckNeedExport)"""
+    """Проверяет, нужен ли экспорт (аналог C# CheckNeedExport).
+
+    Вызывается до открытия модели. Модель Revit Server пропускается,
+    если её ревизия совпадает с записью о последнем экспорте.
+    """
     result = {
         "need_export": False,
         "reason": "",
@@ -322,11 +383,15 @@ def check_need_export(rvt_path, nwc_folder, object_name):
         "nwc_date": None,
         "nwc_used_path": None,
         "target_nwc_path": None,
+        "revision": None,
     }
 
     try:
         result["path_type"] = get_path_type(rvt_path)
         result["rvt_date"] = get_file_modification_date(rvt_path, result["path_type"])
+        result["revision"] = get_source_revision(
+            rvt_path, result["path_type"], result["rvt_date"]
+        )
 
         rvt_filename = os.path.splitext(os.path.basename(rvt_path))[0]
         nwc_path1 = os.path.join(nwc_folder, rvt_filename + ".nwc")
@@ -370,8 +435,23 @@ def check_need_export(rvt_path, nwc_folder, object_name):
 
         # Проверка необходимости экспорта
         if result["path_type"] == "revit_server":
-            result["need_export"] = True
-            result["reason"] = "Revit Server (always export)"
+            record = _export_records.get(rvt_path) or {}
+            if not result["nwc_date"]:
+                result["need_export"] = True
+                result["reason"] = "NWC does not exist"
+            elif not result["revision"]:
+                result["need_export"] = True
+                result["reason"] = "Revit Server (revision unknown)"
+            elif record.get("revision") != result["revision"]:
+                result["need_export"] = True
+                result["reason"] = "Revit Server revision changed ({} -> {})".format(
+                    record.get("revision") or "-", result["revision"]
+                )
+            else:
+                result["need_export"] = False
+                result["reason"] = "Revit Server revision unchanged ({})".format(
+                    result["revision"]
+                )
         elif not result["nwc_date"]:
             result["need_export"] = True
             result["reason"] = "NWC does not exist"
@@ -391,30 +471,135 @@ def check_need_export(rvt_path, nwc_folder, object_name):
     return result
 
 
+# Модельные категории без экспортируемой геометрии: не учитываются в проверке
+PROBE_EXCLUDED_CATEGORIES = [
+    "OST_Lines",
+    "OST_SketchLines",
+    "OST_Cameras",
+    "OST_Rooms",
+    "OST_Areas",
+    "OST_MEPSpaces",
+    "OST_HVAC_Zones",
+    "OST_RvtLinks",
+    "OST_PointClouds",
+]
+
+# Категории, где габарит ещё не означает геометрию (пустые семейства,
+# только пустоты или линии, формы). Для них и для импортированных
+# категорий проверяется сама геометрия.
+PROBE_AMBIGUOUS_CATEGORIES = [
+    "OST_GenericModel",
+    "OST_Mass",
+    "OST_Entourage",
+    "OST_Planting",
+]
+
+
+def _probe_category_ids(doc, view):
+    """(однозначные, неоднозначные) Id модельных категорий, видимых в виде."""
+    excluded = set()
+    for name in PROBE_EXCLUDED_CATEGORIES:
+        eid = _cat_id(doc, _resolve_bic(name))
+        if eid:
+            excluded.add(eid.IntegerValue)
+    ambiguous_bic = set()
+    for name in PROBE_AMBIGUOUS_CATEGORIES:
+        eid = _cat_id(doc, _resolve_bic(name))
+        if eid:
+            ambiguous_bic.add(eid.IntegerValue)
+
+    solid_ids = List[ElementId]()
+    ambiguous_ids = List[ElementId]()
+    for c in doc.Settings.Categories:
+        try:
+            if c.CategoryType != CategoryType.Model:
+                continue
+            value = c.Id.IntegerValue
+            if value in excluded:
+                continue
+            if view.GetCategoryHidden(c.Id):
+                continue
+            # Импортированные категории (DWG и т.п.) не встроенные: Id >= 0
+            if value in ambiguous_bic or value >= 0:
+                ambiguous_ids.Add(c.Id)
+            else:
+                solid_ids.Add(c.Id)
+        except Exception:
+            continue
+    return solid_ids, ambiguous_ids
+
+
+def _view_collector(doc, view, category_ids):
+    return (
+        FilteredElementCollector(doc, view.Id)
+        .WherePasses(ElementMulticategoryFilter(category_ids))
+        .WhereElementIsNotElementType()
+    )
+
+
+def _view_count(doc, view, category_ids):
+    if category_ids.Count == 0:
+        return 0
+    return _view_collector(doc, view, category_ids).GetElementCount()
+
+
+def _has_extent(box, tolerance=1e-6):
+    if box is None:
+        return False
+    size = box.Max - box.Min
+    return size.X > tolerance or size.Y > tolerance or size.Z > tolerance
+
+
 def has_exportable_geometry(doc, view):
-    """Проверяет наличие экспортируемой геометрии в виде (из C# DailyNwcExport)"""
+    """Проверяет, есть ли в виде экспортируемая геометрия.
+
+    Ступени от дешёвой к дорогой, с выходом на первом найденном:
+    1) число элементов модельных категорий вида (0 — вид пуст);
+    2) габарит элементов однозначных категорий (стены, трубы и т.п.);
+    3) геометрия элементов неоднозначных категорий (обобщённые модели,
+       формы, импорт).
+    """
+    t_probe = coreutils.Timer()
     try:
         log("  Checking geometry in view...")
-        options = Options()
-        options.View = view
-        options.IncludeNonVisibleObjects = False
+        solid_ids, ambiguous_ids = _probe_category_ids(doc, view)
 
-        elements = FilteredElementCollector(doc, view.Id).WhereElementIsNotElementType()
+        found, tier = False, "category count"
+        solid_count = _view_count(doc, view, solid_ids)
+        ambiguous_count = _view_count(doc, view, ambiguous_ids)
 
-        for elem in elements:
-            try:
-                geo = elem.get_Geometry(options)
-                if geo is None:
+        if solid_count:
+            tier = "bounding box"
+            for elem in _view_collector(doc, view, solid_ids):
+                try:
+                    if _has_extent(elem.get_BoundingBox(view)):
+                        found = True
+                        break
+                except Exception:
                     continue
 
-                if _contains_exportable_geometry(geo):
-                    log("  Geometry found: True")
-                    return True
-            except:
-                continue
+        if not found and ambiguous_count:
+            tier = "geometry"
+            options = Options()
+            options.View = view
+            options.IncludeNonVisibleObjects = False
+            for elem in _view_collector(doc, view, ambiguous_ids):
+                try:
+                    if not _has_extent(elem.get_BoundingBox(view)):
+                        continue
+                    geo = elem.get_Geometry(options)
+                    if geo is not None and _contains_exportable_geometry(geo):
+                        found = True
+                        break
+                except Exception:
+                    continue
 
-        log("  Geometry found: False")
-        return False
+        log(
+            "  Geometry found: {} ({}, {:.2f} s; elements: {} + {} ambiguous)".format(
+                found, tier, t_probe.get_time(), solid_count, ambiguous_count
+            )
+        )
+        return found
     except Exception as e:
         log("  WARNING: Could not check geometry: {}".format(e))
         return True
@@ -898,65 +1083,101 @@ def export_view_to_nwc_safe_replace(doc, view, target_nwc_path):
 # ---------- main ----------
 
 
-def main():
-    log("=" * 60)
-    object_names = read_object_names()
-    if not object_names:
-        log("ERROR: No objects found")
-        log("=" * 60)
+def workset_filter(ws_name):
+    name = (ws_name or "").strip()
+    if name.startswith("00_"):
+        return False
+    name_lower = name.lower()
+    if "link" in name_lower or "связь" in name_lower:
+        return False
+    return True
+
+
+def export_model(index, total, obj_name, user_path):
+    """export_model_unlogged с границами модели в журнале."""
+    run_logger.begin_model(os.path.basename(user_path))
+    result = {}
+    try:
+        result = export_model_unlogged(index, total, obj_name, user_path)
+        return result
+    finally:
+        run_logger.end_model(
+            state=result.get("state"),
+            output=result.get("output"),
+            timings=result.get("timings"),
+        )
+        record_metrics(user_path, result)
+
+
+def record_metrics(user_path, result):
+    """Дописывает метрики модели в историю (пропущенные модели — нет)."""
+    state = result.get("state")
+    if state not in (DONE, FAILED):
         return
+    metrics = dict(result.get("timings") or {})
+    metrics["size_mb"] = result.get("size_mb")
+    metrics["elements"] = result.get("elements")
+    _metrics_store.append(METRICS_KIND, RUN_ID, user_path, state, metrics)
 
-    all_models = []
-    for obj_name in object_names:
-        models = read_model_paths(obj_name)
-        if models:
-            for model_path in models:
-                all_models.append((obj_name, model_path))
 
-    if not all_models:
-        log("ERROR: No models found for export")
-        log("=" * 60)
+def report_regressions():
+    """Модели этого запуска, у которых выросли время экспорта или размер."""
+    try:
+        regressions = find_regressions(_metrics_store.load(METRICS_KIND), run=RUN_ID)
+    except Exception as e:
+        log("WARNING: Metrics report failed: {}".format(e))
         return
+    for line in format_report(regressions):
+        log(line)
+    if regressions:
+        service_log("Metrics: {} regression(s), see export log".format(len(regressions)))
 
-    log("Total models: {}".format(len(all_models)))
-    log("=" * 60)
 
-    # Счётчики статистики
-    exported_count = 0
-    skipped_count = 0
-    error_count = 0
+def export_model_unlogged(index, total, obj_name, user_path):
+    """Экспорт одной модели. Возвращает итог для манифеста:
+    {"state": done/skipped/failed, "output", "revision", "message", "timings"}.
+    """
+    result = {
+        "state": FAILED,
+        "output": None,
+        "revision": None,
+        "message": None,
+        "timings": {},
+    }
 
-    t_all = coreutils.Timer()
-    for i, (obj_name, user_path) in enumerate(all_models):
-        model_name = os.path.basename(user_path)
-        file_wo_ext = os.path.splitext(model_name)[0]
-        dest_folder = read_export_folder(obj_name)
+    model_name = os.path.basename(user_path)
+    file_wo_ext = os.path.splitext(model_name)[0]
+    dest_folder = read_export_folder(obj_name)
 
-        out_file_expected = os.path.join(dest_folder, file_wo_ext + ".nwc")
-        log(
-            "[{}/{}] Object: {}, Model: {}".format(
-                i + 1, len(all_models), obj_name, model_name
-            )
+    out_file_expected = os.path.join(dest_folder, file_wo_ext + ".nwc")
+    log("[{}/{}] Object: {}, Model: {}".format(index, total, obj_name, model_name))
+    log("  -> {}".format(out_file_expected))
+
+    # Пункт 5: Проверка необходимости экспорта (до открытия модели)
+    export_check = check_need_export(user_path, dest_folder, obj_name)
+    result["revision"] = export_check["revision"]
+    log(
+        "  Export check: need={}, reason={}".format(
+            export_check["need_export"], export_check["reason"]
         )
-        log("  -> {}".format(out_file_expected))
+    )
 
-        mp = to_model_path(user_path)
-        if mp is None:
-            log("  ERROR: Cannot convert path to ModelPath")
-            continue
+    if not export_check["need_export"]:
+        log("  SKIP: {}".format(export_check["reason"]))
+        result["state"] = SKIPPED
+        result["message"] = export_check["reason"]
+        result["output"] = export_check["nwc_used_path"]
+        return result
 
-        t_open = coreutils.Timer()
+    mp = to_model_path(user_path)
+    if mp is None:
+        log("  ERROR: Cannot convert path to ModelPath")
+        result["message"] = "Cannot convert path to ModelPath"
+        return result
 
-        def workset_filter(ws_name):
-            name = (ws_name or "").strip()
-            if name.startswith("00_"):
-                return False
-            name_lower = name.lower()
-            if "link" in name_lower or "связь" in name_lower:
-                return False
-            return True
-
-        try:
+    t_open = coreutils.Timer()
+    try:
+        with run_logger.phase("open"):
             doc, failure_handler, dialog_suppressor = openbg.open_in_background(
                 __revit__.Application,
                 __revit__,
@@ -965,189 +1186,234 @@ def main():
                 worksets=("predicate", workset_filter),
                 detach=True,
                 suppress_dialogs=True,
+                timings=result["timings"],
+                staging=_staging,
             )
-        except Exception as e:
-            log("  ERROR: Cannot open model: {}".format(e))
-            continue
-        open_s = str(datetime.timedelta(seconds=int(t_open.get_time())))
-
-        if failure_handler is not None:
-            try:
-                summary = failure_handler.get_summary()
-                total_w = summary.get("total_warnings", 0)
-                total_e = summary.get("total_errors", 0)
-                if total_w > 0 or total_e > 0:
-                    log("  WARNING: {} warnings, {} errors".format(total_w, total_e))
-            except Exception:
-                pass
+    except Exception as e:
+        log("  ERROR: Cannot open model: {}".format(e))
+        result["message"] = "Cannot open model: {}".format(e)
+        return result
+    result["timings"]["open"] = round(t_open.get_time(), 1)
+    open_s = str(datetime.timedelta(seconds=int(t_open.get_time())))
 
+    if failure_handler is not None:
         try:
+            summary = failure_handler.get_summary()
+            total_w = summary.get("total_warnings", 0)
+            total_e = summary.get("total_errors", 0)
+            if total_w > 0 or total_e > 0:
+                log("  WARNING: {} warnings, {} errors".format(total_w, total_e))
+        except Exception:
+            pass
+
+    t_view = coreutils.Timer()
+    try:
+        with run_logger.phase("view"):
             view, created = find_or_create_navis_view(doc)
-        except Exception as e:
-            log("  ERROR: Cannot create Navisworks view: {}".format(e))
-            if dialog_suppressor is not None:
-                try:
-                    dialog_suppressor.detach()
-                except Exception:
-                    pass
+    except Exception as e:
+        log("  ERROR: Cannot create Navisworks view: {}".format(e))
+        if dialog_suppressor is not None:
             try:
-                closebg.close_with_policy(doc, do_sync=False, save_if_not_ws=False)
+                dialog_suppressor.detach()
             except Exception:
                 pass
-            continue
-
         try:
-            doc.Regenerate()
+            closebg.close_with_policy(doc, do_sync=False, save_if_not_ws=False)
         except Exception:
             pass
+        result["message"] = "Cannot create Navisworks view: {}".format(e)
+        return result
 
-        vis_count = count_visible_elements(doc, view)
-        log("  View: {}, Elements: {}".format(view.Name, vis_count))
-
-        # Пункт 5: Проверка необходимости экспорта
-        export_check = check_need_export(user_path, dest_folder, obj_name)
-        log(
-            "  Export check: need={}, reason={}".format(
-                export_check["need_export"], export_check["reason"]
-            )
-        )
+    try:
+        doc.Regenerate()
+    except Exception:
+        pass
+    result["timings"]["view"] = round(t_view.get_time(), 1)
 
-        if not export_check["need_export"]:
-            log("  SKIP: {}".format(export_check["reason"]))
-            log("  Open: {}, Export: 0:00:00".format(open_s))
-            skipped_count += 1
-            try:
-                closebg.close_with_policy(doc, do_sync=False, save_if_not_ws=False)
-            except:
-                pass
-            continue
+    vis_count = count_visible_elements(doc, view)
+    result["elements"] = vis_count
+    log("  View: {}, Elements: {}".format(view.Name, vis_count))
 
-        t_exp = coreutils.Timer()
-        api_ok, out_path = False, out_file_expected
-        err_text = None
-        skip_reason = None
+    t_exp = coreutils.Timer()
+    api_ok, out_path = False, out_file_expected
+    err_text = None
+    skip_reason = None
 
-        # Целевой путь для NWC
-        target_nwc = export_check["target_nwc_path"]
-        if target_nwc:
-            out_file_expected = target_nwc
-        else:
-            out_file_expected = os.path.join(dest_folder, file_wo_ext + ".nwc")
+    # Целевой путь для NWC
+    target_nwc = export_check["target_nwc_path"]
+    if target_nwc:
+        out_file_expected = target_nwc
+    else:
+        out_file_expected = os.path.join(dest_folder, file_wo_ext + ".nwc")
 
-        log("  Target NWC: {}".format(out_file_expected))
+    log("  Target NWC: {}".format(out_file_expected))
 
-        # Пункт 3: Проверка геометрии перед экспортом
-        has_geo = has_exportable_geometry(doc, view)
+    # Пункт 3: Проверка геометрии перед экспортом
+    has_geo = has_exportable_geometry(doc, view)
 
-        try:
-            if has_geo:
-                log("  Starting export to: {}".format(dest_folder))
+    try:
+        if has_geo:
+            log("  Starting export to: {}".format(dest_folder))
+            with run_logger.phase("export"):
                 safe_ok, safe_path, safe_error = export_view_to_nwc_safe_replace(
                     doc, view, out_file_expected
                 )
-                api_ok = safe_ok
-                out_path = safe_path
-                if safe_error:
-                    err_text = safe_error
-            else:
-                skip_reason = "View has no exportable geometry"
-                log("  SKIP: {}".format(skip_reason))
-                skipped_count += 1
-        except Exception as e:
-            err_msg = str(e)
-            ex_info = get_exception_info(e)
-            log("  EXPORT ERROR:")
-            log("    Type: {}".format(ex_info["type"]))
-            log("    Message: {}".format(err_msg))
-            if ex_info["args"]:
-                log("    Args: {}".format(ex_info["args"]))
-
-            if is_geometry_error(err_msg):
-                skip_reason = "Model contains no exportable geometry"
-                log("  SKIP: {}".format(skip_reason))
-                skipped_count += 1
-            else:
-                err_text = err_msg
-                log("  ERROR: {}".format(err_text))
+            api_ok = safe_ok
+            out_path = safe_path
+            if safe_error:
+                err_text = safe_error
+        else:
+            skip_reason = "View has no exportable geometry"
+            log("  SKIP: {}".format(skip_reason))
+    except Exception as e:
+        err_msg = str(e)
+        ex_info = get_exception_info(e)
+        log("  EXPORT ERROR:")
+        log("    Type: {}".format(ex_info["type"]))
+        log("    Message: {}".format(err_msg))
+        if ex_info["args"]:
+            log("    Args: {}".format(ex_info["args"]))
+
+        if is_geometry_error(err_msg):
+            skip_reason = "Model contains no exportable geometry"
+            log("  SKIP: {}".format(skip_reason))
+        else:
+            err_text = err_msg
+            log("  ERROR: {}".format(err_text))
 
-        file_ok = os.path.exists(out_path) and (os.path.getsize(out_path) > 0)
-        ok = (api_ok or file_ok) and (err_text is None)
-        exp_s = str(datetime.timedelta(seconds=int(t_exp.get_time())))
+    file_ok = os.path.exists(out_path) and (os.path.getsize(out_path) > 0)
+    ok = (api_ok or file_ok) and (err_text is None)
+    result["timings"]["export"] = round(t_exp.get_time(), 1)
+    exp_s = str(datetime.timedelta(seconds=int(t_exp.get_time())))
 
-        if file_ok and not api_ok and err_text is None:
-            log("  WARNING: API returned False but file exists")
+    if file_ok and not api_ok and err_text is None:
+        log("  WARNING: API returned False but file exists")
 
+    t_close = coreutils.Timer()
+    try:
+        closebg.close_with_policy(doc, do_sync=False, save_if_not_ws=False)
+    except Exception:
+        pass
+    result["timings"]["close"] = round(t_close.get_time(), 1)
+
+    if dialog_suppressor is not None:
         try:
-            closebg.close_with_policy(doc, do_sync=False, save_if_not_ws=False)
+            dialog_summary = dialog_suppressor.get_summary()
+            total_dialogs = dialog_summary.get("total_dialogs", 0)
+            if total_dialogs > 0:
+                log("  Dialogs suppressed: {}".format(total_dialogs))
+        except Exception:
+            pass
+        try:
+            dialog_suppressor.detach()
         except Exception:
             pass
 
-        if dialog_suppressor is not None:
-            try:
-                dialog_summary = dialog_suppressor.get_summary()
-                total_dialogs = dialog_summary.get("total_dialogs", 0)
-                if total_dialogs > 0:
-                    log("  Dialogs suppressed: {}".format(total_dialogs))
-            except Exception:
-                pass
-            try:
-                dialog_suppressor.detach()
-            except Exception:
-                pass
-
-        if skip_reason:
-            log("  SKIP: {}".format(skip_reason))
-            log("  Open: {}, Export: {}".format(open_s, exp_s))
-        elif ok:
-            exported_count += 1
-            # Размер файла
-            file_size = 0
-            try:
-                if out_path and os.path.exists(out_path):
-                    file_size = os.path.getsize(out_path) / (1024.0 * 1024.0)
-                    log("  SUCCESS: Open: {}, Export: {}".format(open_s, exp_s))
-                    log("  File: {} ({:.2f} MB)".format(out_path, file_size))
-                else:
-                    log("  SUCCESS: Open: {}, Export: {}".format(open_s, exp_s))
-                    log("  File: {}".format(out_path))
-            except:
+    if skip_reason:
+        log("  SKIP: {}".format(skip_reason))
+        log("  Open: {}, Export: {}".format(open_s, exp_s))
+        result["state"] = SKIPPED
+        result["message"] = skip_reason
+    elif ok:
+        result["state"] = DONE
+        result["output"] = out_path
+        if export_check["revision"]:
+            _export_records.update(user_path, export_check["revision"], out_path)
+        # Размер файла
+        file_size = 0
+        try:
+            if out_path and os.path.exists(out_path):
+                file_size = os.path.getsize(out_path) / (1024.0 * 1024.0)
+                result["size_mb"] = file_size
+                log("  SUCCESS: Open: {}, Export: {}".format(open_s, exp_s))
+                log("  File: {} ({:.2f} MB)".format(out_path, file_size))
+            else:
                 log("  SUCCESS: Open: {}, Export: {}".format(open_s, exp_s))
                 log("  File: {}".format(out_path))
-        else:
-            error_count += 1
-            # Детальная диагностика "Unknown error"
-            if err_text is None:
-                log("  ERROR: Export failed without exception")
-                if out_path:
-                    file_exists = os.path.exists(out_path)
-                    if file_exists:
-                        try:
-                            file_size = os.path.getsize(out_path)
-                            log(
-                                "  ERROR: File exists but export failed: {} bytes".format(
-                                    file_size
-                                )
-                            )
-                        except Exception as e:
-                            log(
-                                "  ERROR: File exists but cannot get size: {}".format(e)
+        except:
+            log("  SUCCESS: Open: {}, Export: {}".format(open_s, exp_s))
+            log("  File: {}".format(out_path))
+    else:
+        # Детальная диагностика "Unknown error"
+        if err_text is None:
+            log("  ERROR: Export failed without exception")
+            if out_path:
+                file_exists = os.path.exists(out_path)
+                if file_exists:
+                    try:
+                        file_size = os.path.getsize(out_path)
+                        log(
+                            "  ERROR: File exists but export failed: {} bytes".format(
+                                file_size
                             )
-                    else:
-                        log("  ERROR: File not created: {}".format(out_path))
+                        )
+                    except Exception as e:
+                        log("  ERROR: File exists but cannot get size: {}".format(e))
                 else:
-                    log("  ERROR: No output path specified")
+                    log("  ERROR: File not created: {}".format(out_path))
             else:
-                log("  ERROR: {}".format(err_text))
+                log("  ERROR: No output path specified")
+            result["message"] = "Export failed without exception"
+        else:
+            log("  ERROR: {}".format(err_text))
+            result["message"] = err_text
+    return result
+
+
+def main():
+    log("=" * 60)
+    object_names = read_object_names()
+    if not object_names:
+        log("ERROR: No objects found")
+        log("=" * 60)
+        return
+
+    all_models = []
+    for obj_name in object_names:
+        models = read_model_paths(obj_name)
+        if models:
+            for model_path in models:
+                all_models.append((obj_name, model_path))
+
+    if not all_models:
+        log("ERROR: No models found for export")
+        log("=" * 60)
+        return
+
+    log("Total models: {}".format(len(all_models)))
+
+    # Манифест запуска: после падения Revit продолжаем с незавершённой модели
+    manifest = ExportManifest(MANIFEST_FILE)
+    remaining = manifest.prepare(all_models)
+    if manifest.resumed:
+        log("Resuming run from manifest: {} models left".format(remaining))
+    log("Manifest: {}".format(MANIFEST_FILE))
+
+    queue = None
+    if USE_SHARED_QUEUE:
+        try:
+            queue = ExportQueue(QUEUE_DIR, max_attempts=manifest.max_attempts)
+            log("Queue: {} (owner {})".format(QUEUE_DIR, queue.owner))
+        except Exception as e:
+            log("WARNING: Shared queue unavailable, exporting all models: {}".format(e))
+    log("=" * 60)
+
+    t_all = coreutils.Timer()
+    counts = run_jobs(manifest, export_model, log, queue)
+    exported_count = counts.get(DONE, 0)
+    skipped_count = counts.get(SKIPPED, 0)
+    error_count = counts.get(FAILED, 0)
 
     all_s = str(datetime.timedelta(seconds=int(t_all.get_time())))
     log("")
     log("=== SUMMARY ===")
     log(
         "Total: {}, Exported: {}, Skipped: {}, Errors: {}".format(
-            len(all_models), exported_count, skipped_count, error_count
+            len(manifest.entries), exported_count, skipped_count, error_count
         )
     )
     log("=" * 60)
+    report_regressions()
     log("DONE. Total time: {}".format(all_s))
     log("=" * 60)
     service_log(
@@ -1158,4 +1424,8 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        run_logger.close()
+        service_logger.close()
@@ -17,14 +17,20 @@ if _lib_dir not in sys.path:
 
 from Autodesk.Revit.DB import (
     ModelPathUtils,
-    SaveAsOptions,
-    WorksharingSaveAsOptions,
     OpenOptions,
     DetachFromCentralOption,
 )
 
 import openbg
 import closebg
+from export_manifest import DONE, FAILED, SKIPPED, ExportManifest, run_date
+from export_queue import ExportQueue, default_owner, run_jobs
+from file_io import host_name
+from run_log import RunLogger
+from staging_cache import StagingCache
+from pipeline_stages import save_as
+from export_metrics import MetricsStore, find_regressions, format_report
+from export_records import RevisionProbe
 
 DETACH_MODE = "preserve"
 COMPACT_ON_SAVE = True
@@ -43,44 +49,78 @@ if not os.path.exists(LOG_DIR):
 
 today = datetime.datetime.now().strftime("%Y-%m-%d")
 log_file = os.path.join(LOG_DIR, "export_log_{}.txt".format(today))
+# Манифест ночного запуска этой машины (состояния моделей для продолжения после сбоя).
+# Ключ — дата ночи, а не календарная: сбой после полуночи продолжает тот же запуск
+RUN_DATE = run_date()
+MANIFEST_FILE = os.path.join(
+    LOG_DIR,
+    "manifest_{}_{}.json".format(RUN_DATE, host_name()),
+)
+
+# Общая очередь: несколько машин делят модели запуска без повторов.
+# Папка — по дате ночи, чтобы машины до и после полуночи попали в одну очередь
+USE_SHARED_QUEUE = True
+QUEUE_DIR = os.path.join(r"Y:\BIM\Scripts\Objects\AUTO_RVT\queue", RUN_DATE)
 service_log_file = os.path.join(LOG_DIR, "service_{}.txt".format(today))
 
+# История метрик моделей для отчёта о деградации: в общей папке, файл на машину
+METRICS_DIR = r"Y:\BIM\Scripts\Objects\AUTO_RVT\metrics"
+METRICS_KIND = "rvt"
+RUN_ID = "{} {}".format(
+    datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), default_owner()
+)
+_metrics_store = MetricsStore(METRICS_DIR, owner=host_name())
 
-def log(msg):
-    with codecs.open(log_file, "a", encoding="utf-8") as f:
-        ts = datetime.datetime.now().strftime("[%H:%M:%S]")
-        f.write("{} {}\n".format(ts, msg))
-    try:
-        print(msg)
-    except:
-        pass
+# Локальная копия исходной модели (staging_cache.py). Выключено: связи с
+# относительными путями при открытии копии ищутся рядом с ней, а не
+# рядом с исходником, и сохранённая модель получила бы неверные пути
+USE_STAGING_CACHE = False
+
+
+# Журнал пишется на сетевой диск пачками (текст + JSON-lines)
+run_logger = RunLogger(
+    log_file, os.path.join(LOG_DIR, "export_log_{}.jsonl".format(today))
+)
+service_logger = RunLogger(
+    service_log_file,
+    prefix="[auto_rvt_export]",
+    time_format="[%Y-%m-%d %H:%M:%S]",
+)
+
+
+def log(msg, **fields):
+    run_logger.write(msg, **fields)
 
 
 def service_log(msg):
     try:
-        ts = datetime.datetime.now().strftime("[%Y-%m-%d %H:%M:%S]")
-        log_line = "[auto_rvt_export] {} {}".format(ts, msg)
-        with codecs.open(service_log_file, "a", encoding="utf-8") as f:
-            f.write("{}\n".format(log_line))
-        print(log_line)
+        service_logger.write(msg)
     except:
         pass
 
 
 separator = "=" * 40
-with codecs.open(log_file, "a", encoding="utf-8") as f:
-    f.write("{}\n".format(separator))
-    f.write(
-        "RVT Export - {} {}\n".format(
-            today, datetime.datetime.now().strftime("%H:%M:%S")
-        )
-    )
-    f.write("{}\n\n".format(separator))
+run_logger.banner(
+    [
+        separator,
+        "RVT Export - {} {}".format(today, datetime.datetime.now().strftime("%H:%M:%S")),
+        separator,
+        "",
+    ]
+)
 
 log("File: {}".format(OBJECTS_FILE))
 log("Log: {}".format(log_file))
 service_log("Export process started")
 
+# Ревизия исходника для манифеста
+try:
+    _revision_probe = RevisionProbe(__revit__.Application.VersionNumber, log=log)
+except Exception:
+    _revision_probe = None
+
+_staging = StagingCache(log=log) if USE_STAGING_CACHE else None
+
 
 class DialogSuppressor:
     def __init__(self, log_func):
@@ -279,28 +319,13 @@ def default_export_root():
 
 
 def save_document(doc, full_path):
-    dst_dir = os.path.dirname(full_path)
-    if not os.path.exists(dst_dir):
-        try:
-            os.makedirs(dst_dir)
-        except Exception:
-            pass
-
-    mp_out = ModelPathUtils.ConvertUserVisiblePathToModelPath(full_path)
-
-    sao = SaveAsOptions()
-    sao.Compact = bool(COMPACT_ON_SAVE)
-    sao.OverwriteExistingFile = bool(OVERWRITE_SAME)
-
-    is_workshared = doc.IsWorkshared
-
-    if DETACH_MODE == "preserve" and is_workshared:
-        wsa = WorksharingSaveAsOptions()
-        wsa.SaveAsCentral = True
-        sao.SetWorksharingOptions(wsa)
-        doc.SaveAs(mp_out, sao)
-    else:
-        doc.SaveAs(mp_out, sao)
+    save_as(
+        doc,
+        full_path,
+        compact=COMPACT_ON_SAVE,
+        overwrite=OVERWRITE_SAME,
+        as_central=(DETACH_MODE == "preserve"),
+    )
 
 
 def is_workshared_file(mp):
@@ -315,65 +340,99 @@ def is_workshared_file(mp):
         return True
 
 
-def main():
-    log("=" * 60)
-    object_names = read_object_names()
-    if not object_names:
-        log("ERROR: No objects found")
-        log("=" * 60)
-        return
+def workset_filter(ws_name):
+    name = (ws_name or "").strip()
+    if name.startswith("00_"):
+        return False
+    name_lower = name.lower()
+    if "link" in name_lower or "связь" in name_lower:
+        return False
+    return True
 
-    all_models = []
-    for obj_name in object_names:
-        models = read_model_paths(obj_name)
-        if models:
-            for model_path in models:
-                all_models.append((obj_name, model_path))
 
-    if not all_models:
-        log("ERROR: No models found for export")
-        log("=" * 60)
-        return
-
-    log("Total models: {}".format(len(all_models)))
-    log("=" * 60)
+def get_source_revision(user_path):
+    """Ревизия исходной модели: для Revit Server — через REST API, иначе дата файла."""
+    if user_path.upper().startswith("RSN:"):
+        if _revision_probe is None:
+            return None
+        return _revision_probe.revision(user_path)
+    try:
+        return datetime.datetime.fromtimestamp(os.path.getmtime(user_path)).strftime(
+            "%Y-%m-%d %H:%M:%S"
+        )
+    except Exception:
+        return None
 
-    exported_count = 0
-    skipped_count = 0
-    error_count = 0
 
-    t_all = coreutils.Timer()
-    for i, (obj_name, user_path) in enumerate(all_models):
-        model_name = os.path.basename(user_path)
-        file_wo_ext = os.path.splitext(model_name)[0]
-        dest_folder = read_export_folder(obj_name)
-
-        out_file_expected = os.path.join(dest_folder, model_name)
-        log(
-            "[{}/{}] Object: {}, Model: {}".format(
-                i + 1, len(all_models), obj_name, model_name
-            )
+def export_model(index, total, obj_name, user_path):
+    """export_model_unlogged с границами модели в журнале."""
+    run_logger.begin_model(os.path.basename(user_path))
+    result = {}
+    try:
+        result = export_model_unlogged(index, total, obj_name, user_path)
+        return result
+    finally:
+        run_logger.end_model(
+            state=result.get("state"),
+            output=result.get("output"),
+            timings=result.get("timings"),
         )
-        log("  -> {}".format(out_file_expected))
+        record_metrics(user_path, result)
 
-        mp = to_model_path(user_path)
-        if mp is None:
-            log("  ERROR: Cannot convert path to ModelPath")
-            error_count += 1
-            continue
 
-        t_open = coreutils.Timer()
+def record_metrics(user_path, result):
+    """Дописывает метрики модели в историю (пропущенные модели — нет)."""
+    state = result.get("state")
+    if state not in (DONE, FAILED):
+        return
+    metrics = dict(result.get("timings") or {})
+    metrics["export"] = metrics.pop("save", None)
+    metrics["size_mb"] = result.get("size_mb")
+    metrics["elements"] = result.get("elements")
+    _metrics_store.append(METRICS_KIND, RUN_ID, user_path, state, metrics)
 
-        def workset_filter(ws_name):
-            name = (ws_name or "").strip()
-            if name.startswith("00_"):
-                return False
-            name_lower = name.lower()
-            if "link" in name_lower or "связь" in name_lower:
-                return False
-            return True
 
-        try:
+def report_regressions():
+    """Модели этого запуска, у которых выросли время экспорта или размер."""
+    try:
+        regressions = find_regressions(_metrics_store.load(METRICS_KIND), run=RUN_ID)
+    except Exception as e:
+        log("WARNING: Metrics report failed: {}".format(e))
+        return
+    for line in format_report(regressions):
+        log(line)
+    if regressions:
+        service_log("Metrics: {} regression(s), see export log".format(len(regressions)))
+
+
+def export_model_unlogged(index, total, obj_name, user_path):
+    """Сохранение одной модели. Возвращает итог для манифеста:
+    {"state": done/failed, "output", "revision", "message", "timings"}.
+    """
+    result = {
+        "state": FAILED,
+        "output": None,
+        "revision": get_source_revision(user_path),
+        "message": None,
+        "timings": {},
+    }
+
+    model_name = os.path.basename(user_path)
+    dest_folder = read_export_folder(obj_name)
+
+    out_file_expected = os.path.join(dest_folder, model_name)
+    log("[{}/{}] Object: {}, Model: {}".format(index, total, obj_name, model_name))
+    log("  -> {}".format(out_file_expected))
+
+    mp = to_model_path(user_path)
+    if mp is None:
+        log("  ERROR: Cannot convert path to ModelPath")
+        result["message"] = "Cannot convert path to ModelPath"
+        return result
+
+    t_open = coreutils.Timer()
+    try:
+        with run_logger.phase("open"):
             doc, failure_handler, dialog_suppressor = openbg.open_in_background(
                 __revit__.Application,
                 __revit__,
@@ -382,88 +441,144 @@ def main():
                 worksets=("predicate", workset_filter),
                 detach=True,
                 suppress_dialogs=True,
+                timings=result["timings"],
+                staging=_staging,
             )
-        except Exception as e:
-            log("  ERROR: Cannot open model: {}".format(e))
-            error_count += 1
-            continue
-        open_s = str(datetime.timedelta(seconds=int(t_open.get_time())))
+    except Exception as e:
+        log("  ERROR: Cannot open model: {}".format(e))
+        result["message"] = "Cannot open model: {}".format(e)
+        return result
+    result["timings"]["open"] = round(t_open.get_time(), 1)
+    open_s = str(datetime.timedelta(seconds=int(t_open.get_time())))
 
-        if failure_handler is not None:
-            try:
-                summary = failure_handler.get_summary()
-                total_w = summary.get("total_warnings", 0)
-                total_e = summary.get("total_errors", 0)
-                if total_w > 0 or total_e > 0:
-                    log("  WARNING: {} warnings, {} errors".format(total_w, total_e))
-                    if total_w > 0:
-                        warnings = summary.get("warnings", [])
-                        for idx, w in enumerate(warnings[:3], 1):
-                            log("    {}. {}".format(idx, w))
-                        if total_w > 3:
-                            log("    ... and {} more warnings".format(total_w - 3))
-                    if total_e > 0:
-                        errors = summary.get("errors", [])
-                        for idx, err in enumerate(errors[:2], 1):
-                            log("    Error {}: {}".format(idx, err))
-                        if total_e > 2:
-                            log("    ... and {} more errors".format(total_e - 2))
-            except Exception:
-                pass
-
-        t_save = coreutils.Timer()
-        ok, err = True, None
+    if failure_handler is not None:
         try:
+            summary = failure_handler.get_summary()
+            total_w = summary.get("total_warnings", 0)
+            total_e = summary.get("total_errors", 0)
+            if total_w > 0 or total_e > 0:
+                log("  WARNING: {} warnings, {} errors".format(total_w, total_e))
+                if total_w > 0:
+                    warnings = summary.get("warnings", [])
+                    for idx, w in enumerate(warnings[:3], 1):
+                        log("    {}. {}".format(idx, w))
+                    if total_w > 3:
+                        log("    ... and {} more warnings".format(total_w - 3))
+                if total_e > 0:
+                    errors = summary.get("errors", [])
+                    for idx, err in enumerate(errors[:2], 1):
+                        log("    Error {}: {}".format(idx, err))
+                    if total_e > 2:
+                        log("    ... and {} more errors".format(total_e - 2))
+        except Exception:
+            pass
+
+    t_save = coreutils.Timer()
+    ok, err = True, None
+    try:
+        with run_logger.phase("save"):
             save_document(doc, out_file_expected)
-        except Exception as e:
-            ok, err = False, str(e)
-        save_s = str(datetime.timedelta(seconds=int(t_save.get_time())))
+    except Exception as e:
+        ok, err = False, str(e)
+    result["timings"]["save"] = round(t_save.get_time(), 1)
+    save_s = str(datetime.timedelta(seconds=int(t_save.get_time())))
+
+    t_close = coreutils.Timer()
+    try:
+        closebg.close_with_policy(doc, do_sync=False, save_if_not_ws=False)
+    except Exception:
+        pass
+    result["timings"]["close"] = round(t_close.get_time(), 1)
 
+    if dialog_suppressor is not None:
         try:
-            closebg.close_with_policy(doc, do_sync=False, save_if_not_ws=False)
+            dialog_summary = dialog_suppressor.get_summary()
+            total_dialogs = dialog_summary.get("total_dialogs", 0)
+            if total_dialogs > 0:
+                log("  Dialogs suppressed: {}".format(total_dialogs))
+        except Exception:
+            pass
+        try:
+            dialog_suppressor.detach()
         except Exception:
             pass
 
-        if dialog_suppressor is not None:
-            try:
-                dialog_summary = dialog_suppressor.get_summary()
-                total_dialogs = dialog_summary.get("total_dialogs", 0)
-                if total_dialogs > 0:
-                    log("  Dialogs suppressed: {}".format(total_dialogs))
-            except Exception:
-                pass
-            try:
-                dialog_suppressor.detach()
-            except Exception:
-                pass
-
-        if ok and os.path.exists(out_file_expected):
-            exported_count += 1
-            file_size = 0
-            try:
-                if os.path.exists(out_file_expected):
-                    file_size = os.path.getsize(out_file_expected) / (1024.0 * 1024.0)
-                    log("  SUCCESS: Open: {}, Save: {}".format(open_s, save_s))
-                    log("  File: {} ({:.2f} MB)".format(out_file_expected, file_size))
-                else:
-                    log("  SUCCESS: Open: {}, Save: {}".format(open_s, save_s))
-                    log("  File: {}".format(out_file_expected))
-            except:
+    if ok and os.path.exists(out_file_expected):
+        result["state"] = DONE
+        result["output"] = out_file_expected
+        file_size = 0
+        try:
+            if os.path.exists(out_file_expected):
+                file_size = os.path.getsize(out_file_expected) / (1024.0 * 1024.0)
+                result["size_mb"] = file_size
+                log("  SUCCESS: Open: {}, Save: {}".format(open_s, save_s))
+                log("  File: {} ({:.2f} MB)".format(out_file_expected, file_size))
+            else:
                 log("  SUCCESS: Open: {}, Save: {}".format(open_s, save_s))
                 log("  File: {}".format(out_file_expected))
-        else:
-            error_count += 1
-            log("  ERROR: {}".format(err if err else "Unknown error"))
+        except:
+            log("  SUCCESS: Open: {}, Save: {}".format(open_s, save_s))
+            log("  File: {}".format(out_file_expected))
+    else:
+        result["message"] = err if err else "Unknown error"
+        log("  ERROR: {}".format(result["message"]))
+    return result
+
+
+def main():
+    log("=" * 60)
+    object_names = read_object_names()
+    if not object_names:
+        log("ERROR: No objects found")
+        log("=" * 60)
+        return
+
+    all_models = []
+    for obj_name in object_names:
+        models = read_model_paths(obj_name)
+        if models:
+            for model_path in models:
+                all_models.append((obj_name, model_path))
+
+    if not all_models:
+        log("ERROR: No models found for export")
+        log("=" * 60)
+        return
+
+    log("Total models: {}".format(len(all_models)))
+
+    # Манифест запуска: после падения Revit продолжаем с незавершённой модели
+    manifest = ExportManifest(MANIFEST_FILE)
+    remaining = manifest.prepare(all_models)
+    if manifest.resumed:
+        log("Resuming run from manifest: {} models left".format(remaining))
+    log("Manifest: {}".format(MANIFEST_FILE))
+
+    queue = None
+    if USE_SHARED_QUEUE:
+        try:
+            queue = ExportQueue(QUEUE_DIR, max_attempts=manifest.max_attempts)
+            log("Queue: {} (owner {})".format(QUEUE_DIR, queue.owner))
+        except Exception as e:
+            log("WARNING: Shared queue unavailable, exporting all models: {}".format(e))
+    log("=" * 60)
+
+    t_all = coreutils.Timer()
+    counts = run_jobs(manifest, export_model, log, queue)
+    exported_count = counts.get(DONE, 0)
+    skipped_count = counts.get(SKIPPED, 0)
+    error_count = counts.get(FAILED, 0)
 
     all_s = str(datetime.timedelta(seconds=int(t_all.get_time())))
     log("")
     log("=== SUMMARY ===")
     log(
         "Total: {}, Exported: {}, Skipped: {}, Errors: {}".format(
-            len(all_models), exported_count, skipped_count, error_count
+            len(manifest.entries), exported_count, skipped_count, error_count
         )
     )
     log("=" * 60)
+    report_regressions()
     log("DONE. Total time: {}".format(all_s))
     log("=" * 60)
     service_log(
@@ -474,4 +589,8 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        run_logger.close()
+        service_logger.close()
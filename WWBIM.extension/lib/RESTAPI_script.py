@@ -3,9 +3,15 @@
 import json
 import uuid
 
-import urllib.request as urllib_request
-from urllib.error import HTTPError, URLError
-from urllib.parse import urlencode
+try:
+    import urllib.request as urllib_request
+    from urllib.error import HTTPError, URLError
+    from urllib.parse import urlencode
+except ImportError:
+    # IronPython 2.7 (pyRevit)
+    import urllib2 as urllib_request
+    from urllib2 import HTTPError, URLError
+    from urllib import urlencode
 
 
 SERVER_URL = "http://192.168.88.178/RevitServerAdmin2023"
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+category_matcher.py — поиск категорий Revit в сегментах пути Navisworks.
+
+Сегмент совпадает с категорией, если одна строка содержит другую
+(обе — нормализованные ключи не короче MIN_LENGTH). Вместо перебора
+всех категорий для каждого сегмента строятся два автомата:
+
+- Ахо–Корасик по именам категорий — «категория внутри сегмента»;
+- обобщённый суффиксный автомат — «сегмент внутри категории».
+
+Оба запроса выполняются за время, линейное по длине сегмента.
+"""
+
+
+# Минимальная длина ключа категории и сегмента
+MIN_LENGTH = 4
+
+
+class CategoryMatcher(object):
+    """Сопоставление сегментов пути с набором ключей категорий."""
+
+    def __init__(self, keys, min_length=MIN_LENGTH):
+        self.min_length = min_length
+        self._keys = sorted(
+            set(k for k in keys if k and len(k) >= min_length),
+            key=lambda k: (len(k), k),
+        )
+        self._memo = {}
+
+        # Ахо–Корасик: переходы, суффиксные ссылки, самый длинный ключ
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [None]
+        self._build_automaton()
+
+        # Суффиксный автомат: переходы, ссылки, длины, владелец-категория
+        self._next = [{}]
+        self._link = [-1]
+        self._len = [0]
+        self._owner = [None]
+        self._build_suffix_automaton()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def find(self, segment):
+        """Возвращает ключ категории, совпадающий с сегментом, или None.
+
+        Приоритет у самой длинной категории внутри сегмента, затем —
+        у самой короткой категории, содержащей сегмент.
+        """
+        if not segment or len(segment) < self.min_length:
+            return None
+        if segment in self._memo:
+            return self._memo[segment]
+
+        result = self._find_contained(segment)
+        if result is None:
+            result = self._find_containing(segment)
+        self._memo[segment] = result
+        return result
+
+    # -------------------------------------------------------------------------
+    # Категория внутри сегмента
+    # -------------------------------------------------------------------------
+
+    def _build_automaton(self):
+        goto, fail, out = self._goto, self._fail, self._out
+        for index, key in enumerate(self._keys):
+            node = 0
+            for ch in key:
+                child = goto[node].get(ch)
+                if child is None:
+                    child = len(goto)
+                    goto[node][ch] = child
+                    goto.append({})
+                    fail.append(0)
+                    out.append(None)
+                node = child
+            out[node] = index
+
+        # Обход в ширину: ссылки и наследование лучшего совпадения
+        queue = list(goto[0].values())
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for ch, child in goto[node].items():
+                state = fail[node]
+                while state and ch not in goto[state]:
+                    state = fail[state]
+                target = goto[state].get(ch, 0)
+                fail[child] = target if target != child else 0
+                out[child] = self._longer(out[child], out[fail[child]])
+                queue.append(child)
+
+    def _longer(self, a, b):
+        # Ключи отсортированы по длине, больший индекс — длиннее
+        if a is None:
+            return b
+        if b is None:
+            return a
+        return max(a, b)
+
+    def _find_contained(self, segment):
+        goto, fail, out = self._goto, self._fail, self._out
+        best = None
+        node = 0
+        for ch in segment:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node] is not None:
+                best = self._longer(best, out[node])
+        return None if best is None else self._keys[best]
+
+    # -------------------------------------------------------------------------
+    # Сегмент внутри категории
+    # -------------------------------------------------------------------------
+
+    def _build_suffix_automaton(self):
+        for index, key in enumerate(self._keys):
+            last = 0
+            for ch in key:
+                last = self._extend(last, ch)
+                self._claim(last, index)
+
+        # Подстроки состояния встречаются и во всех ключах его потомков
+        order = sorted(range(1, len(self._len)), key=self._len.__getitem__, reverse=True)
+        for state in order:
+            parent = self._link[state]
+            if parent > 0:
+                self._claim(parent, self._owner[state])
+
+    def _claim(self, state, index):
+        # Владелец — самый короткий ключ (наименьший индекс)
+        owner = self._owner[state]
+        if owner is None or index < owner:
+            self._owner[state] = index
+
+    def _new_state(self, length, link, transitions):
+        self._next.append(transitions)
+        self._link.append(link)
+        self._len.append(length)
+        self._owner.append(None)
+        return len(self._len) - 1
+
+    def _clone(self, p, q, ch):
+        nxt, link, length = self._next, self._link, self._len
+        clone = self._new_state(length[p] + 1, link[q], dict(nxt[q]))
+        while p != -1 and nxt[p].get(ch) == q:
+            nxt[p][ch] = clone
+            p = link[p]
+        link[q] = clone
+        return clone
+
+    def _extend(self, last, ch):
+        nxt, link, length = self._next, self._link, self._len
+
+        # Переход уже есть — новый ключ повторяет известную подстроку
+        q = nxt[last].get(ch)
+        if q is not None:
+            if length[last] + 1 == length[q]:
+                return q
+            return self._clone(last, q, ch)
+
+        cur = self._new_state(length[last] + 1, 0, {})
+        p = last
+        while p != -1 and ch not in nxt[p]:
+            nxt[p][ch] = cur
+            p = link[p]
+        if p != -1:
+            q = nxt[p][ch]
+            if length[p] + 1 == length[q]:
+                link[cur] = q
+            else:
+                link[cur] = self._clone(p, q, ch)
+        return cur
+
+    def _find_containing(self, segment):
+        nxt = self._next
+        state = 0
+        for ch in segment:
+            state = nxt[state].get(ch)
+            if state is None:
+                return None
+        owner = self._owner[state]
+        return None if owner is None else self._keys[owner]
@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""
+clash_batch.py — пакетная обработка папки XML-отчётов вне Revit.
+
+Запуск в обычном CPython (например, по расписанию на сервере):
+
+    python clash_batch.py <папка> [--workers N] [--no-html] [--summary FILE]
+
+Отчёты разбираются в пуле процессов парсером кнопки «Анализ отчёта HTML»
+(HTML_script.parse_xml), один раз на отчёт. Из тех же строк строятся
+сводка <отчёт>.summary.json (число коллизий по проверкам, статусам
+Navisworks, разделам и моделям — как в HTML-отчёте) и, если не указан
+--no-html, сам HTML-отчёт. Одноимённые отчёты из датированных подпапок обрабатываются одним
+процессом по порядку, чтобы не писать в общий журнал истории параллельно.
+"""
+
+from __future__ import print_function
+
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+
+from file_io import write_json_atomic
+from clash_report import probe_report_date
+
+
+SUMMARY_SUFFIX = ".summary.json"
+
+SUMMARY_FORMAT = 1
+
+UNKNOWN_MODEL = u"Без модели"
+
+HTML_SCRIPT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    u"WW.BIM.tab",
+    u"BIM.panel",
+    u"Координация.stack",
+    u"Координация.pulldown",
+    u"Анализ отчёта HTML.pushbutton",
+    u"HTML_script.py",
+)
+
+# Модуль HTML-отчёта, загружается в каждом процессе один раз
+_html_module = None
+
+
+def summary_path(xml_path):
+    """Путь к сводке рядом с XML."""
+    base, _ = os.path.splitext(xml_path)
+    return base + SUMMARY_SUFFIX
+
+
+def find_reports(directory):
+    """Все XML-отчёты папки и подпапок, сгруппированные по имени файла."""
+    families = {}
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if not name.lower().endswith(".xml"):
+                continue
+            path = os.path.join(root, name)
+            families.setdefault(name.lower(), []).append(path)
+
+    result = []
+    for name in sorted(families):
+        paths = families[name]
+        paths.sort(key=_mtime)
+        result.append(paths)
+    return result
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except Exception:
+        return 0
+
+
+def load_html_module():
+    """Модуль HTML_script.py кнопки «Анализ отчёта HTML»."""
+    global _html_module
+    if _html_module is None:
+        try:
+            import importlib.util
+
+            spec = importlib.util.spec_from_file_location("clash_html_report", HTML_SCRIPT)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+        except ImportError:
+            import imp
+
+            module = imp.load_source("clash_html_report", HTML_SCRIPT.encode("utf-8"))
+        _html_module = module
+    return _html_module
+
+
+def report_date(xml_path):
+    """(дата, источник): атрибут даты в начале отчёта или дата изменения файла."""
+    value = probe_report_date(xml_path)
+    if value:
+        return value, u"из XML"
+    try:
+        stamp = time.localtime(os.path.getmtime(xml_path))
+        return time.strftime("%d.%m.%Y %H:%M", stamp), u"по дате изменения файла"
+    except Exception:
+        return "", ""
+
+
+def _count(counts, key):
+    counts[key] = counts.get(key, 0) + 1
+
+
+def summarize_rows(rows, html_module):
+    """Сводка по строкам HTML-отчёта; каждая коллизия считается один раз.
+
+    Коллизии и статусы считаются так же, как statusCounts HTML-отчёта.
+    В разделах и моделях коллизия учитывается для каждой из двух сторон,
+    если они различаются.
+    """
+    unique_rows = html_module.dedup_rows(rows)
+    tests = {}
+    statuses = {}
+    sections = {}
+    models = {}
+
+    for row in unique_rows:
+        _count(tests, row.get("testname") or u"")
+        _count(statuses, row.get("status") or u"")
+
+        clash_models = []
+        for file_name in (row.get("fileA"), row.get("fileB")):
+            model = os.path.splitext(file_name)[0] if file_name else None
+            if model and model not in clash_models:
+                clash_models.append(model)
+        if not clash_models:
+            clash_models.append(UNKNOWN_MODEL)
+
+        clash_sections = []
+        for model in clash_models:
+            _count(models, model)
+            section = html_module.section_from_filename(model)
+            if section not in clash_sections:
+                clash_sections.append(section)
+        for section in clash_sections:
+            _count(sections, section)
+
+    return {
+        "total": len(unique_rows),
+        "tests": tests,
+        "statuses": statuses,
+        "sections": sections,
+        "models": models,
+    }
+
+
+def write_summary(xml_path, summary):
+    """Сохраняет сводку рядом с отчётом (атомарно)."""
+    try:
+        write_json_atomic(summary_path(xml_path), summary, indent=1, sort_keys=True)
+        return True
+    except Exception:
+        return False
+
+
+def process_report(xml_path, html=True):
+    """Разбирает один отчёт; возвращает сводку (с ошибкой в "error")."""
+    started = time.time()
+    result = {"format": SUMMARY_FORMAT, "report": os.path.abspath(xml_path)}
+    try:
+        html_module = load_html_module()
+        rows = html_module.parse_xml(xml_path)
+        result.update(summarize_rows(rows, html_module))
+        result["date"] = list(report_date(xml_path))
+
+        if html and rows:
+            history = html_module.find_history_reports(
+                xml_path, limit=5, main_rows=rows
+            )
+            result["html"] = html_module.build_html(xml_path, rows, history)
+    except Exception as ex:
+        result["error"] = u"{}".format(ex)
+
+    result["seconds"] = round(time.time() - started, 3)
+    write_summary(xml_path, result)
+    return result
+
+
+def process_family(task):
+    """Обрабатывает одноимённые отчёты по порядку (для пула процессов)."""
+    paths, html = task
+    return [process_report(path, html) for path in paths]
+
+
+def run(directory, workers=None, html=True):
+    """Обрабатывает все отчёты папки; возвращает список сводок."""
+    families = find_reports(directory)
+    tasks = [(paths, html) for paths in families]
+    if not tasks:
+        return []
+
+    workers = max(1, min(workers or multiprocessing.cpu_count(), len(tasks)))
+    if workers == 1:
+        chunks = [process_family(task) for task in tasks]
+    else:
+        pool = multiprocessing.Pool(workers)
+        try:
+            chunks = pool.map(process_family, tasks, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+
+    results = []
+    for chunk in chunks:
+        results.extend(chunk)
+    return results
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description=u"Пакетная обработка XML-отчётов Navisworks о пересечениях."
+    )
+    parser.add_argument("directory", help=u"папка с отчётами (с подпапками)")
+    parser.add_argument(
+        "--workers", type=int, default=None, help=u"число процессов (по умолчанию — число ядер)"
+    )
+    parser.add_argument(
+        "--no-html", action="store_true", help=u"не строить HTML-отчёты"
+    )
+    parser.add_argument(
+        "--summary", default=None, help=u"общий JSON со сводками всех отчётов"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    if not os.path.isdir(args.directory):
+        print(u"Папка не найдена: {}".format(args.directory))
+        return 2
+
+    started = time.time()
+    results = run(args.directory, args.workers, not args.no_html)
+
+    errors = 0
+    for result in results:
+        if result.get("error"):
+            errors += 1
+            print(u"[ОШИБКА] {}: {}".format(result["report"], result["error"]))
+        else:
+            print(
+                u"{:>7}  {}  ({} с)".format(
+                    result.get("total", 0), result["report"], result["seconds"]
+                )
+            )
+
+    if args.summary:
+        with io.open(args.summary, "w", encoding="utf-8") as f:
+            f.write(
+                u"{}".format(
+                    json.dumps(results, ensure_ascii=False, indent=1, sort_keys=True)
+                )
+            )
+
+    print(
+        u"Отчётов: {}, ошибок: {}, время: {:.1f} с".format(
+            len(results), errors, time.time() - started
+        )
+    )
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
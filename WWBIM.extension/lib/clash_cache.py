@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+clash_cache.py — кэш разобранных XML-отчётов Navisworks.
+
+Разобранные строки, дата отчёта и список проверок хранятся в JSON-lines
+под %LOCALAPPDATA%. Запись действительна, пока у отчёта не изменились
+путь, размер, время изменения и версия парсера.
+"""
+
+import io
+import os
+import json
+import hashlib
+import tempfile
+
+from file_io import write_text_atomic
+
+
+# Версия формата файла кэша
+CACHE_FORMAT = 1
+
+# Сколько отчётов держать в кэше
+MAX_ENTRIES = 50
+
+ROW_FIELDS = ("name", "img", "id", "id_other", "path", "path_other", "status", "clash_key")
+
+
+def default_cache_dir():
+    """Папка кэша отчётов в %LOCALAPPDATA%."""
+    base = os.environ.get("LOCALAPPDATA") or tempfile.gettempdir()
+    return os.path.join(base, "pyRevit", "WWBIM", "clash_cache")
+
+
+def file_signature(path):
+    """(нормализованный путь, размер, mtime в мс) или None."""
+    try:
+        st = os.stat(path)
+    except Exception:
+        return None
+    norm = os.path.normcase(os.path.abspath(path))
+    return norm, int(st.st_size), int(round(st.st_mtime * 1000))
+
+
+def _is_mirror(row, other):
+    """other — та же коллизия с переставленными объектами."""
+    return (
+        other.get("clash_key") == row.get("clash_key")
+        and other.get("id") == row.get("id_other")
+        and other.get("id_other") == row.get("id")
+        and other.get("path") == row.get("path_other")
+        and other.get("path_other") == row.get("path")
+        and other.get("name") == row.get("name")
+        and other.get("img") == row.get("img")
+        and other.get("status") == row.get("status")
+    )
+
+
+def _mirror(row):
+    mirrored = dict(row)
+    mirrored["id"], mirrored["id_other"] = row.get("id_other"), row.get("id")
+    mirrored["path"], mirrored["path_other"] = row.get("path_other"), row.get("path")
+    return mirrored
+
+
+class CachedReport(object):
+    """Содержимое записи кэша."""
+
+    def __init__(self, groups, report_date, tests):
+        self.groups = groups
+        self.report_date = report_date
+        self.tests = tests
+
+
+class ReportCache(object):
+    """Кэш одного XML-отчёта."""
+
+    def __init__(self, xml_path, parser_version, cache_dir=None, fields=ROW_FIELDS):
+        self.xml_path = xml_path
+        self.parser_version = parser_version
+        self.fields = tuple(fields)
+        self.cache_dir = cache_dir or default_cache_dir()
+
+        norm = os.path.normcase(os.path.abspath(xml_path))
+        digest = hashlib.sha1(norm.encode("utf-8")).hexdigest()
+        self.cache_path = os.path.join(self.cache_dir, digest + ".jsonl")
+
+    def _header(self, signature):
+        path, size, mtime = signature
+        return {
+            "format": CACHE_FORMAT,
+            "parser": self.parser_version,
+            "path": path,
+            "size": size,
+            "mtime": mtime,
+            "fields": list(self.fields),
+        }
+
+    def load(self):
+        """Возвращает CachedReport или None, если записи нет или она устарела."""
+        signature = file_signature(self.xml_path)
+        if signature is None or not os.path.exists(self.cache_path):
+            return None
+
+        try:
+            with io.open(self.cache_path, "r", encoding="utf-8") as f:
+                header = json.loads(f.readline())
+                expected = self._header(signature)
+                for key, value in expected.items():
+                    if header.get(key) != value:
+                        return None
+                body = u",".join(line.strip() for line in f if line.strip())
+            records = json.loads(u"[" + body + u"]")
+        except Exception:
+            return None
+
+        tests = list(header.get("tests") or [])
+        groups = dict((name, []) for name in tests)
+        for record in records:
+            test_name = tests[record[0]]
+            row = dict(zip(self.fields, record[2:]))
+            rows = groups[test_name]
+            rows.append(row)
+            if record[1]:
+                rows.append(_mirror(row))
+
+        date = header.get("date") or ["", ""]
+        return CachedReport(groups, (date[0], date[1]), tests)
+
+    def save(self, groups, report_date=None):
+        """Сохраняет разобранные строки; ошибки записи не критичны."""
+        signature = file_signature(self.xml_path)
+        if signature is None:
+            return False
+
+        tests = sorted(groups.keys())
+        test_index = dict((name, i) for i, name in enumerate(tests))
+        header = self._header(signature)
+        header["tests"] = tests
+        header["date"] = list(report_date or ("", ""))
+
+        lines = [json.dumps(header, ensure_ascii=False)]
+        for test_name in tests:
+            rows = groups[test_name]
+            i = 0
+            while i < len(rows):
+                row = rows[i]
+                mirrored = i + 1 < len(rows) and _is_mirror(row, rows[i + 1])
+                record = [test_index[test_name], 1 if mirrored else 0]
+                record.extend(row.get(field) for field in self.fields)
+                lines.append(json.dumps(record, ensure_ascii=False))
+                i += 2 if mirrored else 1
+
+        try:
+            write_text_atomic(self.cache_path, u"".join(line + u"\n" for line in lines))
+        except Exception:
+            return False
+
+        self._prune()
+        return True
+
+    def invalidate(self):
+        try:
+            if os.path.exists(self.cache_path):
+                os.remove(self.cache_path)
+        except Exception:
+            pass
+
+    def _prune(self):
+        """Удаляет самые старые записи сверх MAX_ENTRIES."""
+        try:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(".jsonl"):
+                    path = os.path.join(self.cache_dir, name)
+                    entries.append((os.path.getmtime(path), path))
+            entries.sort()
+            for _, path in entries[:-MAX_ENTRIES]:
+                os.remove(path)
+        except Exception:
+            pass
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+clash_diff.py — сравнение очередного отчёта о пересечениях с предыдущим.
+
+Коллизии сопоставляются по ключу build_clash_key (проверка, имя, пара ID)
+через словари, поэтому сравнение линейно по числу строк. Каждая коллизия
+получает состояние: новая, осталась, устранена или вернулась (была
+устранена в одном из прошлых отчётов). Итог сохраняется рядом с отчётом
+в <отчёт>.diff.json и служит «памятью» для сравнения со следующим.
+
+Предыдущий отчёт выбирается по дате из самого XML, затем по дате в имени
+папки; время изменения файла — последний довод: его сдвигают копирование
+и переписывание отчёта при сохранении статусов.
+"""
+
+import io
+import os
+import json
+from datetime import datetime
+
+from clash_cache import file_signature
+from file_io import write_json_atomic
+from clash_history import family_reports
+from clash_report import parse_report_datetime, probe_report_date
+
+
+NEW = "new"
+PERSISTING = "persisting"
+RESOLVED = "resolved"
+REAPPEARED = "reappeared"
+
+STATE_TITLES = {
+    NEW: u"Появилась",
+    PERSISTING: u"Осталась",
+    RESOLVED: u"Устранена",
+    REAPPEARED: u"Вернулась",
+}
+
+DIFF_FORMAT = 1
+
+
+def diff_json_path(xml_path):
+    """Путь к результату сравнения рядом с XML."""
+    base, _ = os.path.splitext(xml_path)
+    return base + ".diff.json"
+
+
+def clash_keys(groups):
+    """Множество ключей коллизий из dict: test_name -> [rows]."""
+    keys = set()
+    for rows in groups.values():
+        for row in rows:
+            key = row.get("clash_key")
+            if key:
+                keys.add(key)
+    return keys
+
+
+class ClashDiff(object):
+    """Результат сравнения двух отчётов.
+
+    states — состояние каждой коллизии текущего отчёта и устранённых;
+    resolved — все ключи, устранённые к моменту текущего отчёта и не
+    вернувшиеся в нём (передаются в сравнение со следующим отчётом).
+    """
+
+    def __init__(self, states, resolved, previous_path=None):
+        self.states = states
+        self.resolved = resolved
+        self.previous_path = previous_path
+
+    def compares_with(self, previous_path):
+        """Сравнение сделано с этим же предыдущим отчётом (папка и имя;
+        общая папка на разных машинах может быть подключена по-разному)."""
+        if not self.previous_path or not previous_path:
+            return False
+        return _family_key(self.previous_path) == _family_key(previous_path)
+
+    def keys_in(self, *states):
+        wanted = set(states)
+        return [key for key, state in self.states.items() if state in wanted]
+
+    def counts(self):
+        result = dict((state, 0) for state in STATE_TITLES)
+        for state in self.states.values():
+            result[state] += 1
+        return result
+
+    def to_json(self):
+        return {
+            "format": DIFF_FORMAT,
+            "previous": self.previous_path,
+            "states": self.states,
+            "resolved": sorted(self.resolved),
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        if not isinstance(data, dict) or data.get("format") != DIFF_FORMAT:
+            return None
+        return cls(
+            dict(data.get("states") or {}),
+            set(data.get("resolved") or []),
+            data.get("previous"),
+        )
+
+
+def diff_keys(current_keys, previous_keys, resolved_before=(), previous_path=None):
+    """Классифицирует ключи текущего отчёта относительно предыдущего."""
+    current_keys = set(current_keys)
+    previous_keys = set(previous_keys)
+    resolved_before = set(resolved_before)
+
+    states = {}
+    for key in current_keys:
+        if key in previous_keys:
+            states[key] = PERSISTING
+        elif key in resolved_before:
+            states[key] = REAPPEARED
+        else:
+            states[key] = NEW
+
+    resolved_now = previous_keys - current_keys
+    for key in resolved_now:
+        states[key] = RESOLVED
+
+    resolved = (resolved_before | resolved_now) - current_keys
+    return ClashDiff(states, resolved, previous_path)
+
+
+def carry_forward(diff, previous_values, current_values, states=(PERSISTING,)):
+    """Значения предыдущего отчёта для коллизий в состояниях states.
+
+    Переносится только то, чего ещё нет в current_values;
+    возвращает dict: clash_key -> значение.
+    """
+    result = {}
+    for key in diff.keys_in(*states):
+        value = previous_values.get(key)
+        if value and not current_values.get(key):
+            result[key] = value
+    return result
+
+
+def load_diff(xml_path):
+    """Сохранённый результат сравнения для отчёта или None."""
+    path = diff_json_path(xml_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        with io.open(path, "r", encoding="utf-8") as f:
+            return ClashDiff.from_json(json.load(f))
+    except Exception:
+        return None
+
+
+def save_diff(xml_path, diff):
+    """Сохраняет результат сравнения рядом с отчётом (атомарно)."""
+    try:
+        write_json_atomic(diff_json_path(xml_path), diff.to_json())
+        return True
+    except Exception:
+        return False
+
+
+def _family_key(path):
+    path = os.path.normcase(os.path.normpath(path))
+    return os.path.join(os.path.basename(os.path.dirname(path)), os.path.basename(path))
+
+
+def report_order_key(path, signature):
+    """Ключ хронологии отчёта: (дата отчёта, mtime в мс).
+
+    Дата берётся из XML, иначе из имени папки, иначе из mtime.
+    """
+    moment = parse_report_datetime(probe_report_date(path))
+    if moment is None:
+        moment = parse_report_datetime(os.path.basename(os.path.dirname(path)))
+    if moment is None:
+        moment = datetime.fromtimestamp(signature[2] / 1000.0)
+    return moment, signature[2]
+
+
+def find_previous_report(xml_path):
+    """Ближайший более ранний одноимённый отчёт из соседних папок или None."""
+    xml_path = os.path.abspath(xml_path)
+    current = file_signature(xml_path)
+    if current is None:
+        return None
+    current_key = report_order_key(xml_path, current)
+
+    base_dir = os.path.dirname(os.path.dirname(xml_path))
+    best = None
+    for path in family_reports(base_dir, os.path.basename(xml_path)).values():
+        signature = file_signature(path)
+        if signature is None or signature[0] == current[0]:
+            continue
+        key = report_order_key(path, signature)
+        if key < current_key and (best is None or key > best[1]):
+            best = (path, key)
+    return best[0] if best else None
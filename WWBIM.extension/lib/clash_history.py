@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+clash_history.py — история сводок по отчётам одного семейства.
+
+Семейство — одноимённые XML-отчёты в датированных подпапках одной базовой
+папки (...\\Отчёт для ВК\\ГГГГ.ММ.ДД\\<имя>.xml). Сводка каждого отчёта
+(итого, статусы, разделы) считается один раз и дописывается JSON-строкой
+в <база>\\<имя>.history.jsonl; при построении динамики старые XML больше
+не читаются. Запись пересчитывается, только если у файла изменились
+размер или время изменения.
+"""
+
+import io
+import os
+import json
+
+from clash_cache import file_signature
+from file_io import write_text_atomic
+
+
+HISTORY_SUFFIX = ".history.jsonl"
+
+# Во сколько раз число строк может превышать число отчётов до сжатия
+COMPACT_RATIO = 2
+
+
+def history_path(base_dir, report_name):
+    """Путь к файлу истории семейства отчётов."""
+    stem = os.path.splitext(os.path.basename(report_name))[0]
+    return os.path.join(base_dir, stem + HISTORY_SUFFIX)
+
+
+class HistoryStore(object):
+    """Журнал сводок отчётов: одна JSON-строка на отчёт, последняя побеждает."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lines = 0
+
+    def load(self):
+        """Возвращает dict: относительный путь отчёта -> сводка."""
+        entries = {}
+        self._lines = 0
+        if not os.path.exists(self.path):
+            return entries
+
+        try:
+            with io.open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if isinstance(entry, dict) and entry.get("path"):
+                        entries[entry["path"]] = entry
+                        self._lines += 1
+        except Exception:
+            return {}
+        return entries
+
+    def add(self, entry):
+        """Дописывает сводку; папка отчётов может быть только для чтения."""
+        try:
+            with io.open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False, sort_keys=True) + u"\n")
+            self._lines += 1
+            return True
+        except Exception:
+            return False
+
+    def compact(self, entries):
+        """Переписывает журнал по одной строке на отчёт."""
+        text = u"".join(
+            json.dumps(entries[key], ensure_ascii=False, sort_keys=True) + u"\n"
+            for key in sorted(entries)
+        )
+        try:
+            write_text_atomic(self.path, text)
+            self._lines = len(entries)
+        except Exception:
+            pass
+
+    @property
+    def line_count(self):
+        return self._lines
+
+
+def family_reports(base_dir, report_name, known=()):
+    """Отчёты семейства: базовая папка, её подпапки и уже известные пути."""
+    found = {}
+    dirs = [base_dir]
+    try:
+        for name in os.listdir(base_dir):
+            path = os.path.join(base_dir, name)
+            if os.path.isdir(path):
+                dirs.append(path)
+    except Exception:
+        pass
+
+    for directory in dirs:
+        path = os.path.join(directory, report_name)
+        if os.path.isfile(path):
+            found[os.path.relpath(path, base_dir)] = path
+    for key in known:
+        if key not in found:
+            found[key] = os.path.join(base_dir, key)
+    return found
+
+
+def collect_history(base_dir, report_name, summarize, known_summaries=None):
+    """Сводки всех отчётов семейства.
+
+    summarize(path) -> dict считается только для новых или изменённых
+    отчётов. known_summaries {путь: сводка} — уже посчитанные сводки
+    (например, для открытого сейчас отчёта), они тоже попадают в журнал.
+    Возвращает список (путь, mtime, сводка).
+    """
+    store = HistoryStore(history_path(base_dir, report_name))
+    entries = store.load()
+    known_summaries = dict(
+        (os.path.normcase(os.path.abspath(p)), s)
+        for p, s in (known_summaries or {}).items()
+    )
+
+    result = []
+    changed = False
+    for key, path in sorted(family_reports(base_dir, report_name, entries).items()):
+        signature = file_signature(path)
+        if signature is None:
+            if entries.pop(key, None) is not None:
+                changed = True
+            continue
+        _, size, mtime_ms = signature
+
+        entry = entries.get(key)
+        if entry is None or entry.get("size") != size or entry.get("mtime") != mtime_ms:
+            summary = known_summaries.get(signature[0])
+            if summary is None:
+                try:
+                    summary = summarize(path)
+                except Exception:
+                    continue
+            entry = dict(summary)
+            entry.update({"path": key, "size": size, "mtime": mtime_ms})
+            entries[key] = entry
+            store.add(entry)
+
+        result.append((path, mtime_ms / 1000.0, entry))
+
+    if changed or store.line_count > COMPACT_RATIO * max(len(entries), 1):
+        store.compact(entries)
+    return result
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+clash_journal.py — журнал изменений по коллизиям рядом с XML-отчётом.
+
+Каждое изменение дописывается в конец файла одной JSON-строкой с ключом
+коллизии (build_clash_key), временем и пользователем. Отчёт при этом не
+перезаписывается; последнее значение по ключу побеждает. Оборванная
+последняя строка (сбой при записи) пропускается.
+
+Комментарии (CommentJournal) хранятся как снимок <отчёт>.comments.json
+плюс хвост <отчёт>.comments.jsonl: правки нескольких координаторов
+с разных машин сливаются по ключам, а снимок периодически уплотняется.
+"""
+
+import io
+import os
+import json
+import time
+from datetime import datetime
+
+from file_io import acquire_lock, release_lock, write_json_atomic
+
+
+# Размер хвоста журнала комментариев, после которого он уплотняется в снимок
+COMMENT_COMPACT_BYTES = 256 * 1024
+
+# Блокировка уплотнения старше этого считается брошенной, с
+COMPACT_LOCK_TIMEOUT = 600
+
+
+def status_journal_path(xml_path):
+    """Путь к журналу статусов рядом с XML."""
+    base, _ = os.path.splitext(xml_path)
+    return base + ".statuses.jsonl"
+
+
+def comment_journal_path(snapshot_path):
+    """Путь к хвосту журнала комментариев рядом со снимком .comments.json."""
+    base, _ = os.path.splitext(snapshot_path)
+    return base + ".jsonl"
+
+
+def _current_user():
+    return os.environ.get("USERNAME") or os.environ.get("USER") or ""
+
+
+def _read_entries(path):
+    """Записи JSON-lines файла по порядку (битые строки пропускаются)."""
+    if not path or not os.path.exists(path):
+        return []
+
+    result = []
+    try:
+        with io.open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(entry, dict) and entry.get("key"):
+                    result.append(entry)
+    except Exception:
+        return []
+    return result
+
+
+class ChangeJournal(object):
+    """Журнал значений по ключам коллизий в формате JSON-lines."""
+
+    # Имя поля со значением в строке журнала
+    FIELD = "value"
+
+    def __init__(self, path):
+        self.path = path
+
+    def _segments(self):
+        """Хвосты, оставшиеся от прерванного уплотнения, и текущий хвост."""
+        directory = os.path.dirname(self.path) or "."
+        prefix = os.path.basename(self.path) + "."
+        segments = []
+        try:
+            for name in sorted(os.listdir(directory)):
+                if name.startswith(prefix) and name.endswith(".compacting"):
+                    segments.append(os.path.join(directory, name))
+        except Exception:
+            pass
+        segments.append(self.path)
+        return segments
+
+    def entries(self, segments=None):
+        """Все записи журнала по порядку (сначала неперенесённые хвосты)."""
+        result = []
+        for segment in self._segments() if segments is None else segments:
+            result.extend(_read_entries(segment))
+        return result
+
+    def load(self, segments=None):
+        """Возвращает dict: clash_key -> последнее значение."""
+        values = {}
+        for entry in self.entries(segments):
+            values[entry["key"]] = entry.get(self.FIELD)
+        return values
+
+    def detach(self):
+        """Начало уплотнения: текущий хвост переименовывается в
+        <журнал>.<время>.<pid>.compacting (новые записи пойдут в новый
+        файл). Возвращает все хвосты к переносу."""
+        if os.path.exists(self.path):
+            segment = "{}.{}.{}.compacting".format(
+                self.path, int(time.time()), os.getpid()
+            )
+            os.rename(self.path, segment)
+        return self._segments()[:-1]
+
+    def remove_segments(self, segments):
+        """Удаляет перенесённые хвосты."""
+        for segment in segments:
+            try:
+                os.remove(segment)
+            except Exception:
+                pass
+
+    def append(self, changes, user=None):
+        """Дописывает изменения {clash_key: значение} в конец журнала."""
+        if not changes:
+            return 0
+
+        stamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        user = user if user is not None else _current_user()
+        lines = []
+        for key in sorted(changes):
+            entry = {"key": key, self.FIELD: changes[key], "time": stamp, "user": user}
+            lines.append(json.dumps(entry, ensure_ascii=False) + u"\n")
+
+        with io.open(self.path, "a", encoding="utf-8") as f:
+            f.write(u"".join(lines))
+            f.flush()
+            try:
+                os.fsync(f.fileno())
+            except Exception:
+                pass
+        return len(lines)
+
+
+class StatusJournal(ChangeJournal):
+    """Журнал статусов коллизий."""
+
+    FIELD = "status"
+
+    @classmethod
+    def for_report(cls, xml_path):
+        return cls(status_journal_path(xml_path))
+
+
+class CommentJournal(ChangeJournal):
+    """Комментарии коллизий: снимок .comments.json + хвост .comments.jsonl.
+
+    Сохранение дописывает в хвост только изменённые комментарии
+    (пустой комментарий — удаление), поэтому правки разных машин
+    не затирают друг друга. Когда хвост вырастает больше
+    COMMENT_COMPACT_BYTES, он переносится в снимок: хвост сначала
+    переименовывается (новые правки пойдут в новый файл), снимок
+    переписывается атомарно под файлом-блокировкой.
+    """
+
+    FIELD = "comment"
+
+    def __init__(self, snapshot_path):
+        ChangeJournal.__init__(self, comment_journal_path(snapshot_path))
+        self.snapshot_path = snapshot_path
+
+    def load_snapshot(self):
+        """Снимок: clash_key -> комментарий."""
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return {}
+        try:
+            with io.open(self.snapshot_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            return {}
+        if not isinstance(data, dict):
+            return {}
+
+        result = {}
+        for key, value in data.items():
+            if isinstance(value, dict):
+                value = value.get("comment")
+            text = u"{}".format(value or "").strip()
+            if text:
+                result[key] = text
+        return result
+
+    def load(self, segments=None):
+        """Снимок с наложенным хвостом: clash_key -> комментарий."""
+        comments = self.load_snapshot()
+        for segment in self._segments() if segments is None else segments:
+            for entry in _read_entries(segment):
+                text = u"{}".format(entry.get(self.FIELD) or "").strip()
+                if text:
+                    comments[entry["key"]] = text
+                else:
+                    comments.pop(entry["key"], None)
+        return comments
+
+    def save(self, comments, baseline, user=None):
+        """Дописывает комментарии, отличающиеся от baseline (прочитанных ранее).
+
+        Ключи, которых нет в comments, не трогаются. Возвращает число записей.
+        """
+        changes = {}
+        for key, text in comments.items():
+            text = (text or "").strip()
+            if text != (baseline.get(key) or "").strip():
+                changes[key] = text
+        count = self.append(changes, user)
+        if count and self._tail_size() > COMMENT_COMPACT_BYTES:
+            try:
+                self.compact()
+            except Exception:
+                pass
+        return count
+
+    def _tail_size(self):
+        try:
+            return os.path.getsize(self.path)
+        except Exception:
+            return 0
+
+    def compact(self):
+        """Переносит хвост в снимок; False, если уплотняет другая машина."""
+        lock_path = self.snapshot_path + ".lock"
+        if not acquire_lock(lock_path, _current_user(), COMPACT_LOCK_TIMEOUT):
+            return False
+        try:
+            segments = self.detach()
+            payload = dict(
+                (key, {"comment": text}) for key, text in self.load(segments).items()
+            )
+            write_json_atomic(self.snapshot_path, payload, indent=2, sort_keys=True)
+
+            # Удаляются только перенесённые хвосты; текущий мог появиться заново
+            self.remove_segments(segments)
+            return True
+        finally:
+            release_lock(lock_path)
+
+
@@ -0,0 +1,823 @@
+# -*- coding: utf-8 -*-
+"""
+clash_report.py — разбор XML-отчётов Navisworks о пересечениях.
+
+Общий для ПересеченияNEW и пакетной обработки (clash_batch.py) парсер:
+потоковый iterparse, полное дерево и regex как запасные пути, дата
+отчёта и ключи коллизий.
+"""
+
+import io
+import os
+import re
+from collections import namedtuple
+from datetime import datetime
+
+import clash_xmlreader
+from clash_xml import SanitizingReader, sanitize_xml_text
+
+
+# =============================================================================
+# КОНСТАНТЫ И НАСТРОЙКИ
+# =============================================================================
+
+# Потоковый разбор XML (iterparse) без построения полного дерева
+STREAMING_PARSE = True
+
+# Версия парсера — входит в ключ кэша разобранных отчётов
+PARSER_VERSION = 1
+
+# Имена атрибутов для поиска ID объекта
+OBJECT_ID_NAMES = frozenset(
+    ["объект id", "object id", "object 1 id", "object 2 id", "id объекта"]
+)
+
+# Атрибуты даты в XML
+DATE_ATTRIBUTES = (
+    "date",
+    "created",
+    "generated",
+    "exported",
+    "timestamp",
+    "time",
+    "start",
+    "lastsaved",
+    "creationtime",
+    "modificationtime",
+)
+
+# Форматы даты в атрибутах отчёта и в именах датированных папок
+DATETIME_FORMATS = (
+    "%d.%m.%Y %H:%M:%S",
+    "%d.%m.%Y %H:%M",
+    "%d.%m.%Y",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%d",
+    "%Y.%m.%d",
+    "%m/%d/%Y %H:%M:%S",
+    "%m/%d/%Y",
+)
+
+# Сколько байт от начала отчёта просматривается в поисках даты
+DATE_PROBE_BYTES = 64 * 1024
+
+ALLOWED_STATUSES = ("Новая", "В работе", "Закрыта")
+
+
+# =============================================================================
+# РЕГУЛЯРНЫЕ ВЫРАЖЕНИЯ
+# =============================================================================
+
+
+class Patterns:
+    """Скомпилированные регулярные выражения для парсинга."""
+
+    # Имя файла модели
+    MODEL_FILE = re.compile(".+\\.(nwc|nwd|nwf|rvt)$", re.IGNORECASE)
+
+    # Атрибут даты в XML-тексте
+    DATE_ATTR = re.compile(
+        r"\b(?:date|created|generated|export(?:date|ed)?|timestamp|time|"
+        r'start|lastsaved|creationtime|modificationtime)\s*=\s*"([^"]+)"',
+        re.IGNORECASE,
+    )
+
+    # Дата в имени папки: 2026.01.31, 2026-01-31, 31.01.2026
+    FOLDER_DATE = re.compile(r"\d{4}[.-]\d{2}[.-]\d{2}|\d{2}\.\d{2}\.\d{4}")
+
+    # Fallback-парсер: блоки и атрибуты
+    CLASHTEST_BLOCK = re.compile(
+        r"<clashtest\b[^>]*>.*?</clashtest>", re.DOTALL | re.IGNORECASE
+    )
+    TEST_BLOCK = re.compile(r"<test\b[^>]*>.*?</test>", re.DOTALL | re.IGNORECASE)
+    CLASHRESULT_BLOCK = re.compile(
+        r"<clashresult\b[^>]*>.*?</clashresult>", re.DOTALL | re.IGNORECASE
+    )
+    CLASHOBJECT_BLOCK = re.compile(
+        r"<clashobject\b[^>]*>.*?</clashobject>", re.DOTALL | re.IGNORECASE
+    )
+
+    ATTR_NAME = re.compile(r"\bname=\"([^\"]+)\"", re.IGNORECASE)
+    ATTR_TESTNAME = re.compile(r"\btestname=\"([^\"]+)\"", re.IGNORECASE)
+    ATTR_HREF = re.compile(r"\bhref=\"([^\"]*)\"", re.IGNORECASE)
+    ATTR_WW_STATUS = re.compile(r"\bww_status=\"([^\"]*)\"", re.IGNORECASE)
+
+    SMARTTAG_PAIR = re.compile(
+        r"<smarttag>.*?<name>(.*?)</name>.*?<value>(.*?)</value>.*?</smarttag>",
+        re.DOTALL | re.IGNORECASE,
+    )
+    OBJECTATTR_PAIR = re.compile(
+        r"<objectattribute>.*?<name>(.*?)</name>.*?<value>(.*?)</value>.*?</objectattribute>",
+        re.DOTALL | re.IGNORECASE,
+    )
+    PATHLINK_BLOCK = re.compile(r"<pathlink>.*?</pathlink>", re.DOTALL | re.IGNORECASE)
+    NODE_TEXT = re.compile(r"<node>(.*?)</node>", re.DOTALL | re.IGNORECASE)
+    HTML_TAGS = re.compile(r"<[^>]+>")
+
+
+# =============================================================================
+# СТРУКТУРЫ ДАННЫХ
+# =============================================================================
+
+ClashObject = namedtuple("ClashObject", ["element_id", "path"])
+
+
+# =============================================================================
+# ЧТЕНИЕ И ОЧИСТКА XML
+# =============================================================================
+
+
+class XmlReader:
+    """Класс для безопасного чтения XML-файлов."""
+
+    ENCODINGS = ("utf-8-sig", "utf-16", "utf-8", "cp1251")
+
+    @classmethod
+    def read_file(cls, path):
+        """Читает файл с автоопределением кодировки."""
+        with open(path, "rb") as f:
+            data = f.read()
+
+        for encoding in cls.ENCODINGS:
+            try:
+                return data.decode(encoding)
+            except Exception:
+                pass
+        return data.decode("utf-8", "ignore")
+
+    @staticmethod
+    def sanitize(text):
+        """Очищает текст от некорректных XML-символов."""
+        return sanitize_xml_text(text)
+
+    @staticmethod
+    def open_stream(path):
+        """Открывает файл как поток очищенного XML для iterparse."""
+        return SanitizingReader(path)
+
+    @classmethod
+    def parse(cls, xml_path):
+        """Парсит XML-файл и возвращает корневой элемент."""
+        try:
+            from lxml import etree as ET
+        except ImportError:
+            import xml.etree.ElementTree as ET
+
+        raw_text = cls.read_file(xml_path)
+        cleaned_text = cls.sanitize(raw_text)
+        return ET.fromstring(cleaned_text)
+
+
+def build_clash_key(test_name, clash_name, id1, id2):
+    """Строит стабильный ключ коллизии для статуса/комментария."""
+    try:
+        a = int(id1) if id1 is not None else 0
+    except Exception:
+        a = 0
+    try:
+        b = int(id2) if id2 is not None else 0
+    except Exception:
+        b = 0
+
+    if a and b:
+        lo, hi = (a, b) if a < b else (b, a)
+        pair = "{}:{}".format(lo, hi)
+    else:
+        pair = "{}:{}".format(a, b)
+
+    return "{}|{}|{}".format(
+        (test_name or "").strip(), (clash_name or "").strip(), pair
+    )
+
+
+def normalize_status(raw_status):
+    """Нормализует текст статуса к одному из допустимых значений."""
+    status = (raw_status or "").strip().lower()
+    if not status:
+        return ALLOWED_STATUSES[0]
+    if status in ("новая", "новый", "new"):
+        return "Новая"
+    if status in ("в работе", "work", "in progress", "in_work"):
+        return "В работе"
+    if status in ("закрыта", "закрыто", "closed", "done"):
+        return "Закрыта"
+    return ALLOWED_STATUSES[0]
+
+
+# =============================================================================
+# ПАРСИНГ XML-ОТЧЁТА
+# =============================================================================
+
+
+class NavisworksReportParser:
+    """Парсер XML-отчётов Navisworks."""
+
+    def __init__(self, xml_path):
+        self.xml_path = xml_path
+        self.base_dir = os.path.dirname(xml_path)
+        self.report_date = None
+
+    def parse(self):
+        """Парсит отчёт и возвращает dict: test_name -> [ClashRow, ...]."""
+        if clash_xmlreader.AVAILABLE:
+            try:
+                return self._parse_with_dotnet()
+            except Exception:
+                pass
+        if STREAMING_PARSE:
+            try:
+                return self._parse_streaming()
+            except Exception:
+                pass
+        try:
+            return self._parse_with_xml_parser()
+        except Exception:
+            return self._parse_with_regex()
+
+    def _parse_streaming(self):
+        """Потоковый парсер на базе iterparse.
+
+        Имя проверки берётся из стека открытых элементов вместо карты
+        родителей, каждый clashresult освобождается сразу после разбора.
+        """
+        try:
+            from lxml import etree as ET
+        except ImportError:
+            import xml.etree.ElementTree as ET
+
+        groups = {}
+        elem_stack = []
+        name_stack = []
+        result_stack = []
+        date_probe = ReportDateProbe()
+
+        source = XmlReader.open_stream(self.xml_path)
+        try:
+            for event, element in ET.iterparse(source, events=("start", "end")):
+                tag = element.tag
+
+                if event == "start":
+                    date_probe.feed(element)
+                    if tag in ("clashtest", "test"):
+                        name = element.get("name") or element.get("displayname")
+                        if name:
+                            groups.setdefault(name, [])
+                    elif tag == "clashresult":
+                        result_stack.append((element, []))
+
+                    elem_stack.append(element)
+                    name_stack.append(
+                        element.get("name")
+                        or element.get("displayname")
+                        or element.get("testname")
+                    )
+                    continue
+
+                elem_stack.pop()
+                name_stack.pop()
+
+                if tag == "clashobject":
+                    self._collect_streamed_object(element, elem_stack, result_stack)
+                elif tag == "clashresult":
+                    _, objects = result_stack.pop()
+                    test_name = self._get_own_test_name(
+                        element
+                    ) or self._get_stack_test_name(name_stack)
+                    self._process_clash_result(element, groups, test_name, objects)
+                    self._release_element(element, elem_stack)
+                elif tag in ("clashtest", "test"):
+                    self._release_element(element, elem_stack)
+        finally:
+            source.close()
+
+        self.report_date = date_probe.result(self.xml_path)
+        return groups
+
+    def _parse_with_dotnet(self):
+        """Один проход System.Xml.XmlReader (в Revit быстрее iterparse)."""
+
+        def consume(events):
+            groups = {}
+            date_probe = ReportDateProbe()
+            for kind, item in events:
+                if kind == "element":
+                    date_probe.feed(item)
+                elif kind == "test":
+                    groups.setdefault(item, [])
+                else:
+                    test_name = self._get_own_test_name(item) or (
+                        item.parent_name or "(Без названия проверки)"
+                    )
+                    objects = []
+                    for record in item.objects:
+                        element_id = record.element_id(OBJECT_ID_NAMES)
+                        if element_id is not None:
+                            objects.append(
+                                ClashObject(element_id=element_id, path=record.path())
+                            )
+                    self._process_clash_result(item, groups, test_name, objects)
+            return groups, date_probe
+
+        groups, date_probe = clash_xmlreader.read_clash_report(
+            self.xml_path, consume, with_elements=True
+        )
+        self.report_date = date_probe.result(self.xml_path)
+        return groups
+
+    def _collect_streamed_object(self, element, elem_stack, result_stack):
+        """Разбирает clashobject, принадлежащий открытому clashresult."""
+        if not result_stack or len(elem_stack) < 2:
+            return
+
+        clash_result, objects = result_stack[-1]
+        if elem_stack[-1].tag != "clashobjects" or elem_stack[-2] is not clash_result:
+            return
+
+        obj = self._parse_clash_object(element)
+        if obj:
+            objects.append(obj)
+        element.clear()
+
+    def _release_element(self, element, elem_stack):
+        """Освобождает разобранное поддерево."""
+        element.clear()
+        if elem_stack:
+            try:
+                elem_stack[-1].remove(element)
+            except Exception:
+                pass
+
+    def _get_stack_test_name(self, name_stack):
+        """Ближайшее имя проверки среди открытых родительских элементов."""
+        for name in reversed(name_stack):
+            if name:
+                return name
+        return "(Без названия проверки)"
+
+    def _parse_with_xml_parser(self):
+        """Парсер на базе XML с построением полного дерева."""
+        root = XmlReader.parse(self.xml_path)
+
+        # Собираем имена всех тестов
+        test_names = self._collect_test_names(root)
+        groups = {name: [] for name in test_names}
+
+        # Строим карту родительских элементов
+        parent_map = self._build_parent_map(root)
+
+        # Парсим результаты
+        for clash_result in root.findall(".//clashresult"):
+            test_name = self._get_test_name(clash_result, parent_map)
+            self._process_clash_result(clash_result, groups, test_name)
+
+        date_probe = ReportDateProbe()
+        for element in root.iter():
+            date_probe.feed(element)
+        self.report_date = date_probe.result(self.xml_path)
+
+        return groups
+
+    def _collect_test_names(self, root):
+        """Собирает имена всех тестов."""
+        names = set()
+        for tag in ("clashtest", "test"):
+            for element in root.findall(".//{}".format(tag)):
+                name = element.get("name") or element.get("displayname")
+                if name:
+                    names.add(name)
+        return names
+
+    def _build_parent_map(self, root):
+        """Строит карту ребёнок -> родитель."""
+        parent_map = {}
+        for parent in root.iter():
+            for child in list(parent):
+                parent_map[child] = parent
+        return parent_map
+
+    def _process_clash_result(self, clash_result, groups, test_name, objects=None):
+        """Обрабатывает один clashresult."""
+        clash_name = clash_result.get("name") or "Без имени"
+        status = normalize_status(
+            clash_result.get("ww_status") or clash_result.get("status")
+        )
+        image_path = self._resolve_image_path(clash_result.get("href"))
+
+        if objects is None:
+            objects = []
+            for clash_object in clash_result.findall("./clashobjects/clashobject"):
+                obj = self._parse_clash_object(clash_object)
+                if obj:
+                    objects.append(obj)
+
+        if not objects:
+            return
+
+        rows = groups.setdefault(test_name, [])
+        self._add_rows(rows, test_name, clash_name, image_path, objects, status)
+
+    def _get_own_test_name(self, clash_result):
+        """Имя теста из атрибутов самого clashresult."""
+        for attr in ("testname", "test", "groupname"):
+            name = clash_result.get(attr)
+            if name:
+                return name
+        return None
+
+    def _get_test_name(self, clash_result, parent_map):
+        """Определяет имя теста для clashresult."""
+        # Сначала ищем в атрибутах самого элемента
+        name = self._get_own_test_name(clash_result)
+        if name:
+            return name
+
+        # Ищем в родительских элементах
+        parent = parent_map.get(clash_result)
+        while parent is not None:
+            name = (
+                parent.get("name")
+                or parent.get("displayname")
+                or parent.get("testname")
+            )
+            if name:
+                return name
+            parent = parent_map.get(parent)
+
+        return "(Без названия проверки)"
+
+    def _parse_clash_object(self, element):
+        """Парсит clashobject и возвращает ClashObject."""
+        element_id = self._extract_object_id(element)
+        if element_id is None:
+            return None
+
+        path = self._extract_pathlink(element)
+        return ClashObject(element_id=element_id, path=path)
+
+    def _extract_object_id(self, element):
+        """Извлекает ID объекта из smarttags или objectattribute."""
+        # Ищем в smarttags
+        for smarttag in element.findall("./smarttags/smarttag"):
+            name = (smarttag.findtext("name") or "").strip().lower()
+            if name in OBJECT_ID_NAMES:
+                value = (smarttag.findtext("value") or "").strip()
+                if value.isdigit():
+                    return int(value)
+
+        # Ищем в objectattribute
+        for obj_attr in element.findall("./objectattribute"):
+            name = (obj_attr.findtext("name") or "").strip().lower()
+            if name in OBJECT_ID_NAMES:
+                value = (obj_attr.findtext("value") or "").strip()
+                if value.isdigit():
+                    return int(value)
+
+        return None
+
+    def _extract_pathlink(self, element):
+        """Извлекает путь из pathlink."""
+        parts = []
+
+        # Пробуем node
+        for node in element.findall("./pathlink/node"):
+            text = (node.text or "").strip()
+            if text:
+                parts.append(text)
+
+        # Если не нашли, пробуем path
+        if not parts:
+            for path in element.findall("./pathlink/path"):
+                text = (path.text or "").strip()
+                if text:
+                    parts.append(text)
+
+        return " / ".join(parts)
+
+    def _resolve_image_path(self, href):
+        """Преобразует относительный путь к изображению в абсолютный."""
+        if not href:
+            return ""
+        href = href.replace("\\", "/").lstrip("./")
+        return os.path.normpath(os.path.join(self.base_dir, href))
+
+    def _add_rows(self, rows, test_name, clash_name, image_path, objects, status):
+        """Добавляет строки для пары объектов."""
+        if len(objects) >= 2:
+            obj_a, obj_b = objects[0], objects[1]
+            clash_key = build_clash_key(
+                test_name, clash_name, obj_a.element_id, obj_b.element_id
+            )
+            # Добавляем обе перестановки
+            rows.append(
+                {
+                    "name": clash_name,
+                    "img": image_path,
+                    "id": obj_a.element_id,
+                    "id_other": obj_b.element_id,
+                    "path": obj_a.path,
+                    "path_other": obj_b.path,
+                    "status": status,
+                    "clash_key": clash_key,
+                }
+            )
+            rows.append(
+                {
+                    "name": clash_name,
+                    "img": image_path,
+                    "id": obj_b.element_id,
+                    "id_other": obj_a.element_id,
+                    "path": obj_b.path,
+                    "path_other": obj_a.path,
+                    "status": status,
+                    "clash_key": clash_key,
+                }
+            )
+        else:
+            obj = objects[0]
+            clash_key = build_clash_key(test_name, clash_name, obj.element_id, None)
+            rows.append(
+                {
+                    "name": clash_name,
+                    "img": image_path,
+                    "id": obj.element_id,
+                    "id_other": None,
+                    "path": obj.path,
+                    "path_other": "",
+                    "status": status,
+                    "clash_key": clash_key,
+                }
+            )
+
+    def _parse_with_regex(self):
+        """Fallback-парсер на базе регулярных выражений."""
+        text = XmlReader.sanitize(XmlReader.read_file(self.xml_path))
+        groups = {}
+
+        # Ищем блоки тестов
+        blocks = list(Patterns.CLASHTEST_BLOCK.finditer(text))
+        if not blocks:
+            blocks = list(Patterns.TEST_BLOCK.finditer(text))
+        if not blocks:
+            # Обрабатываем весь текст как один блок
+            blocks = [type("FakeMatch", (), {"group": lambda self, n=0: text})()]
+
+        for block_match in blocks:
+            block_text = (
+                block_match.group(0)
+                if hasattr(block_match, "group")
+                else str(block_match)
+            )
+
+            # Определяем имя теста
+            name_match = Patterns.ATTR_NAME.search(block_text)
+            default_test_name = (
+                name_match.group(1) if name_match else "(Без названия проверки)"
+            )
+            groups.setdefault(default_test_name, [])
+
+            # Парсим результаты
+            for result_match in Patterns.CLASHRESULT_BLOCK.finditer(block_text):
+                self._process_regex_result(
+                    result_match.group(0), groups, default_test_name
+                )
+
+        return groups
+
+    def _process_regex_result(self, result_text, groups, default_test_name):
+        """Обрабатывает clashresult через regex."""
+        # Имя теста
+        testname_match = Patterns.ATTR_TESTNAME.search(result_text)
+        test_name = testname_match.group(1) if testname_match else default_test_name
+
+        # Путь к изображению
+        href_match = Patterns.ATTR_HREF.search(result_text)
+        image_path = self._resolve_image_path(href_match.group(1) if href_match else "")
+
+        # Имя коллизии
+        name_match = Patterns.ATTR_NAME.search(result_text)
+        clash_name = name_match.group(1) if name_match else "Без имени"
+        status_match = Patterns.ATTR_WW_STATUS.search(result_text)
+        status = normalize_status(status_match.group(1) if status_match else "")
+
+        # Парсим объекты
+        objects = []
+        for obj_match in Patterns.CLASHOBJECT_BLOCK.finditer(result_text):
+            obj = self._parse_regex_object(obj_match.group(0))
+            if obj:
+                objects.append(obj)
+
+        if not objects:
+            return
+
+        rows = groups.setdefault(test_name, [])
+        self._add_rows(rows, test_name, clash_name, image_path, objects, status)
+
+    def _parse_regex_object(self, obj_text):
+        """Парсит clashobject через regex."""
+        element_id = None
+
+        # Ищем в smarttags
+        for name, value in Patterns.SMARTTAG_PAIR.findall(obj_text):
+            if (name or "").strip().lower() in OBJECT_ID_NAMES:
+                v = (value or "").strip()
+                if v.isdigit():
+                    element_id = int(v)
+                    break
+
+        # Ищем в objectattribute
+        if element_id is None:
+            for name, value in Patterns.OBJECTATTR_PAIR.findall(obj_text):
+                if (name or "").strip().lower() in OBJECT_ID_NAMES:
+                    v = (value or "").strip()
+                    if v.isdigit():
+                        element_id = int(v)
+                        break
+
+        if element_id is None:
+            return None
+
+        # Извлекаем путь
+        path = ""
+        pathlink_match = Patterns.PATHLINK_BLOCK.search(obj_text)
+        if pathlink_match:
+            nodes = Patterns.NODE_TEXT.findall(pathlink_match.group(0))
+            parts = [Patterns.HTML_TAGS.sub("", n).strip() for n in nodes if n.strip()]
+            path = " / ".join(parts)
+
+        return ClashObject(element_id=element_id, path=path)
+
+
+def _extract_object_id_from_xml_object(clash_object):
+    """Извлекает ID из XML-узла clashobject."""
+    for smarttag in clash_object.findall("./smarttags/smarttag"):
+        name = (smarttag.findtext("name") or "").strip().lower()
+        if name in OBJECT_ID_NAMES:
+            value = (smarttag.findtext("value") or "").strip()
+            if value.isdigit():
+                return int(value)
+
+    for obj_attr in clash_object.findall("./objectattribute"):
+        name = (obj_attr.findtext("name") or "").strip().lower()
+        if name in OBJECT_ID_NAMES:
+            value = (obj_attr.findtext("value") or "").strip()
+            if value.isdigit():
+                return int(value)
+
+    return None
+
+
+def deduplicate_groups_by_clash_key(groups):
+    """Убирает дубли пар (A-B и B-A), оставляя одну строку на clash_key."""
+    result = {}
+    for test_name, rows in groups.items():
+        seen = set()
+        deduped = []
+        for item in rows:
+            clash_key = item.get("clash_key") or build_clash_key(
+                test_name,
+                item.get("name"),
+                item.get("id"),
+                item.get("id_other"),
+            )
+            if clash_key in seen:
+                continue
+            seen.add(clash_key)
+
+            row = dict(item)
+            row["clash_key"] = clash_key
+            deduped.append(row)
+        result[test_name] = deduped
+    return result
+
+
+# =============================================================================
+# ИЗВЛЕЧЕНИЕ ДАТЫ ОТЧЁТА
+# =============================================================================
+
+
+def extract_report_datetime(xml_path):
+    """Извлекает дату отчёта из XML или метаданных файла."""
+    # Пробуем из XML-атрибутов
+    try:
+        root = XmlReader.parse(xml_path)
+
+        # Ищем в корневом элементе
+        for attr in DATE_ATTRIBUTES:
+            value = root.get(attr)
+            if value:
+                return value, "из XML"
+
+        # Ищем в дочерних элементах
+        for tag in ("report", "batchtest", "tests"):
+            for element in root.findall(".//{}".format(tag)):
+                for attr in DATE_ATTRIBUTES:
+                    value = element.get(attr)
+                    if value:
+                        return value, "из XML"
+    except Exception:
+        pass
+
+    # Пробуем regex-поиск
+    try:
+        text = XmlReader.sanitize(XmlReader.read_file(xml_path))
+        match = Patterns.DATE_ATTR.search(text)
+        if match:
+            return match.group(1).strip(), "из XML"
+    except Exception:
+        pass
+
+    # Берём дату изменения файла
+    return _file_datetime(xml_path)
+
+
+def _file_datetime(xml_path):
+    """Дата изменения файла отчёта."""
+    try:
+        timestamp = os.path.getmtime(xml_path)
+        dt = datetime.fromtimestamp(timestamp)
+        return dt.strftime("%d.%m.%Y %H:%M"), "по дате изменения файла"
+    except Exception:
+        return "", ""
+
+
+def probe_report_date(xml_path):
+    """Атрибут даты из начала отчёта (DATE_PROBE_BYTES) или None."""
+    try:
+        with io.open(xml_path, "rb") as f:
+            head = f.read(DATE_PROBE_BYTES).decode("utf-8", "replace")
+    except Exception:
+        return None
+    match = Patterns.DATE_ATTR.search(head)
+    return match.group(1).strip() if match else None
+
+
+def parse_report_datetime(value):
+    """datetime из даты отчёта или имени датированной папки; None, если
+    формат не распознан."""
+    value = (value or "").strip()
+    if value.endswith("Z"):
+        value = value[:-1]
+    value = value.split(".", 2)[0] if "T" in value else value
+    for fmt in DATETIME_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    match = Patterns.FOLDER_DATE.search(value)
+    if match and match.group(0) != value:
+        return parse_report_datetime(match.group(0))
+    return None
+
+
+class ReportDateProbe:
+    """Дата отчёта по ходу разбора XML — с тем же приоритетом, что
+    extract_report_datetime, но без повторного чтения файла."""
+
+    DATE_TAGS = ("report", "batchtest", "tests")
+
+    # Имена атрибутов, которые ищет Patterns.DATE_ATTR
+    TEXT_DATE_NAMES = frozenset(DATE_ATTRIBUTES + ("export", "exportdate"))
+
+    def __init__(self):
+        self._root_value = None
+        self._tag_values = {}
+        self._text_value = None
+        self._seen_root = False
+
+    def feed(self, element):
+        """Принимает элементы в порядке документа, первым — корень."""
+        tag = element.tag
+        if not self._seen_root:
+            self._seen_root = True
+            self._root_value = self._first_date_attribute(element)
+        elif tag in self.DATE_TAGS and tag not in self._tag_values:
+            value = self._first_date_attribute(element)
+            if value:
+                self._tag_values[tag] = value
+
+        if self._text_value is None:
+            for name, value in element.attrib.items():
+                local = re.split("\\W", name)[-1].lower()
+                if local in self.TEXT_DATE_NAMES and value and value.strip():
+                    self._text_value = value.strip()
+                    break
+
+    def result(self, xml_path):
+        """Возвращает (дата, источник)."""
+        if self._root_value:
+            return self._root_value, "из XML"
+        for tag in self.DATE_TAGS:
+            if tag in self._tag_values:
+                return self._tag_values[tag], "из XML"
+        if self._text_value:
+            return self._text_value, "из XML"
+        return _file_datetime(xml_path)
+
+    def _first_date_attribute(self, element):
+        for attr in DATE_ATTRIBUTES:
+            value = element.get(attr)
+            if value:
+                return value
+        return None
@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""
+clash_xml.py — чтение и очистка XML-отчётов Navisworks о пересечениях.
+
+Очистка работает блоками через предкомпилированные регулярные выражения
+и может выполняться потоково (SanitizingReader) перед iterparse.
+patch_clash_statuses за один проход переписывает атрибуты статуса
+clashresult, не строя дерево всего отчёта.
+"""
+
+import io
+import re
+import sys
+import codecs
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
+
+
+# Размер блока чтения для потоковой очистки
+CHUNK_SIZE = 1024 * 1024
+
+# Экранирование некорректных амперсандов в XML
+BAD_AMPERSAND = re.compile(
+    u"&(?!amp;|lt;|gt;|apos;|quot;|#\\d+;|#x[0-9A-Fa-f]+;)", re.UNICODE
+)
+
+# Хвост блока, который ещё может оказаться корректной сущностью
+AMPERSAND_TAIL = re.compile(
+    u"&(?:a(?:m(?:p)?)?|a(?:p(?:o(?:s)?)?)?|l(?:t)?|g(?:t)?|q(?:u(?:o(?:t)?)?)?"
+    u"|#[0-9]*|#x[0-9A-Fa-f]*)?$"
+)
+
+# Недопустимые символы XML 1.0. В узких сборках (IronPython) символы вне BMP
+# хранятся суррогатными парами и, как и раньше, заменяются пробелами.
+if sys.maxunicode > 0xFFFF:
+    INVALID_CHARS = re.compile(
+        u"[^\u0009\u000a\u000d\u0020-\ud7ff\ue000-\ufffd\U00010000-\U0010ffff]"
+    )
+else:
+    INVALID_CHARS = re.compile(u"[^\u0009\u000a\u000d\u0020-\ud7ff\ue000-\ufffd]")
+
+XML_DECLARATION = re.compile(u"^<\\?xml[^>]*\\?>")
+DECLARED_ENCODING = re.compile(u"(\\bencoding\\s*=\\s*)([\"'])[^\"']*\\2")
+
+# Открывающий или закрывающий тег (значения атрибутов могут содержать «>»)
+TAG = re.compile(u"<(/?)([A-Za-z_][\\w:.\\-]*)((?:[^>\"']|\"[^\"]*\"|'[^']*')*)>")
+RESULT_END = re.compile(u"</clashresult\\s*>")
+
+
+def strip_invalid_chars(text):
+    """Заменяет недопустимые XML-символы пробелами."""
+    return INVALID_CHARS.sub(u" ", text)
+
+
+def normalize_text(text):
+    """Переносы строк, BOM и недопустимые символы — без амперсандов."""
+    text = text.replace(u"\r\n", u"\n").replace(u"\r", u"\n")
+    text = text.replace(u"\ufeff", u" ")
+    return strip_invalid_chars(text)
+
+
+def sanitize_xml_text(text):
+    """Очищает текст от некорректных XML-символов."""
+    text = normalize_text(text)
+
+    # Экранирование амперсандов
+    text = BAD_AMPERSAND.sub(u"&amp;", text)
+
+    # Обрезка до начала XML
+    start = text.find(u"<")
+    if start > 0:
+        text = text[start:]
+
+    return text
+
+
+def _detect_bom(head):
+    """Определяет кодировку по BOM; None — BOM нет."""
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if head.startswith(codecs.BOM_UTF16_LE) or head.startswith(codecs.BOM_UTF16_BE):
+        return "utf-16"
+    return None
+
+
+class SanitizingReader(object):
+    """Файлоподобный поток очищенного XML в UTF-8 для iterparse.
+
+    Читает файл блоками, декодирует инкрементально и применяет ту же
+    очистку, что sanitize_xml_text. Границы блоков учитываются для
+    \\r\\n и амперсандов. Без BOM файл читается как UTF-8; ошибка
+    декодирования пробрасывается, чтобы вызывающий код перешёл на
+    полное чтение файла.
+    """
+
+    def __init__(self, path, chunk_size=CHUNK_SIZE):
+        self._file = io.open(path, "rb")
+        self._chunk_size = chunk_size
+        self._decoder = None
+        self._pending = u""
+        self._started = False
+        self._eof = False
+        self._out = b""
+        self._pos = 0
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            chunks = [self._out[self._pos :]]
+            self._out, self._pos = b"", 0
+            while not self._eof:
+                chunks.append(self._fill())
+            return b"".join(chunks)
+
+        while self._pos >= len(self._out) and not self._eof:
+            self._out, self._pos = self._fill(), 0
+
+        data = self._out[self._pos : self._pos + size]
+        self._pos += len(data)
+        return data
+
+    def close(self):
+        try:
+            self._file.close()
+        except Exception:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _fill(self):
+        """Читает и очищает очередной блок, возвращает байты UTF-8."""
+        if self._decoder is None:
+            # Для распознавания BOM нужно не меньше 4 байт
+            raw = self._file.read(max(self._chunk_size, 4))
+            encoding = _detect_bom(raw) or "utf-8"
+            self._decoder = codecs.getincrementaldecoder(encoding)("strict")
+        else:
+            raw = self._file.read(self._chunk_size)
+
+        final = not raw
+        text = self._pending + self._decoder.decode(raw, final)
+        self._pending = u""
+
+        if not final:
+            # \r в конце блока может оказаться началом \r\n
+            if text.endswith(u"\r"):
+                self._pending = u"\r"
+                text = text[:-1]
+
+        text = normalize_text(text)
+
+        if not final:
+            tail = AMPERSAND_TAIL.search(text)
+            if tail:
+                self._pending = text[tail.start():] + self._pending
+                text = text[: tail.start()]
+
+        text = BAD_AMPERSAND.sub(u"&amp;", text)
+
+        if not self._started:
+            start = text.find(u"<")
+            if start > 0:
+                text = text[start:]
+            if not final and (start < 0 or self._incomplete_declaration(text)):
+                self._pending = text + self._pending
+                return b""
+            text = self._force_utf8_declaration(text)
+            self._started = True
+
+        if final:
+            self._eof = True
+        return text.encode("utf-8")
+
+    def _incomplete_declaration(self, text):
+        """Начало потока может быть ещё не дочитанным <?xml ...?>."""
+        return u"<?xml".startswith(text[:5]) and u"?>" not in text
+
+    def _force_utf8_declaration(self, text):
+        """Поток выдаётся в UTF-8 — правим объявленную кодировку."""
+        match = XML_DECLARATION.match(text)
+        if not match:
+            return text
+        declaration = DECLARED_ENCODING.sub(u"\\1\\2utf-8\\2", match.group(0))
+        return declaration + text[match.end():]
+
+
+def _tag_element(name, attrs):
+    """Элемент без детей из текста открывающего тега или None."""
+    attrs = attrs.rstrip()
+    if attrs.endswith(u"/"):
+        attrs = attrs[:-1]
+    try:
+        return ET.fromstring(u"<{}{}/>".format(name, attrs).encode("utf-8"))
+    except Exception:
+        return None
+
+
+def _set_attribute(tag_text, name, value):
+    """Ставит атрибут в текст открывающего тега, сохраняя остальное."""
+    quoted = u'"{}"'.format(escape(value, {u'"': u"&quot;"}))
+    pattern = re.compile(
+        u"(\\s{}\\s*=\\s*)(\"[^\"]*\"|'[^']*')".format(re.escape(name))
+    )
+    if pattern.search(tag_text):
+        return pattern.sub(lambda m: m.group(1) + quoted, tag_text, 1)
+    end = len(tag_text) - (2 if tag_text.endswith(u"/>") else 1)
+    return u"{} {}={}{}".format(tag_text[:end], name, quoted, tag_text[end:])
+
+
+def patch_clash_statuses(
+    xml_path, out_path, statuses, key_func, attribute="ww_status", chunk_size=CHUNK_SIZE
+):
+    """Копирует очищенный отчёт в out_path, проставляя статусы clashresult.
+
+    key_func(clashresult, имя_ближайшего_предка) возвращает ключ коллизии;
+    если ключ есть в statuses, атрибут attribute получает новое значение.
+    В памяти держится только текущий блок и один clashresult.
+    Возвращает число изменённых clashresult.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")("strict")
+    names = []
+    patched = [0]
+
+    def inherited_name():
+        for name in reversed(names):
+            if name:
+                return name
+        return None
+
+    def patch(fragment):
+        try:
+            element = ET.fromstring(fragment.encode("utf-8"))
+        except Exception:
+            return fragment
+        status = statuses.get(key_func(element, inherited_name()))
+        if status is None or element.get(attribute) == status:
+            return fragment
+        start = TAG.match(fragment)
+        patched[0] += 1
+        return _set_attribute(start.group(0), attribute, status) + fragment[start.end():]
+
+    buf = u""
+    with SanitizingReader(xml_path, chunk_size) as reader:
+        with io.open(out_path, "wb") as out:
+            eof = False
+            while not eof:
+                data = reader.read(chunk_size)
+                eof = not data
+                buf += decoder.decode(data, eof)
+                pos = 0
+                written = []
+
+                while True:
+                    match = TAG.search(buf, pos)
+                    if not match:
+                        break
+                    closing, name, attrs = match.groups()
+
+                    if name == "clashresult" and not closing:
+                        if attrs.rstrip().endswith(u"/"):
+                            end = match.end()
+                        else:
+                            close = RESULT_END.search(buf, match.end())
+                            if not close:
+                                break
+                            end = close.end()
+                        written.append(buf[pos : match.start()])
+                        written.append(patch(buf[match.start() : end]))
+                        pos = end
+                        continue
+
+                    written.append(buf[pos : match.end()])
+                    pos = match.end()
+                    if closing:
+                        if names:
+                            names.pop()
+                    elif not attrs.rstrip().endswith(u"/"):
+                        element = _tag_element(name, attrs)
+                        names.append(
+                            None
+                            if element is None
+                            else element.get("name")
+                            or element.get("displayname")
+                            or element.get("testname")
+                        )
+
+                if eof:
+                    written.append(buf[pos:])
+                    buf = u""
+                else:
+                    # Текст до незавершённого тега можно отдать сразу
+                    lt = buf.find(u"<", pos)
+                    keep = len(buf) if lt < 0 else lt
+                    written.append(buf[pos:keep])
+                    buf = buf[keep:]
+                out.write(u"".join(written).encode("utf-8"))
+
+    return patched[0]
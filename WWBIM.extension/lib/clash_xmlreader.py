@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""
+clash_xmlreader.py — разбор отчётов Navisworks через System.Xml.XmlReader.
+
+В IronPython xml.etree — чистый Python и заметно медленнее .NET XmlReader.
+Здесь отчёт читается одним проходом вперёд без построения дерева,
+с CheckCharacters=false, поэтому недопустимые символы не требуют
+предварительной очистки. Если XmlReader всё же спотыкается (например,
+о неэкранированный амперсанд), отчёт читается повторно через
+clash_xml.SanitizingReader.
+
+Из каждого clashresult собирается нейтральная запись (атрибуты, имя
+проверки, resultstatus, объекты с парами имя/значение и узлами pathlink);
+строки своего формата из неё строят ПересеченияNEW (clash_report),
+Пересечения и «Анализ отчёта HTML». Вне Revit (CPython) AVAILABLE = False.
+"""
+
+from clash_xml import SanitizingReader
+
+try:
+    import clr
+
+    clr.AddReference("System.Xml")
+    from System.IO import FileAccess, FileMode, FileShare, FileStream, StringReader
+    from System.Xml import (
+        DtdProcessing,
+        XmlException,
+        XmlNodeType,
+        XmlReader,
+        XmlReaderSettings,
+    )
+
+    AVAILABLE = True
+except Exception:
+    AVAILABLE = False
+
+
+# Элементы, чьи дочерние name/value образуют пару свойства объекта
+PROPERTY_TAGS = ("smarttag", "objectattribute", "property")
+
+TEST_TAGS = ("clashtest", "test")
+
+NAME_ATTRIBUTES = ("name", "displayname", "testname")
+
+
+class XmlElement(object):
+    """Открывающий тег: имя и атрибуты (интерфейс как у ElementTree)."""
+
+    __slots__ = ("tag", "attrib")
+
+    def __init__(self, tag, attrib):
+        self.tag = tag
+        self.attrib = attrib
+
+    def get(self, name, default=None):
+        return self.attrib.get(name, default)
+
+
+class ClashObjectRecord(object):
+    """clashobject: свойства (вид, имя, значение) и узлы pathlink."""
+
+    __slots__ = ("properties", "nodes", "paths")
+
+    def __init__(self):
+        self.properties = []
+        self.nodes = []
+        self.paths = []
+
+    def values(self, kind, names):
+        """Значения свойств вида kind с именем из names (без учёта регистра)."""
+        result = []
+        for prop_kind, name, value in self.properties:
+            if prop_kind == kind and name.strip().lower() in names:
+                result.append(value.strip())
+        return result
+
+    def element_id(self, names):
+        """ID объекта: smarttag, затем objectattribute; int или None."""
+        for kind in ("smarttag", "objectattribute"):
+            for value in self.values(kind, names):
+                if value.isdigit():
+                    return int(value)
+        return None
+
+    def path(self):
+        """Путь из pathlink: узлы node, иначе path, через « / »."""
+        return " / ".join(self.nodes or self.paths)
+
+
+class ClashResultRecord(object):
+    """clashresult с объектами из clashobjects."""
+
+    __slots__ = ("attrib", "test_name", "parent_name", "result_status", "objects")
+
+    def __init__(self, attrib, test_name, parent_name):
+        self.attrib = attrib
+        # Имя ближайшего clashtest/test (None — вне проверки)
+        self.test_name = test_name
+        # Ближайшее имя среди родительских элементов
+        self.parent_name = parent_name
+        self.result_status = u""
+        self.objects = []
+
+    def get(self, name, default=None):
+        return self.attrib.get(name, default)
+
+
+def _open_file(xml_path, settings):
+    stream = FileStream(xml_path, FileMode.Open, FileAccess.Read, FileShare.ReadWrite)
+    return XmlReader.Create(stream, settings)
+
+
+def _open_sanitized(xml_path, settings):
+    reader = SanitizingReader(xml_path)
+    try:
+        data = reader.read()
+    finally:
+        reader.close()
+    # SanitizingReader отдаёт байты UTF-8, StringReader ждёт текст
+    return XmlReader.Create(StringReader(data.decode("utf-8")), settings)
+
+
+def _settings():
+    settings = XmlReaderSettings()
+    settings.CheckCharacters = False
+    settings.DtdProcessing = DtdProcessing.Ignore
+    settings.IgnoreWhitespace = True
+    settings.IgnoreComments = True
+    settings.IgnoreProcessingInstructions = True
+    settings.CloseInput = True
+    return settings
+
+
+def _attributes(reader):
+    attrib = {}
+    if reader.HasAttributes:
+        while reader.MoveToNextAttribute():
+            attrib[reader.Name] = reader.Value
+        reader.MoveToElement()
+    return attrib
+
+
+def iter_clash_events(reader, with_elements=False):
+    """События отчёта одним проходом XmlReader.
+
+    ("test", имя) — открыта проверка с именем; ("result", ClashResultRecord)
+    — закрыт clashresult; при with_elements ещё ("element", XmlElement)
+    на каждый открывающий тег (для ReportDateProbe).
+    """
+    element_type = XmlNodeType.Element
+    end_type = XmlNodeType.EndElement
+    text_types = (XmlNodeType.Text, XmlNodeType.CDATA)
+
+    tags = []
+    names = []
+    tests = []
+    record = None
+    result_depth = -1
+    obj = None
+    prop = None
+    text = None
+
+    while reader.Read():
+        node_type = reader.NodeType
+
+        if node_type == element_type:
+            tag = reader.LocalName
+            empty = reader.IsEmptyElement
+            attrib = _attributes(reader)
+            parent = tags[-1] if tags else None
+            depth = len(tags)
+
+            if with_elements:
+                yield "element", XmlElement(tag, attrib)
+
+            if tag in TEST_TAGS:
+                name = attrib.get("name") or attrib.get("displayname")
+                if name:
+                    yield "test", name
+            elif tag == "clashresult" and record is None:
+                parent_name = None
+                for candidate in reversed(names):
+                    if candidate:
+                        parent_name = candidate
+                        break
+                record = ClashResultRecord(
+                    attrib, tests[-1] if tests else None, parent_name
+                )
+                result_depth = depth
+            elif record is not None:
+                if (
+                    tag == "clashobject"
+                    and parent == "clashobjects"
+                    and depth == result_depth + 2
+                ):
+                    obj = ClashObjectRecord()
+                elif tag == "resultstatus" and depth == result_depth + 1:
+                    text = []
+                elif obj is not None:
+                    if tag in PROPERTY_TAGS:
+                        prop = [tag, None, None]
+                    elif prop is not None and tag in ("name", "value") and parent == prop[0]:
+                        text = []
+                    elif parent == "pathlink" and tag in ("node", "path"):
+                        text = []
+
+            tags.append(tag)
+            name = None
+            for attr in NAME_ATTRIBUTES:
+                name = attrib.get(attr)
+                if name:
+                    break
+            names.append(name)
+            if tag == "clashtest":
+                tests.append(attrib.get("name") or u"")
+
+            # Пустой элемент (<tag/>) закрывается сразу
+            if not empty:
+                continue
+
+        elif node_type == end_type:
+            pass
+
+        else:
+            if text is not None and node_type in text_types:
+                text.append(reader.Value)
+            continue
+
+        tag = tags.pop()
+        names.pop()
+        if tag == "clashtest":
+            tests.pop()
+
+        if record is None:
+            continue
+        if tag == "clashresult" and len(tags) == result_depth:
+            yield "result", record
+            record = None
+            obj = None
+            prop = None
+        elif tag == "clashobject" and obj is not None and len(tags) == result_depth + 2:
+            record.objects.append(obj)
+            obj = None
+            prop = None
+        elif text is not None:
+            _close(tag, record, obj, prop, u"".join(text))
+            text = None
+        elif prop is not None and tag == prop[0]:
+            if prop[1] is not None:
+                obj.properties.append((prop[0], prop[1], prop[2] or u""))
+            prop = None
+
+
+def _close(tag, record, obj, prop, value):
+    """Сохраняет текст закрытого листового элемента."""
+    if tag == "resultstatus":
+        record.result_status = value
+    elif tag == "name" and prop is not None:
+        prop[1] = value
+    elif tag == "value" and prop is not None:
+        prop[2] = value
+    elif tag in ("node", "path") and obj is not None:
+        value = value.strip()
+        if value:
+            (obj.nodes if tag == "node" else obj.paths).append(value)
+
+
+def read_clash_report(xml_path, consume, with_elements=False):
+    """consume(события) по отчёту; результат consume.
+
+    Сначала файл читается напрямую; при XmlException (в том числе при
+    открытии) — повторно из очищенного текста, consume вызывается заново
+    с нуля.
+    """
+    settings = _settings()
+    for opener in (_open_file, _open_sanitized):
+        reader = None
+        try:
+            reader = opener(xml_path, settings)
+            return consume(iter_clash_events(reader, with_elements))
+        except XmlException:
+            if opener is _open_sanitized:
+                raise
+        finally:
+            if reader is not None:
+                reader.Close()
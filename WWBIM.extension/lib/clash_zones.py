@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+clash_zones.py — группировка коллизий в пространственные зоны.
+
+Коллизии с перекрывающимися (с запасом) габаритами объединяются в зоны
+через union-find. Кандидаты на перекрытие ищутся по равномерной сетке
+центров габаритов, поэтому сравниваются только соседние ячейки, а не
+все пары. Зона не растёт больше max_extent по любой оси, чтобы длинная
+цепочка трасс не склеивала весь этаж.
+
+Габарит — кортеж (min_x, min_y, min_z, max_x, max_y, max_z).
+"""
+
+
+# Запас вокруг габарита при проверке перекрытия (футы, как в Revit)
+DEFAULT_PAD = 1.0
+
+# Наибольший размер зоны по любой оси (футы)
+DEFAULT_MAX_EXTENT = 30.0
+
+
+def union_box(a, b):
+    """Габарит, охватывающий оба."""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return (
+        min(a[0], b[0]),
+        min(a[1], b[1]),
+        min(a[2], b[2]),
+        max(a[3], b[3]),
+        max(a[4], b[4]),
+        max(a[5], b[5]),
+    )
+
+
+def box_extent(box):
+    return max(box[3] - box[0], box[4] - box[1], box[5] - box[2])
+
+
+def _overlap(a, b, pad):
+    return (
+        a[0] - pad <= b[3] + pad
+        and b[0] - pad <= a[3] + pad
+        and a[1] - pad <= b[4] + pad
+        and b[1] - pad <= a[4] + pad
+        and a[2] - pad <= b[5] + pad
+        and b[2] - pad <= a[5] + pad
+    )
+
+
+def _auto_cell(boxes, pad):
+    """Размер ячейки: 90-й перцентиль размера габарита плюс запас."""
+    sizes = sorted(box_extent(box) for box in boxes)
+    size = sizes[int(len(sizes) * 0.9)] if sizes else 0.0
+    return max(size + 2 * pad, 2 * pad, 1.0)
+
+
+class _UnionFind(object):
+    def __init__(self, boxes):
+        self.parent = list(range(len(boxes)))
+        self.size = [1] * len(boxes)
+        self.box = list(boxes)
+
+    def find(self, i):
+        parent = self.parent
+        root = i
+        while parent[root] != root:
+            root = parent[root]
+        while parent[i] != root:
+            parent[i], i = root, parent[i]
+        return root
+
+    def union(self, a, b, max_extent):
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return
+        merged = union_box(self.box[a], self.box[b])
+        if max_extent and box_extent(merged) > max_extent:
+            return
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+        self.box[a] = merged
+
+
+class Zone(object):
+    """Зона: ключи коллизий и общий габарит."""
+
+    def __init__(self, keys, box):
+        self.keys = keys
+        self.box = box
+        self.label = ""
+
+    def __len__(self):
+        return len(self.keys)
+
+
+def cluster_boxes(items, pad=DEFAULT_PAD, max_extent=DEFAULT_MAX_EXTENT, cell=None):
+    """Разбивает [(ключ, габарит)] на зоны.
+
+    Возвращает список Zone, упорядоченный снизу вверх (по min_z),
+    затем по Y и X; метки зон — «З-001», «З-002», ...
+    """
+    keys = [key for key, _ in items]
+    boxes = [box for _, box in items]
+    if not boxes:
+        return []
+
+    cell = cell or _auto_cell(boxes, pad)
+    uf = _UnionFind(boxes)
+
+    # Крупные габариты проверяются со всеми, мелкие — по соседним ячейкам
+    grid = {}
+    small = []
+    large = []
+    for i, box in enumerate(boxes):
+        if box_extent(box) + 2 * pad > cell:
+            large.append(i)
+            continue
+        key = (
+            int((box[0] + box[3]) * 0.5 // cell),
+            int((box[1] + box[4]) * 0.5 // cell),
+            int((box[2] + box[5]) * 0.5 // cell),
+        )
+        grid.setdefault(key, []).append(i)
+        small.append((i, key))
+
+    for i, (cx, cy, cz) in small:
+        box = boxes[i]
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for dz in (-1, 0, 1):
+                    for j in grid.get((cx + dx, cy + dy, cz + dz), ()):
+                        if j > i and _overlap(box, boxes[j], pad):
+                            uf.union(i, j, max_extent)
+
+    for i in large:
+        box = boxes[i]
+        for j in range(len(boxes)):
+            if j != i and _overlap(box, boxes[j], pad):
+                uf.union(i, j, max_extent)
+
+    members = {}
+    for i in range(len(boxes)):
+        members.setdefault(uf.find(i), []).append(i)
+
+    zones = [
+        Zone([keys[i] for i in indexes], uf.box[root])
+        for root, indexes in members.items()
+    ]
+    zones.sort(key=lambda z: (z.box[2], z.box[1], z.box[0]))
+    for number, zone in enumerate(zones, 1):
+        zone.label = u"З-{:03d}".format(number)
+    return zones
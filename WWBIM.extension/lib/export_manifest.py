@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+export_manifest.py — манифест ночного экспорта с продолжением после сбоя.
+
+Манифест — JSON со списком моделей запуска в исходном порядке и
+состоянием каждой (pending, running, done, skipped, failed), числом
+попыток, временем, путём результата, ревизией исходника и сообщением
+(ошибка или причина пропуска).
+Файл переписывается атомарно после каждого изменения состояния
+(file_io.replace_file).
+
+Манифест привязан к дате ночного запуска (run_date): запуск, начатый
+вечером и упавший после полуночи, продолжается с тем же манифестом.
+
+Если Revit упал, следующий запуск с тем же манифестом продолжает с
+первой незавершённой модели. Модель, оставшаяся в running, считается
+упавшей попыткой. Неудачные модели повторяются после основного прохода
+с растущей паузой (RETRY_BASE_SECONDS * 2^(попытка-1)), не более
+MAX_ATTEMPTS попыток.
+"""
+
+import time
+import datetime
+
+from file_io import read_json, write_json_atomic
+
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+FINISHED_STATES = (DONE, SKIPPED)
+
+MAX_ATTEMPTS = 3
+RETRY_BASE_SECONDS = 60
+
+MANIFEST_FORMAT = 1
+
+# Запуски, начатые раньше этого часа, относятся к ночи предыдущего дня
+RUN_DAY_START_HOUR = 12
+
+
+def run_date(now=None, day_start_hour=RUN_DAY_START_HOUR):
+    """Дата ночного запуска "ГГГГ-ММ-ДД": до day_start_hour — вчерашняя.
+
+    Машины, запущенные до и после полуночи, и перезапуск после сбоя
+    получают одну дату, а значит, общие манифест и очередь.
+    """
+    now = datetime.datetime.now() if now is None else now
+    if now.hour < day_start_hour:
+        now -= datetime.timedelta(days=1)
+    return now.strftime("%Y-%m-%d")
+
+
+def _stamp(moment=None):
+    moment = time.time() if moment is None else moment
+    return datetime.datetime.fromtimestamp(moment).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def model_key(object_name, path):
+    """Ключ модели в манифесте: объект и путь без различий в регистре и слэшах."""
+    return u"{}|{}".format(
+        object_name or "", (path or "").strip().replace("\\", "/").lower()
+    )
+
+
+class ExportManifest(object):
+    """Состояния моделей одного ночного запуска."""
+
+    def __init__(self, path, max_attempts=MAX_ATTEMPTS, retry_base=RETRY_BASE_SECONDS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.entries = []
+        self._by_key = {}
+        self.resumed = False
+
+    def _read(self):
+        if not self.path:
+            return []
+        data = read_json(self.path)
+        if not isinstance(data, dict) or data.get("format") != MANIFEST_FORMAT:
+            return []
+        return [e for e in data.get("models") or [] if isinstance(e, dict)]
+
+    def prepare(self, models):
+        """Сводит список [(объект, путь)] с сохранённым манифестом.
+
+        Состояния моделей из прошлого (прерванного) запуска сохраняются,
+        новые модели добавляются как pending, исчезнувшие из списка —
+        отбрасываются. Завершённый запуск (всё выполнено или попытки
+        исчерпаны) не продолжается — начинается новый.
+        Возвращает число моделей, которые осталось обработать.
+        """
+        saved = dict((e.get("key"), e) for e in self._read())
+        if all(self._is_closed(e) for e in saved.values()):
+            saved = {}
+        self.resumed = bool(saved)
+        self.entries = []
+        self._by_key = {}
+        for object_name, path in models:
+            key = model_key(object_name, path)
+            if key in self._by_key:
+                continue
+            entry = saved.get(key)
+            if entry is None:
+                entry = {
+                    "key": key,
+                    "object": object_name,
+                    "path": path,
+                    "state": PENDING,
+                    "attempts": 0,
+                }
+            elif entry.get("state") == RUNNING:
+                # Запуск оборвался на этой модели
+                entry["state"] = FAILED
+                entry["message"] = "Interrupted (Revit closed during export)"
+                entry["retry_at"] = self._retry_at(entry)
+            self.entries.append(entry)
+            self._by_key[key] = entry
+        self.save()
+        return len(self.unfinished())
+
+    def unfinished(self):
+        return [e for e in self.entries if e.get("state") not in FINISHED_STATES]
+
+    def _retry_at(self, entry):
+        attempts = max(1, int(entry.get("attempts") or 1))
+        return time.time() + self.retry_base * (2 ** (attempts - 1))
+
+    def _can_retry(self, entry):
+        return int(entry.get("attempts") or 0) < self.max_attempts
+
+    def _is_closed(self, entry):
+        state = entry.get("state")
+        return state in FINISHED_STATES or (
+            state == FAILED and not self._can_retry(entry)
+        )
+
+    def next_job(self, now=None):
+        """(запись, 0) — следующая модель; (None, секунды) — ждать повтора;
+        (None, 0) — всё обработано.
+
+        Сначала модели pending по порядку (кроме отложенных), затем
+        повторы неудачных, у которых истекла пауза.
+        """
+        now = time.time() if now is None else now
+        wait = None
+        for entry in self.entries:
+            if entry.get("state") != PENDING:
+                continue
+            delay = float(entry.get("retry_at") or 0) - now
+            if delay <= 0:
+                return entry, 0
+            wait = delay if wait is None else min(wait, delay)
+
+        for entry in self.entries:
+            if entry.get("state") != FAILED or not self._can_retry(entry):
+                continue
+            delay = float(entry.get("retry_at") or 0) - now
+            if delay <= 0:
+                return entry, 0
+            wait = delay if wait is None else min(wait, delay)
+        return None, (wait or 0)
+
+    def defer(self, entry, seconds):
+        """Откладывает модель (например, её экспортирует другая машина)."""
+        entry["retry_at"] = time.time() + seconds
+        self.save()
+
+    def start(self, entry):
+        entry["state"] = RUNNING
+        entry["attempts"] = int(entry.get("attempts") or 0) + 1
+        entry["started"] = _stamp()
+        entry["started_ts"] = time.time()
+        entry.pop("finished", None)
+        entry.pop("retry_at", None)
+        self.save()
+
+    def finish(self, entry, state, output=None, revision=None, message=None, timings=None):
+        """Записывает итог попытки: done, skipped или failed (message — ошибка
+        или причина пропуска)."""
+        entry["state"] = state
+        entry["finished"] = _stamp()
+        entry["seconds"] = round(time.time() - float(entry.get("started_ts") or time.time()), 1)
+        entry["output"] = output
+        entry["revision"] = revision
+        entry["message"] = message
+        entry["timings"] = timings or {}
+        if state == FAILED:
+            entry["retry_at"] = self._retry_at(entry)
+        else:
+            entry.pop("retry_at", None)
+        self.save()
+
+    def counts(self):
+        """Число моделей по состояниям."""
+        result = {}
+        for entry in self.entries:
+            state = entry.get("state")
+            result[state] = result.get(state, 0) + 1
+        return result
+
+    def save(self):
+        """Атомарно переписывает манифест; False, если запись не удалась."""
+        if not self.path:
+            return False
+        try:
+            write_json_atomic(
+                self.path,
+                {"format": MANIFEST_FORMAT, "updated": _stamp(), "models": self.entries},
+                indent=1,
+            )
+            return True
+        except Exception:
+            return False
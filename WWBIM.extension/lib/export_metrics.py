@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""
+export_metrics.py — история метрик ночного экспорта и отчёт о деградации.
+
+После каждой модели в JSON-lines дописывается запись: вид экспорта
+(nwc/rvt), машина, путь модели, итог и метрики — длительности открытия,
+настройки рабочих наборов, подготовки вида, экспорта и закрытия (с),
+размер результата (МБ) и число элементов.
+
+История лежит в общей папке (AUTO_NWC|AUTO_RVT\metrics): модели
+делятся между машинами через очередь, поэтому каждая машина пишет свой
+файл metrics_<машина>.jsonl, а при чтении файлы всех машин сливаются
+по времени записи.
+
+find_regressions сравнивает последний запуск модели с медианой её
+предыдущих успешных запусков (скользящее окно) и отмечает модели, у
+которых время экспорта или размер файла выросли больше порога. Так видно,
+какие модели тяжелеют, раньше, чем ночной запуск перестанет укладываться
+в окно.
+"""
+
+import io
+import os
+import json
+import datetime
+
+from file_io import host_name, write_text_atomic
+
+
+# Метрики записи (числа; отсутствующие — None)
+METRIC_FIELDS = ("open", "worksets", "view", "export", "close", "size_mb", "elements")
+
+# Что проверяется в отчёте
+REPORT_METRICS = ("export", "size_mb")
+
+# Рост больше чем в (1 + порог) раз от медианы считается деградацией
+DEFAULT_THRESHOLD = 0.5
+
+# Сколько прошлых запусков берётся для медианы и сколько нужно минимум
+DEFAULT_WINDOW = 10
+MIN_HISTORY = 3
+
+# Минимальный абсолютный рост, чтобы не шуметь на маленьких моделях
+MIN_DELTA = {"export": 30.0, "size_mb": 5.0}
+
+# При превышении размера файл сжимается до KEEP_RUNS записей на модель
+COMPACT_BYTES = 4 * 1024 * 1024
+KEEP_RUNS = 60
+
+# Файлы машин в папке метрик: metrics_<машина>.jsonl
+FILE_PREFIX = "metrics_"
+FILE_SUFFIX = ".jsonl"
+
+
+def model_id(kind, path):
+    """Ключ модели в истории: вид экспорта и путь без различий в регистре."""
+    return u"{}|{}".format(kind, (path or "").strip().replace("\\", "/").lower())
+
+
+def median(values):
+    values = sorted(values)
+    if not values:
+        return None
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+def _read_records(path, kind=None):
+    """Записи файла в порядке добавления (битые строки пропускаются)."""
+    records = []
+    try:
+        with io.open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(record, dict) and (
+                    kind is None or record.get("kind") == kind
+                ):
+                    records.append(record)
+    except Exception:
+        return records
+    return records
+
+
+class MetricsStore(object):
+    """История метрик в общей папке: файл на машину, дописывается по
+    строке на модель; load сливает файлы всех машин."""
+
+    def __init__(
+        self, directory, owner=None, compact_bytes=COMPACT_BYTES, keep_runs=KEEP_RUNS
+    ):
+        self.directory = directory
+        self.owner = owner or host_name()
+        self.path = os.path.join(
+            directory, "{}{}{}".format(FILE_PREFIX, self.owner, FILE_SUFFIX)
+        )
+        self.compact_bytes = compact_bytes
+        self.keep_runs = keep_runs
+
+    def append(self, kind, run, model, state, metrics):
+        """Дописывает запись о модели; ошибки записи не критичны."""
+        record = {
+            "time": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "run": run,
+            "owner": self.owner,
+            "kind": kind,
+            "model": model,
+            "state": state,
+        }
+        for name in METRIC_FIELDS:
+            value = (metrics or {}).get(name)
+            record[name] = None if value is None else round(float(value), 3)
+        try:
+            folder = os.path.dirname(self.path)
+            if folder and not os.path.isdir(folder):
+                os.makedirs(folder)
+            with io.open(self.path, "a", encoding="utf-8") as f:
+                f.write(u"{}\n".format(json.dumps(record, ensure_ascii=False)))
+        except Exception:
+            return False
+        try:
+            if os.path.getsize(self.path) > self.compact_bytes:
+                self.compact()
+        except Exception:
+            pass
+        return True
+
+    def paths(self):
+        """Файлы метрик всех машин."""
+        try:
+            names = os.listdir(self.directory)
+        except Exception:
+            return []
+        return [
+            os.path.join(self.directory, name)
+            for name in sorted(names)
+            if name.startswith(FILE_PREFIX) and name.endswith(FILE_SUFFIX)
+        ]
+
+    def load(self, kind=None):
+        """Записи всех машин по времени записи."""
+        records = []
+        for path in self.paths():
+            records.extend(_read_records(path, kind))
+        records.sort(key=lambda record: record.get("time") or "")
+        return records
+
+    def compact(self):
+        """Оставляет в файле этой машины последние keep_runs записей каждой модели."""
+        records = _read_records(self.path)
+        counts = {}
+        kept = []
+        for record in reversed(records):
+            key = model_id(record.get("kind"), record.get("model"))
+            counts[key] = counts.get(key, 0) + 1
+            if counts[key] <= self.keep_runs:
+                kept.append(record)
+        kept.reverse()
+
+        text = u"".join(
+            u"{}\n".format(json.dumps(record, ensure_ascii=False)) for record in kept
+        )
+        try:
+            write_text_atomic(self.path, text)
+        except Exception:
+            return False
+        return True
+
+
+class Regression(object):
+    """Метрика модели, выросшая относительно медианы прошлых запусков."""
+
+    def __init__(self, model, metric, value, baseline, runs):
+        self.model = model
+        self.metric = metric
+        self.value = value
+        self.baseline = baseline
+        self.runs = runs
+
+    @property
+    def ratio(self):
+        return self.value / self.baseline if self.baseline else float("inf")
+
+
+def find_regressions(
+    records,
+    run=None,
+    metrics=REPORT_METRICS,
+    threshold=DEFAULT_THRESHOLD,
+    window=DEFAULT_WINDOW,
+    min_history=MIN_HISTORY,
+    min_delta=None,
+):
+    """Деградации последних успешных запусков моделей.
+
+    run — проверять только модели, последний успешный запуск которых
+    относится к этому запуску. Медиана считается по не более чем window
+    предыдущим успешным запускам; при истории короче min_history модель
+    не проверяется. Результат отсортирован по росту (сильнейший первым).
+    """
+    min_delta = MIN_DELTA if min_delta is None else min_delta
+    history = {}
+    for record in records:
+        if record.get("state") != "done":
+            continue
+        key = model_id(record.get("kind"), record.get("model"))
+        history.setdefault(key, []).append(record)
+
+    result = []
+    for runs in history.values():
+        latest = runs[-1]
+        if run is not None and latest.get("run") != run:
+            continue
+        previous = runs[:-1][-window:]
+        for metric in metrics:
+            value = latest.get(metric)
+            if value is None:
+                continue
+            past = [r.get(metric) for r in previous if r.get(metric) is not None]
+            if len(past) < min_history:
+                continue
+            baseline = median(past)
+            if value <= baseline * (1.0 + threshold):
+                continue
+            if value - baseline < min_delta.get(metric, 0.0):
+                continue
+            result.append(
+                Regression(latest.get("model"), metric, value, baseline, len(past))
+            )
+    result.sort(key=lambda r: r.ratio, reverse=True)
+    return result
+
+
+def format_report(regressions, threshold=DEFAULT_THRESHOLD):
+    """Строки отчёта для журнала."""
+    if not regressions:
+        return ["Metrics: no regressions (threshold +{:.0%})".format(threshold)]
+    units = {"size_mb": "MB"}
+    lines = [
+        "Metrics: {} regression(s) against rolling median (threshold +{:.0%}):".format(
+            len(regressions), threshold
+        )
+    ]
+    for item in regressions:
+        unit = units.get(item.metric, "s")
+        lines.append(
+            u"  {}: {} {:.1f} {} vs median {:.1f} {} (x{:.2f}, {} runs)".format(
+                os.path.basename(item.model or ""),
+                item.metric,
+                item.value,
+                unit,
+                item.baseline,
+                unit,
+                item.ratio,
+                item.runs,
+            )
+        )
+    return lines
@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+"""
+export_queue.py — общая очередь ночного экспорта для нескольких машин.
+
+Все машины читают один и тот же список моделей, а кто какую модель
+экспортирует, решается в общей папке очереди (на Y:). Модель занимается
+атомарным созданием файла-блокировки <ключ>.lock (O_CREAT | O_EXCL):
+это удаётся только одной машине. Пока модель в работе, фоновый поток
+обновляет время изменения блокировки (heartbeat); блокировка, не
+обновлявшаяся дольше LEASE_SECONDS, считается брошенной (машина упала)
+и забирается другой машиной. По завершении пишется <ключ>.done, по
+ошибке — <ключ>.failed с общим числом попыток, и блокировка снимается.
+
+Папку очереди можно подменить локальной временной папкой.
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+
+from export_manifest import FAILED, SKIPPED, model_key
+from file_io import host_name, read_json, write_json_atomic
+
+
+# Блокировка без heartbeat дольше этого считается брошенной, с
+LEASE_SECONDS = 600
+
+# Период обновления блокировки, с
+HEARTBEAT_SECONDS = 60
+
+# Через сколько перепроверять модель, занятую другой машиной, с
+HELD_RECHECK_SECONDS = 120
+
+# Итоги claim()
+CLAIMED = "claimed"
+HELD = "held"
+FINISHED = "finished"
+EXHAUSTED = "exhausted"
+
+
+def default_owner():
+    """Имя машины и процесс — владелец блокировки."""
+    return "{}:{}".format(host_name(), os.getpid())
+
+
+def _read_json(path):
+    data = read_json(path)
+    return data if isinstance(data, dict) else {}
+
+
+class Claim(object):
+    """Занятая этой машиной модель."""
+
+    def __init__(self, key, lock_path):
+        self.key = key
+        self.lock_path = lock_path
+
+
+class ExportQueue(object):
+    """Очередь в общей папке: блокировки, отметки о завершении и попытках."""
+
+    def __init__(
+        self, directory, owner=None, lease_seconds=LEASE_SECONDS, max_attempts=None
+    ):
+        self.directory = directory
+        self.owner = owner or default_owner()
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                if not os.path.isdir(directory):
+                    raise
+
+    def _base(self, key):
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:24]
+        return os.path.join(self.directory, digest)
+
+    def _is_expired(self, lock_path, now):
+        try:
+            return now - os.path.getmtime(lock_path) > self.lease_seconds
+        except OSError:
+            return False
+
+    def _create_lock(self, key, lock_path):
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except OSError:
+            return False
+        try:
+            payload = {"key": key, "owner": self.owner, "claimed": time.time()}
+            os.write(fd, json.dumps(payload).encode("utf-8"))
+        finally:
+            os.close(fd)
+        return True
+
+    def _break_expired(self, lock_path):
+        """Убирает брошенную блокировку; True, если её больше нет."""
+        aside = "{}.expired.{}.{}".format(
+            lock_path, self.owner.replace(":", "_"), int(time.time() * 1000)
+        )
+        try:
+            os.rename(lock_path, aside)
+        except OSError:
+            return not os.path.exists(lock_path)
+
+        # Другая машина могла успеть занять модель заново — вернуть её блокировку
+        if not self._is_expired(aside, time.time()):
+            try:
+                os.rename(aside, lock_path)
+            except OSError:
+                pass
+            return False
+        try:
+            os.remove(aside)
+        except OSError:
+            pass
+        return True
+
+    def status(self, key):
+        """Состояние модели в очереди: dict из .done / .failed / .lock."""
+        base = self._base(key)
+        return {
+            "done": _read_json(base + ".done") if os.path.exists(base + ".done") else None,
+            "failed": _read_json(base + ".failed"),
+            "lock": _read_json(base + ".lock") if os.path.exists(base + ".lock") else None,
+        }
+
+    def claim(self, key):
+        """(Claim или None, итог): CLAIMED, HELD, FINISHED или EXHAUSTED."""
+        base = self._base(key)
+        if os.path.exists(base + ".done"):
+            return None, FINISHED
+        if self.max_attempts:
+            attempts = int(_read_json(base + ".failed").get("attempts") or 0)
+            if attempts >= self.max_attempts:
+                return None, EXHAUSTED
+
+        lock_path = base + ".lock"
+        for _ in range(2):
+            if self._create_lock(key, lock_path):
+                # Модель могли завершить между проверкой и блокировкой
+                if os.path.exists(base + ".done"):
+                    self._remove(lock_path)
+                    return None, FINISHED
+                return Claim(key, lock_path), CLAIMED
+            if not self._is_expired(lock_path, time.time()):
+                return None, HELD
+            if not self._break_expired(lock_path):
+                return None, HELD
+        return None, HELD
+
+    def heartbeat(self, claim):
+        """Продлевает аренду блокировки."""
+        try:
+            os.utime(claim.lock_path, None)
+            return True
+        except OSError:
+            return False
+
+    def complete(self, claim, state, info=None):
+        """Отмечает итог и снимает блокировку."""
+        base = self._base(claim.key)
+        record = dict(info or {})
+        record.update(
+            {"key": claim.key, "owner": self.owner, "state": state, "finished": time.time()}
+        )
+        try:
+            if state == FAILED:
+                record["attempts"] = (
+                    int(_read_json(base + ".failed").get("attempts") or 0) + 1
+                )
+                write_json_atomic(base + ".failed", record)
+            else:
+                write_json_atomic(base + ".done", record)
+        finally:
+            self._remove(claim.lock_path)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class LeaseKeeper(object):
+    """Фоновый heartbeat блокировки на время экспорта модели.
+
+    with LeaseKeeper(queue, claim):
+        export(...)
+    """
+
+    def __init__(self, queue, claim, interval=HEARTBEAT_SECONDS):
+        self.queue = queue
+        self.claim = claim
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.queue.heartbeat(self.claim)
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(5)
+        return False
+
+
+def run_jobs(manifest, process, log, queue=None, sleep=time.sleep):
+    """Обрабатывает модели манифеста; с queue — согласованно с другими машинами.
+
+    process(index, total, object_name, path) -> dict(state, output,
+    revision, message, timings). Модель, занятая другой машиной,
+    откладывается и перепроверяется позже; завершённая другой машиной —
+    отмечается как пропущенная.
+    """
+    while True:
+        entry, wait = manifest.next_job()
+        if entry is None:
+            if not wait:
+                break
+            log("Waiting {:.0f} s for models in progress or retries...".format(wait))
+            sleep(wait)
+            continue
+
+        claim = None
+        if queue is not None:
+            key = model_key(entry["object"], entry["path"])
+            claim, outcome = queue.claim(key)
+            if outcome == FINISHED:
+                info = queue.status(key)["done"] or {}
+                manifest.finish(
+                    entry,
+                    SKIPPED,
+                    output=info.get("output"),
+                    revision=info.get("revision"),
+                    message="Processed by {}".format(info.get("owner") or "another machine"),
+                )
+                continue
+            if outcome == EXHAUSTED:
+                entry["attempts"] = manifest.max_attempts
+                manifest.finish(entry, FAILED, message="Retries exhausted on other machines")
+                continue
+            if outcome == HELD:
+                manifest.defer(entry, HELD_RECHECK_SECONDS)
+                continue
+
+        index = manifest.entries.index(entry) + 1
+        if entry.get("attempts"):
+            log("RETRY (attempt {}): {}".format(entry["attempts"] + 1, entry["path"]))
+        manifest.start(entry)
+        try:
+            if claim is not None:
+                with LeaseKeeper(queue, claim):
+                    result = process(
+                        index, len(manifest.entries), entry["object"], entry["path"]
+                    )
+            else:
+                result = process(
+                    index, len(manifest.entries), entry["object"], entry["path"]
+                )
+        except Exception as e:
+            log("  ERROR: {}".format(e))
+            result = {"state": FAILED, "message": str(e)}
+
+        state = result.get("state", FAILED)
+        manifest.finish(
+            entry,
+            state,
+            output=result.get("output"),
+            revision=result.get("revision"),
+            message=result.get("message"),
+            timings=result.get("timings"),
+        )
+        if claim is not None:
+            queue.complete(
+                claim,
+                state,
+                {"output": result.get("output"), "revision": result.get("revision")},
+            )
+    return manifest.counts()
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+export_records.py — ревизии исходных моделей и записи о выполненных экспортах.
+
+Для моделей Revit Server нет даты файла, поэтому ревизия берётся через
+REST API сервера (RevitServerApi): DateModified из /model/details и номер
+последней версии из /model/ModelHistories. Записи о последнем успешном
+экспорте каждой модели (ревизия, путь результата, время) хранятся в одном
+JSON; ночной экспорт пропускает модель, если ревизия не изменилась,
+не открывая её.
+
+Если REST API недоступен (нет сети), ревизия не определяется и модель
+экспортируется, как раньше.
+"""
+
+import datetime
+
+from file_io import acquire_lock, read_json, release_lock, write_json_atomic
+
+try:
+    from RESTAPI_script import RevitServerApi
+except Exception:
+    RevitServerApi = None
+
+
+# Адрес REST API Revit Server: хост из RSN-пути и версия Revit
+SERVER_URL_TEMPLATE = "http://{host}/RevitServerAdmin{version}"
+
+# Глубина обхода дерева папок сервера при поиске моделей
+MODEL_TREE_DEPTH = 10
+
+RECORDS_FORMAT = 1
+
+# Сколько ждать блокировку файла записей другой машиной и когда она брошена, с
+SAVE_LOCK_WAIT_SECONDS = 30
+SAVE_LOCK_STALE_SECONDS = 120
+
+
+def record_key(path):
+    """Ключ модели: путь без различий в регистре и слэшах."""
+    return (path or "").strip().replace("\\", "/").rstrip("/").lower()
+
+
+def split_rsn_path(path):
+    """RSN://host/папка/Модель.rvt -> (host, "папка/Модель.rvt") или (None, None)."""
+    text = (path or "").strip().replace("\\", "/")
+    if not text.upper().startswith("RSN:"):
+        return None, None
+    parts = [part for part in text[4:].split("/") if part]
+    if len(parts) < 2:
+        return None, None
+    return parts[0], "/".join(parts[1:])
+
+
+def latest_episode(history):
+    """Номер последней версии из ответа /model/ModelHistories или None."""
+    items = history
+    if isinstance(history, dict):
+        items = history.get("Items") or history.get("items") or []
+    if not isinstance(items, list):
+        return None
+
+    latest = None
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        for name in ("VersionNumber", "Version", "Episode"):
+            value = item.get(name)
+            if value is None:
+                continue
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                continue
+            if latest is None or value > latest:
+                latest = value
+            break
+    return latest
+
+
+class RevisionProbe(object):
+    """Ревизии моделей Revit Server через REST API (одно дерево на сервер)."""
+
+    def __init__(self, version, timeout_sec=10, log=None):
+        self.version = version
+        self.timeout_sec = timeout_sec
+        self._log = log
+        self._clients = {}
+        self._models = {}
+
+    def _warn(self, message):
+        if self._log is not None:
+            try:
+                self._log(message)
+            except Exception:
+                pass
+
+    def _client(self, host):
+        if host not in self._clients:
+            client = None
+            if RevitServerApi is not None:
+                url = SERVER_URL_TEMPLATE.format(host=host, version=self.version)
+                client = RevitServerApi(base_url=url, timeout_sec=self.timeout_sec)
+            self._clients[host] = client
+        return self._clients[host]
+
+    def _model_index(self, host, client):
+        """Модели сервера по имени файла (дерево запрашивается один раз)."""
+        if host not in self._models:
+            index = {}
+            try:
+                for node in client.list_models(depth=MODEL_TREE_DEPTH):
+                    name = (node.get("Name") or "").lower()
+                    index.setdefault(name, []).append(node)
+            except Exception as ex:
+                self._warn("  WARNING: Revit Server API unavailable ({}): {}".format(host, ex))
+                index = None
+            self._models[host] = index
+        return self._models[host]
+
+    def _find_model(self, host, relative, client):
+        index = self._model_index(host, client)
+        if not index:
+            return None
+        name = relative.split("/")[-1].lower()
+        nodes = index.get(name) or []
+        if len(nodes) > 1:
+            for node in nodes:
+                server_path = record_key(node.get("ServerPath"))
+                if server_path.endswith(record_key(relative)):
+                    return node
+        return nodes[0] if nodes else None
+
+    def revision(self, rsn_path):
+        """Строка ревизии модели ("DateModified|версия") или None."""
+        host, relative = split_rsn_path(rsn_path)
+        if not host:
+            return None
+        client = self._client(host)
+        if client is None:
+            return None
+
+        node = self._find_model(host, relative, client)
+        if node is None:
+            return None
+
+        try:
+            details = client.get_model_details(node.get("Id")) or {}
+            history = client.get_model_history(node.get("Id"))
+        except Exception as ex:
+            self._warn("  WARNING: Cannot read model revision: {}".format(ex))
+            return None
+
+        modified = details.get("DateModified") if isinstance(details, dict) else None
+        episode = latest_episode(history)
+        if not modified and episode is None:
+            return None
+        return "{}|{}".format(modified or "", "" if episode is None else episode)
+
+
+class ExportRecords(object):
+    """Записи о последнем успешном экспорте моделей (JSON, атомарная запись).
+
+    При сохранении файл перечитывается и в него вносятся только
+    изменённые в этом запуске модели, чтобы не затереть записи других машин.
+    Чтение-слияние-запись выполняется под файлом-блокировкой <файл>.lock;
+    если её не удалось взять, изменения остаются до следующего сохранения.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._records = self._read()
+        self._changed = {}
+
+    def _read(self):
+        if not self.path:
+            return {}
+        data = read_json(self.path)
+        records = data.get("models") if isinstance(data, dict) else None
+        return records if isinstance(records, dict) else {}
+
+    def get(self, path):
+        return self._records.get(record_key(path))
+
+    def update(self, path, revision, output_path):
+        """Запоминает успешный экспорт модели и сразу сохраняет файл."""
+        record = {
+            "path": path,
+            "revision": revision,
+            "output": output_path,
+            "exported": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        key = record_key(path)
+        self._records[key] = record
+        self._changed[key] = record
+        return self.save()
+
+    def save(self):
+        if not self.path or not self._changed:
+            return False
+
+        lock_path = self.path + ".lock"
+        if not acquire_lock(
+            lock_path,
+            stale_seconds=SAVE_LOCK_STALE_SECONDS,
+            wait_seconds=SAVE_LOCK_WAIT_SECONDS,
+        ):
+            return False
+        try:
+            records = self._read()
+            records.update(self._changed)
+            write_json_atomic(
+                self.path,
+                {"format": RECORDS_FORMAT, "models": records},
+                indent=1,
+                sort_keys=True,
+            )
+        except Exception:
+            return False
+        finally:
+            release_lock(lock_path)
+
+        self._records = records
+        self._changed = {}
+        return True
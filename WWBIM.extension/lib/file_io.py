@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+file_io.py — атомарная замена файлов и чтение JSON с резервной копией.
+
+В IronPython 2.7 нет os.replace, а os.rename в Windows не перезаписывает
+существующий файл. replace_file заменяет файл одной операцией: os.replace
+(CPython 3, IronPython 3) или System.IO.File.Replace (IronPython 2.7).
+Если нет ни того, ни другого, старый файл сначала переименовывается в
+<путь>.bak, и read_json читает его, если запись оборвалась между двумя
+переименованиями.
+
+write_json_atomic и write_text_atomic пишут во временный файл рядом с
+целевым (имя с машиной и процессом, чтобы машины с общей папкой не
+писали в один и тот же временный файл) и подменяют им целевой.
+
+acquire_lock — файл-блокировка (O_CREAT | O_EXCL) для чтения-слияния-записи
+общего файла несколькими машинами.
+"""
+
+import io
+import os
+import json
+import time
+import socket
+
+try:
+    from System.IO import File as _File
+except Exception:
+    _File = None
+
+
+BACKUP_SUFFIX = ".bak"
+
+
+def host_name():
+    """Имя машины (COMPUTERNAME или имя хоста)."""
+    host = os.environ.get("COMPUTERNAME")
+    if not host:
+        try:
+            host = socket.gethostname()
+        except Exception:
+            host = "unknown"
+    return host
+
+
+def temp_path(path):
+    """Временный файл рядом с path, свой у каждой машины и процесса."""
+    return "{}.{}-{}.tmp".format(path, host_name(), os.getpid())
+
+
+def acquire_lock(lock_path, owner=None, stale_seconds=600, wait_seconds=0, poll=0.2):
+    """Создаёт файл-блокировку атомарно; брошенную (старше stale_seconds)
+    снимает. Ждёт освобождения до wait_seconds; True — блокировка взята."""
+    owner = owner if owner is not None else "{}:{}".format(host_name(), os.getpid())
+    deadline = time.time() + wait_seconds
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            try:
+                os.write(fd, u"{}\n".format(owner).encode("utf-8"))
+            finally:
+                os.close(fd)
+            return True
+        except OSError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) > stale_seconds:
+                    os.remove(lock_path)
+                    continue
+            except Exception:
+                pass
+        if time.time() >= deadline:
+            return False
+        time.sleep(poll)
+
+
+def release_lock(lock_path):
+    try:
+        os.remove(lock_path)
+    except Exception:
+        pass
+
+
+def replace_file(tmp_path, path):
+    """Атомарно заменяет path файлом tmp_path."""
+    replace = getattr(os, "replace", None)
+    if replace is not None:
+        replace(tmp_path, path)
+        return
+    if _File is not None:
+        if _File.Exists(path):
+            _File.Replace(tmp_path, path, None)
+        else:
+            _File.Move(tmp_path, path)
+        return
+
+    backup = path + BACKUP_SUFFIX
+    if os.path.exists(path):
+        if os.path.exists(backup):
+            os.remove(backup)
+        os.rename(path, backup)
+    os.rename(tmp_path, path)
+    try:
+        os.remove(backup)
+    except OSError:
+        pass
+
+
+def read_json(path, default=None):
+    """Содержимое JSON-файла; при его отсутствии или порче — резервной
+    копии <путь>.bak; иначе default."""
+    for candidate in (path, path + BACKUP_SUFFIX):
+        if not os.path.exists(candidate):
+            continue
+        try:
+            with io.open(candidate, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            continue
+    return default
+
+
+def write_text_atomic(path, text):
+    """Атомарно переписывает path текстом (UTF-8); папка создаётся.
+
+    Ошибка пробрасывается, временный файл при этом удаляется.
+    """
+    folder = os.path.dirname(path)
+    if folder and not os.path.isdir(folder):
+        try:
+            os.makedirs(folder)
+        except OSError:
+            if not os.path.isdir(folder):
+                raise
+    tmp_path = temp_path(path)
+    try:
+        with io.open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        replace_file(tmp_path, path)
+    except Exception:
+        try:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        except Exception:
+            pass
+        raise
+
+
+def write_json_atomic(path, data, indent=None, sort_keys=False):
+    """Атомарно переписывает path JSON-представлением data."""
+    write_text_atomic(
+        path,
+        u"{}".format(
+            json.dumps(data, ensure_ascii=False, indent=indent, sort_keys=sort_keys)
+        ),
+    )
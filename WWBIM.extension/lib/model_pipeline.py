@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+model_pipeline.py — несколько действий над моделью за одно открытие.
+
+Открытие модели — самый долгий шаг пакетных операций и ночных выгрузок.
+Pipeline открывает модель один раз и выполняет этапы по порядку
+(например: скрипты пакетных операций, экспорт NWC, экспорт RVT с
+очисткой). Каждый этап изолирован:
+
+- modify(ctx) выполняется внутри собственной группы транзакций; при
+  ошибке группа откатывается, и следующие этапы видят модель такой,
+  какой она была до этапа;
+- finish(ctx) выполняется после закрытия группы — здесь экспорт и
+  SaveAs, которые нельзя вызывать при открытой группе.
+
+Для каждого этапа записывается StageResult (итог, время, сообщение,
+данные). Этап с final=True (сохранение модели в другой файл) может быть
+только последним: после SaveAs документ указывает на новый файл.
+
+Открытие, закрытие и группы транзакций передаются снаружи
+(pipeline_stages.py для Revit).
+"""
+
+import time
+
+from export_manifest import DONE, FAILED, SKIPPED
+
+
+class StageResult(object):
+    """Итог этапа для одной модели."""
+
+    def __init__(self, name):
+        self.name = name
+        self.state = SKIPPED
+        self.seconds = 0.0
+        self.message = None
+        self.data = {}
+
+    def as_dict(self):
+        record = {
+            "stage": self.name,
+            "state": self.state,
+            "seconds": round(self.seconds, 1),
+            "message": self.message,
+        }
+        record.update(self.data)
+        return record
+
+
+class Stage(object):
+    """Этап конвейера. Наследники переопределяют modify и/или finish.
+
+    modify и finish возвращают None или dict: ключи "state" и "message"
+    задают итог, остальные попадают в StageResult.data.
+    """
+
+    name = "stage"
+    # Этап сохраняет модель в другой файл — только последним
+    final = False
+    # Изменения этапа должны попасть в исходную модель (синхронизация)
+    modifies_model = False
+    # Ошибка этапа останавливает оставшиеся этапы модели
+    stop_on_failure = False
+
+    def applies(self, ctx):
+        """None — выполнять; строка — причина пропуска."""
+        return None
+
+    def modify(self, ctx):
+        return None
+
+    def finish(self, ctx):
+        return None
+
+
+class ModelContext(object):
+    """Открытая модель и общие данные этапов."""
+
+    def __init__(self, path, object_name=None, log=None):
+        self.path = path
+        self.object_name = object_name
+        self.log = log or (lambda message: None)
+        self.doc = None
+        self.data = {}
+        self.results = []
+
+
+def _apply(result, returned):
+    """Переносит ответ modify/finish в результат; True — этап продолжается."""
+    if not isinstance(returned, dict):
+        return True
+    returned = dict(returned)
+    state = returned.pop("state", None)
+    message = returned.pop("message", None)
+    if message:
+        result.message = message
+    result.data.update(returned)
+    if state in (FAILED, SKIPPED):
+        result.state = state
+        return False
+    return True
+
+
+class Pipeline(object):
+    """Одно открытие модели — упорядоченные этапы — одно закрытие.
+
+    opener(ctx) -> документ; closer(ctx) закрывает ctx.doc;
+    group_factory(doc, name) -> объект с start(), assimilate(), rollback().
+    """
+
+    def __init__(self, stages, opener, closer, group_factory, log=None):
+        stages = list(stages)
+        for stage in stages[:-1]:
+            if stage.final:
+                raise ValueError(
+                    "Stage '{}' saves the model and must be the last one".format(
+                        stage.name
+                    )
+                )
+        self.stages = stages
+        self.opener = opener
+        self.closer = closer
+        self.group_factory = group_factory
+        self.log = log
+
+    def run_stage(self, stage, ctx):
+        result = StageResult(stage.name)
+        started = time.time()
+        try:
+            reason = stage.applies(ctx)
+            if reason:
+                result.message = reason
+                return result
+
+            group = self.group_factory(ctx.doc, stage.name)
+            group.start()
+            try:
+                proceed = _apply(result, stage.modify(ctx))
+            except Exception as ex:
+                group.rollback()
+                result.state = FAILED
+                result.message = "{}".format(ex)
+                return result
+            if proceed:
+                group.assimilate()
+            else:
+                group.rollback()
+                return result
+
+            if _apply(result, stage.finish(ctx)):
+                result.state = DONE
+        except Exception as ex:
+            result.state = FAILED
+            result.message = "{}".format(ex)
+        finally:
+            result.seconds = time.time() - started
+        return result
+
+    def run(self, path, object_name=None):
+        """Выполняет этапы над моделью. Возвращает dict:
+        {"path", "state", "open", "close", "message", "stages": [...]}.
+        """
+        ctx = ModelContext(path, object_name, self.log)
+        summary = {"path": path, "state": FAILED, "message": None, "stages": []}
+
+        started = time.time()
+        try:
+            ctx.doc = self.opener(ctx)
+        except Exception as ex:
+            summary["message"] = "Cannot open model: {}".format(ex)
+            summary["open"] = round(time.time() - started, 1)
+            return summary
+        summary["open"] = round(time.time() - started, 1)
+
+        stopped = None
+        try:
+            for stage in self.stages:
+                if stopped is not None:
+                    result = StageResult(stage.name)
+                    result.message = "Stopped after failed stage '{}'".format(stopped)
+                else:
+                    ctx.log("  Stage: {}".format(stage.name))
+                    result = self.run_stage(stage, ctx)
+                    ctx.log(
+                        "  {}: {} ({:.1f} s){}".format(
+                            stage.name,
+                            result.state,
+                            result.seconds,
+                            ", {}".format(result.message) if result.message else "",
+                        )
+                    )
+                    if result.state == FAILED and stage.stop_on_failure:
+                        stopped = stage.name
+                ctx.results.append(result)
+        finally:
+            started = time.time()
+            try:
+                self.closer(ctx)
+                close_failed = False
+            except Exception as ex:
+                summary["message"] = "Cannot close model: {}".format(ex)
+                close_failed = True
+            summary["close"] = round(time.time() - started, 1)
+
+        summary["stages"] = [result.as_dict() for result in ctx.results]
+        states = [result.state for result in ctx.results]
+        if FAILED in states or close_failed:
+            summary["state"] = FAILED
+        elif DONE in states:
+            summary["state"] = DONE
+        else:
+            summary["state"] = SKIPPED
+        return summary
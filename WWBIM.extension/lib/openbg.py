@@ -6,6 +6,8 @@ openbg.py — фон. открытие RVT + безопасная подгото
 в сборках, где, например, отсутствует OST_ImportsInFamilies (Revit 2022).
 """
 
+import time
+
 from Autodesk.Revit.DB import (
     ModelPathUtils,
     WorksharingUtils,
@@ -920,6 +922,8 @@ def open_in_background(
     suppress_warnings=True,
     suppress_dialogs=True,
     log_only=False,
+    timings=None,
+    staging=None,
 ):
     """
     Открыть документ в фоне.
@@ -936,6 +940,11 @@ def open_in_background(
         suppress_dialogs: если True — автоматически закрывать диалоговые окна Revit
                          (через DialogBoxShowing event). ВАЖНО: для работы требует UIApplication!
         log_only: если True — только логировать диалоги, не подавлять (для отладки)
+        timings: словарь (опционально) — в него пишется "worksets", время
+                 подготовки конфигурации рабочих наборов, с
+        staging: StagingCache (опционально) — при detach=True модель с диска
+                 открывается из локальной проверенной копии (staging_cache.py);
+                 в timings пишется "staging", время копирования/проверки, с
 
     Returns:
         tuple: (doc, failure_handler, dialog_suppressor) - документ, обработчик предупреждений и подавитель диалогов
@@ -947,7 +956,22 @@ def open_in_background(
     app, uiapp = _coerce_app_uiapp(app_or_uiapp, maybe_uiapp)
     mp = _to_model_path(model_path_or_str)
 
+    # Отсоединённый документ не пишет в исходник — можно открыть локальную копию
+    if staging is not None and detach:
+        t_stage = time.time()
+        try:
+            local = staging.stage(ModelPathUtils.ConvertModelPathToUserVisiblePath(mp))
+            if local:
+                mp = ModelPathUtils.ConvertUserVisiblePathToModelPath(local)
+        except Exception:
+            pass
+        if timings is not None:
+            timings["staging"] = round(time.time() - t_stage, 1)
+
+    t_ws = time.time()
     cfg = _build_ws_config(uiapp, mp, worksets)
+    if timings is not None:
+        timings["worksets"] = round(time.time() - t_ws, 1)
 
     opts = OpenOptions()
     try:
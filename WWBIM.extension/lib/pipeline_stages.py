@@ -0,0 +1,386 @@
+# -*- coding: utf-8 -*-
+"""
+pipeline_stages.py — этапы model_pipeline для Revit.
+
+Модель открывается один раз через openbg (рабочие наборы — все, кроме
+"00_" и связей), этапы выполняются в группах транзакций
+(TransactionGroup), закрытие — через closebg.
+
+make_pipeline выбирает режим по этапам:
+- есть скрипты (modifies_model) и нет RvtStage — модель открывается
+  связанной с хранилищем и при закрытии синхронизируется, изменения
+  скриптов сохраняются; вид NWC, созданный конвейером, перед
+  синхронизацией удаляется;
+- иначе модель открывается отсоединённой и закрывается без
+  синхронизации: изменения скриптов попадают только в выгрузки этого
+  открытия (NWC, копию RVT). Без RvtStage модель открывается из
+  локальной копии staging_cache: сохранённая из копии RVT получила бы
+  неверные относительные пути связей.
+
+Этапы:
+- ScriptStage — скрипт из lib/Batch Operations (функция Execute(doc));
+- NwcStage — вид "Navisworks" и экспорт NWC (nwc_export_utils);
+- RvtStage — очистка неиспользуемого и сохранение копии RVT (последний).
+"""
+
+import io
+import os
+import sys
+import imp
+
+from Autodesk.Revit.DB import (
+    ModelPathUtils,
+    PerformanceAdviser,
+    PerformanceAdviserRuleId,
+    SaveAsOptions,
+    Transaction,
+    TransactionGroup,
+    WorksharingSaveAsOptions,
+)
+from System import Guid
+from System.Collections.Generic import List
+
+import openbg
+import closebg
+from export_manifest import FAILED, SKIPPED
+from model_pipeline import Pipeline, Stage
+from nwc_export_utils import (
+    count_visible_elements,
+    determine_nwc_filename,
+    export_view_to_nwc,
+    find_or_create_navis_view,
+    to_model_path,
+    workset_filter,
+)
+
+
+# Правило Performance Adviser "неиспользуемые семейства и типы" (как Очистить)
+PURGE_RULE_GUID = "e8c63650-70b7-435a-9010-ec97660c1bda"
+
+# Очистка повторяется: удалённые типы освобождают другие
+PURGE_PASSES = 3
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Batch Operations")
+
+
+# ---------- Revit-обвязка ----------
+
+
+class RevitGroup(object):
+    """Группа транзакций этапа."""
+
+    def __init__(self, doc, name):
+        self.group = TransactionGroup(doc, "Pipeline: {}".format(name))
+
+    def start(self):
+        self.group.Start()
+
+    def assimilate(self):
+        self.group.Assimilate()
+
+    def rollback(self):
+        if self.group.HasStarted() and not self.group.HasEnded():
+            self.group.RollBack()
+
+
+def make_opener(
+    uiapp, worksets=("predicate", workset_filter), staging=None, detach=True
+):
+    """Открытие модели этапов с подавлением диалогов.
+
+    detach=False — модель связана с хранилищем (ctx.data["attached"]),
+    staging используется только для отсоединённого открытия.
+    """
+
+    def opener(ctx):
+        mp = to_model_path(ctx.path)
+        if mp is None:
+            raise Exception("Cannot convert path to ModelPath")
+        doc, failure_handler, dialog_suppressor = openbg.open_in_background(
+            uiapp,
+            None,
+            mp,
+            audit=False,
+            worksets=worksets,
+            detach=detach,
+            suppress_dialogs=True,
+            staging=staging if detach else None,
+        )
+        ctx.data["dialog_suppressor"] = dialog_suppressor
+        ctx.data["attached"] = not detach
+        return doc
+
+    return opener
+
+
+def make_closer(sync=False, comment="Pipeline"):
+    """Закрытие модели; sync=True — синхронизация с хранилищем
+    (ошибка синхронизации — исключение, модель считается неудачной)."""
+
+    def closer(ctx):
+        try:
+            if ctx.doc is None:
+                return
+            res = closebg.close_with_policy(
+                ctx.doc,
+                do_sync=sync,
+                comment=comment,
+                save_if_not_ws=sync,
+                source_path=ctx.path,
+            )
+            if sync and not res.get("saved_or_synced"):
+                raise Exception(
+                    res.get("swc_error")
+                    or res.get("save_error")
+                    or res.get("close_error")
+                    or "Synchronization failed"
+                )
+        finally:
+            dialog_suppressor = ctx.data.get("dialog_suppressor")
+            if dialog_suppressor is not None:
+                try:
+                    dialog_suppressor.detach()
+                except Exception:
+                    pass
+
+    return closer
+
+
+close_model = make_closer()
+
+
+def needs_sync(stages):
+    """Изменения этапов нужно синхронизировать: есть изменяющие модель
+    этапы и нет этапа, сохраняющего её в другой файл."""
+    stages = list(stages)
+    return any(stage.modifies_model for stage in stages) and not any(
+        stage.final for stage in stages
+    )
+
+
+def make_pipeline(
+    stages,
+    uiapp,
+    log=None,
+    worksets=("predicate", workset_filter),
+    staging=None,
+    sync=None,
+    comment="Pipeline",
+):
+    """Pipeline с открытием/закрытием через openbg/closebg.
+
+    sync=None — по этапам (needs_sync); при sync модель открывается
+    связанной с хранилищем и синхронизируется при закрытии. staging
+    не используется, если есть этап, сохраняющий модель (RvtStage).
+    """
+    stages = list(stages)
+    if sync is None:
+        sync = needs_sync(stages)
+    if any(stage.final for stage in stages):
+        staging = None
+    return Pipeline(
+        stages,
+        make_opener(uiapp, worksets, staging, detach=not sync),
+        make_closer(sync, comment),
+        RevitGroup,
+        log,
+    )
+
+
+def read_export_folder(objects_dir, object_name, suffix):
+    """Папка выгрузки из <объект>_<suffix>.txt (NWC, RVT) или None."""
+    folder_file = os.path.join(objects_dir, "{}_{}.txt".format(object_name, suffix))
+    try:
+        with io.open(folder_file, "r", encoding="utf-8-sig") as f:
+            folder = f.read().strip()
+    except Exception:
+        return None
+    return os.path.normpath(folder) if folder else None
+
+
+def _size_mb(path):
+    try:
+        return round(os.path.getsize(path) / (1024.0 * 1024.0), 2)
+    except Exception:
+        return None
+
+
+# ---------- RVT ----------
+
+
+def purgeable_ids(doc):
+    """Id неиспользуемых элементов по правилу Performance Adviser."""
+    adviser = PerformanceAdviser.GetPerformanceAdviser()
+    rule_ids = List[PerformanceAdviserRuleId]()
+    target = Guid(PURGE_RULE_GUID)
+    for rule_id in adviser.GetAllRuleIds():
+        if rule_id.Guid == target:
+            rule_ids.Add(rule_id)
+    if rule_ids.Count == 0:
+        return []
+    messages = adviser.ExecuteRules(doc, rule_ids)
+    if messages is None or messages.Count == 0:
+        return []
+    return list(messages[0].GetFailingElements())
+
+
+def purge_unused(doc, passes=PURGE_PASSES):
+    """Удаляет неиспользуемые семейства и типы; возвращает число удалённых."""
+    total = 0
+    for _ in range(passes):
+        ids = purgeable_ids(doc)
+        if not ids:
+            break
+        deleted = 0
+        with Transaction(doc, "Очистка неиспользуемого") as t:
+            t.Start()
+            for element_id in ids:
+                try:
+                    doc.Delete(element_id)
+                    deleted += 1
+                except Exception:
+                    pass
+            t.Commit()
+        total += deleted
+        if not deleted:
+            break
+    return total
+
+
+def save_as(doc, full_path, compact=True, overwrite=True, as_central=True):
+    """Сохраняет документ в full_path (совместный — как новое хранилище)."""
+    dst_dir = os.path.dirname(full_path)
+    if dst_dir and not os.path.exists(dst_dir):
+        try:
+            os.makedirs(dst_dir)
+        except Exception:
+            pass
+
+    mp_out = ModelPathUtils.ConvertUserVisiblePathToModelPath(full_path)
+
+    sao = SaveAsOptions()
+    sao.Compact = bool(compact)
+    sao.OverwriteExistingFile = bool(overwrite)
+    if as_central and doc.IsWorkshared:
+        wsa = WorksharingSaveAsOptions()
+        wsa.SaveAsCentral = True
+        sao.SetWorksharingOptions(wsa)
+    doc.SaveAs(mp_out, sao)
+
+
+def _delete_element(doc, element_id, name):
+    with Transaction(doc, name) as t:
+        t.Start()
+        doc.Delete(element_id)
+        t.Commit()
+
+
+# ---------- этапы ----------
+
+
+class ScriptStage(Stage):
+    """Скрипт пакетных операций: Execute(doc) -> dict(success, message) или None."""
+
+    modifies_model = True
+
+    def __init__(self, script_path):
+        if not os.path.isabs(script_path):
+            script_path = os.path.join(SCRIPTS_DIR, script_path)
+        self.script_path = script_path
+        self.name = os.path.basename(script_path)
+
+    def applies(self, ctx):
+        if not os.path.isfile(self.script_path):
+            return "Script not found: {}".format(self.script_path)
+        return None
+
+    def modify(self, ctx):
+        module_name = "pipeline_" + os.path.splitext(self.name)[0].replace(" ", "_")
+        sys.modules.pop(module_name, None)
+        try:
+            module = imp.load_source(module_name, self.script_path)
+            execute = getattr(module, "Execute", None)
+            if not callable(execute):
+                return {"state": SKIPPED, "message": "No Execute(doc) in script"}
+            result = execute(ctx.doc)
+        finally:
+            sys.modules.pop(module_name, None)
+
+        if not isinstance(result, dict):
+            return None
+        if not result.get("success", False):
+            return {"state": FAILED, "message": result.get("message") or "Script failed"}
+        return {"message": result.get("message") or None}
+
+
+class NwcStage(Stage):
+    """Вид "Navisworks" (в группе транзакций) и экспорт NWC в папку.
+
+    В связанной с хранилищем модели созданный вид после экспорта
+    удаляется, чтобы он не попал в хранилище при синхронизации.
+    """
+
+    name = "nwc"
+
+    def __init__(self, folder):
+        self.folder = folder
+
+    def applies(self, ctx):
+        if not self.folder:
+            return "NWC folder is not set"
+        return None
+
+    def modify(self, ctx):
+        view, created = find_or_create_navis_view(ctx.doc)
+        ctx.data["nwc_view"] = view
+        ctx.data["nwc_view_created"] = created
+        elements = count_visible_elements(ctx.doc, view)
+        if elements == 0:
+            return {"state": SKIPPED, "message": "View has no elements", "elements": 0}
+        return {"elements": elements, "view_created": created}
+
+    def finish(self, ctx):
+        file_wo_ext = determine_nwc_filename(ctx.path, self.folder)
+        try:
+            api_ok, out_path, error = export_view_to_nwc(
+                ctx.doc, ctx.data["nwc_view"], self.folder, file_wo_ext
+            )
+        finally:
+            if ctx.data.get("attached") and ctx.data.get("nwc_view_created"):
+                _delete_element(ctx.doc, ctx.data["nwc_view"].Id, "Удалить вид Navisworks")
+        file_ok = bool(out_path) and os.path.exists(out_path) and os.path.getsize(out_path) > 0
+        if error or not (api_ok or file_ok):
+            return {"state": FAILED, "message": error or "Export failed", "output": out_path}
+        return {"output": out_path, "size_mb": _size_mb(out_path)}
+
+
+class RvtStage(Stage):
+    """Очистка неиспользуемого (в группе транзакций) и сохранение копии RVT.
+
+    Последний этап: после SaveAs документ указывает на сохранённый файл.
+    """
+
+    name = "rvt"
+    final = True
+
+    def __init__(self, folder, purge=True, compact=True):
+        self.folder = folder
+        self.purge = purge
+        self.compact = compact
+
+    def applies(self, ctx):
+        if not self.folder:
+            return "RVT folder is not set"
+        return None
+
+    def modify(self, ctx):
+        if not self.purge:
+            return None
+        return {"purged": purge_unused(ctx.doc)}
+
+    def finish(self, ctx):
+        out_path = os.path.join(self.folder, os.path.basename(ctx.path.replace("\\", "/")))
+        save_as(ctx.doc, out_path, compact=self.compact)
+        if not os.path.exists(out_path):
+            return {"state": FAILED, "message": "File not created", "output": out_path}
+        return {"output": out_path, "size_mb": _size_mb(out_path)}
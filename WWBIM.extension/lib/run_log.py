@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+run_log.py — буферизованный журнал ночных запусков.
+
+Раньше каждая строка журнала открывала файл на сетевом диске, дописывала
+строку и закрывала его. RunLogger копит записи в памяти и дописывает их
+одним открытием файла: когда набралось flush_records записей, прошло
+flush_seconds с прошлой записи на диск, на границе модели и перед каждой
+фазой (открытие модели — самое вероятное место падения Revit).
+
+Кроме текстового журнала (как раньше: "[ЧЧ:ММ:СС] сообщение") пишется
+JSON-lines с полями time, message, model, phase и duration. Вызов
+close() в finally сохраняет всё накопленное даже при исключении.
+"""
+
+from __future__ import print_function
+
+import io
+import json
+import time
+import datetime
+
+
+class RunLogger(object):
+    """Журнал запуска: текст + JSON-lines, запись на диск пачками."""
+
+    def __init__(
+        self,
+        text_path,
+        json_path=None,
+        echo=True,
+        flush_records=200,
+        flush_seconds=15.0,
+        prefix=None,
+        time_format="[%H:%M:%S]",
+    ):
+        self.text_path = text_path
+        self.json_path = json_path
+        self.echo = echo
+        self.flush_records = flush_records
+        self.flush_seconds = flush_seconds
+        self.prefix = prefix
+        self.time_format = time_format
+        self.model = None
+        self.phase_name = None
+        self._text = []
+        self._json = []
+        self._last_flush = time.time()
+        self._model_started = None
+
+    def _record(self, fields):
+        if not self.json_path:
+            return
+        record = {
+            "time": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "model": self.model,
+            "phase": self.phase_name,
+        }
+        record.update(fields)
+        self._json.append(json.dumps(record, ensure_ascii=False) + u"\n")
+
+    def _maybe_flush(self):
+        if (
+            len(self._text) + len(self._json) >= self.flush_records
+            or time.time() - self._last_flush >= self.flush_seconds
+        ):
+            self.flush()
+
+    def write(self, message, **fields):
+        """Строка текстового журнала (и запись JSON с доп. полями)."""
+        message = u"{}".format(message)
+        stamp = datetime.datetime.now().strftime(self.time_format)
+        if self.prefix:
+            line = u"{} {} {}".format(self.prefix, stamp, message)
+        else:
+            line = u"{} {}".format(stamp, message)
+        self._text.append(line + u"\n")
+        fields["message"] = message
+        self._record(fields)
+        if self.echo:
+            try:
+                print(line if self.prefix else message)
+            except Exception:
+                pass
+        self._maybe_flush()
+
+    def banner(self, lines):
+        """Строки без отметки времени (заголовок запуска)."""
+        for line in lines:
+            self._text.append(u"{}\n".format(line))
+        self.flush()
+
+    def timing(self, phase, seconds, **fields):
+        """Только JSON: длительность фазы текущей модели."""
+        fields["duration"] = round(seconds, 3)
+        fields["phase"] = phase
+        self._record(fields)
+        self._maybe_flush()
+
+    def begin_model(self, model):
+        self.flush()
+        self.model = model
+        self.phase_name = None
+        self._model_started = time.time()
+        self._record({"event": "model_start"})
+
+    def end_model(self, **fields):
+        if self.model is not None and self._model_started is not None:
+            fields["duration"] = round(time.time() - self._model_started, 3)
+        fields["event"] = "model_end"
+        self.phase_name = None
+        self._record(fields)
+        self.flush()
+        self.model = None
+        self._model_started = None
+
+    def phase(self, name):
+        """with logger.phase("open"): ... — фаза с длительностью в JSON."""
+        return _Phase(self, name)
+
+    def flush(self):
+        """Дописывает накопленное; при ошибке записи буфер сохраняется."""
+        self._last_flush = time.time()
+        for path, buffer in ((self.text_path, self._text), (self.json_path, self._json)):
+            if not path or not buffer:
+                continue
+            try:
+                with io.open(path, "a", encoding="utf-8") as f:
+                    f.write(u"".join(buffer))
+                del buffer[:]
+            except Exception:
+                pass
+
+    def close(self):
+        self.flush()
+
+
+class _Phase(object):
+    def __init__(self, logger, name):
+        self.logger = logger
+        self.name = name
+        self.started = None
+        self.previous = None
+
+    def __enter__(self):
+        self.logger.flush()
+        self.previous = self.logger.phase_name
+        self.logger.phase_name = self.name
+        self.started = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        fields = {"event": "phase_end"}
+        if exc_type is not None:
+            fields["error"] = u"{}".format(exc)
+        self.logger.timing(self.name, time.time() - self.started, **fields)
+        self.logger.phase_name = self.previous
+        return False
@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+"""
+staging_cache.py — локальный кэш исходных RVT для открытия только на чтение.
+
+Ночные экспорты открывают одни и те же модели с сетевого диска по
+нескольку раз. StagingCache копирует файл модели один раз в локальную
+папку (под %LOCALAPPDATA%) и отдаёт путь к копии, пока у исходника не
+изменились размер и время изменения. Копия годна, пока совпадают размер
+и время изменения исходника и размер копии; хэш содержимого считается при
+копировании и сверяется при повторном использовании только с
+verify_on_hit=True (перечитывание копии стоит почти столько же, сколько
+само копирование). Если исходник менялся во время копирования, копия
+отбрасывается.
+
+Копии хранятся в пределах квоты: самые давно использованные удаляются
+первыми (LRU). Копию можно открывать только с отсоединением от
+хранилища (экспорт, проверки) — изменения в неё не возвращаются
+в исходную модель. Модели Revit Server (RSN://) не кэшируются.
+"""
+
+import io
+import os
+import time
+import shutil
+import hashlib
+import tempfile
+
+from file_io import read_json, replace_file, write_json_atomic
+
+
+# Квота локальной папки копий, байт
+DEFAULT_QUOTA_BYTES = 20 * 1024 * 1024 * 1024
+
+# Размер блока при копировании и хэшировании
+CHUNK_SIZE = 4 * 1024 * 1024
+
+INDEX_FORMAT = 1
+INDEX_NAME = "index.json"
+
+
+def default_staging_dir():
+    """Папка локальных копий в %LOCALAPPDATA%."""
+    base = os.environ.get("LOCALAPPDATA") or tempfile.gettempdir()
+    return os.path.join(base, "pyRevit", "WWBIM", "staging")
+
+
+def is_stageable(path):
+    """Файл на диске (локальный или UNC), а не модель Revit Server."""
+    text = (path or "").strip()
+    if not text or text.upper().startswith("RSN:"):
+        return False
+    return os.path.isfile(text)
+
+
+def source_signature(path):
+    """(размер, mtime в мс) или None."""
+    try:
+        st = os.stat(path)
+    except Exception:
+        return None
+    return int(st.st_size), int(round(st.st_mtime * 1000))
+
+
+def file_hash(path, chunk_size=CHUNK_SIZE):
+    digest = hashlib.sha1()
+    with io.open(path, "rb") as f:
+        while True:
+            block = f.read(chunk_size)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _copy_with_hash(source, target, chunk_size=CHUNK_SIZE):
+    """Копирует файл, возвращает sha1 скопированного содержимого."""
+    digest = hashlib.sha1()
+    with io.open(source, "rb") as src:
+        with io.open(target, "wb") as dst:
+            while True:
+                block = src.read(chunk_size)
+                if not block:
+                    break
+                digest.update(block)
+                dst.write(block)
+    return digest.hexdigest()
+
+
+class StagingCache(object):
+    """Локальные копии исходных моделей с проверкой и LRU-вытеснением."""
+
+    def __init__(
+        self,
+        directory=None,
+        quota_bytes=DEFAULT_QUOTA_BYTES,
+        verify_on_hit=False,
+        clock=time.time,
+        log=None,
+    ):
+        self.directory = directory or default_staging_dir()
+        self.quota_bytes = quota_bytes
+        self.verify_on_hit = verify_on_hit
+        self.clock = clock
+        self._log = log
+        self.index_path = os.path.join(self.directory, INDEX_NAME)
+        self.entries = self._read_index()
+
+    def _warn(self, message):
+        if self._log is not None:
+            try:
+                self._log(message)
+            except Exception:
+                pass
+
+    def _read_index(self):
+        data = read_json(self.index_path)
+        if not isinstance(data, dict) or data.get("format") != INDEX_FORMAT:
+            return {}
+        entries = data.get("entries")
+        return entries if isinstance(entries, dict) else {}
+
+    def _save_index(self):
+        try:
+            write_json_atomic(
+                self.index_path,
+                {"format": INDEX_FORMAT, "entries": self.entries},
+                indent=1,
+            )
+            return True
+        except Exception:
+            return False
+
+    def key(self, source):
+        norm = os.path.normcase(os.path.abspath(source.strip()))
+        return hashlib.sha1(norm.encode("utf-8")).hexdigest()[:24]
+
+    def total_bytes(self):
+        return sum(int(e.get("size") or 0) for e in self.entries.values())
+
+    def _drop(self, key):
+        """Удаляет копию; False, если файл занят (открыт в Revit)."""
+        entry = self.entries.get(key)
+        if entry is None:
+            return True
+        folder = os.path.dirname(entry.get("local") or "")
+        try:
+            if entry.get("local") and os.path.exists(entry["local"]):
+                os.remove(entry["local"])
+        except OSError:
+            return False
+        if folder and os.path.isdir(folder):
+            shutil.rmtree(folder, ignore_errors=True)
+        del self.entries[key]
+        return True
+
+    def _is_valid(self, entry, signature):
+        if entry is None or signature is None:
+            return False
+        if [entry.get("source_size"), entry.get("source_mtime")] != list(signature):
+            return False
+        local_signature = source_signature(entry.get("local") or "")
+        if local_signature is None or local_signature[0] != entry.get("size"):
+            return False
+        if self.verify_on_hit:
+            try:
+                return file_hash(entry["local"]) == entry.get("hash")
+            except Exception:
+                return False
+        return True
+
+    def lookup(self, source):
+        """Путь к действительной копии или None (без копирования)."""
+        key = self.key(source)
+        entry = self.entries.get(key)
+        if not self._is_valid(entry, source_signature(source)):
+            return None
+        entry["last_used"] = self.clock()
+        self._save_index()
+        return entry["local"]
+
+    def evict(self, reserve=0, keep=None):
+        """Удаляет давно использованные копии, пока не освободится reserve
+        байт в пределах квоты. Возвращает число удалённых копий."""
+        removed = 0
+        ordered = sorted(
+            self.entries.items(), key=lambda item: float(item[1].get("last_used") or 0)
+        )
+        for key, _ in ordered:
+            if self.total_bytes() + reserve <= self.quota_bytes:
+                break
+            if key == keep:
+                continue
+            if self._drop(key):
+                removed += 1
+        if removed:
+            self._save_index()
+        return removed
+
+    def stage(self, source):
+        """Путь к локальной копии source (копирует при необходимости) или
+        None, если кэшировать нельзя — тогда открывать исходный путь."""
+        if not is_stageable(source):
+            return None
+        key = self.key(source)
+        signature = source_signature(source)
+        if signature is None:
+            return None
+        entry = self.entries.get(key)
+        if self._is_valid(entry, signature):
+            entry["last_used"] = self.clock()
+            self._save_index()
+            return entry["local"]
+
+        if not self._drop(key):
+            self._warn("  WARNING: Staged copy is in use: {}".format(entry.get("local")))
+            return None
+        size = signature[0]
+        if size > self.quota_bytes:
+            return None
+        self.evict(reserve=size)
+        if self.total_bytes() + size > self.quota_bytes:
+            return None
+
+        folder = os.path.join(self.directory, key)
+        local = os.path.join(folder, os.path.basename(source.strip()))
+        tmp_path = local + ".part"
+        try:
+            if not os.path.isdir(folder):
+                os.makedirs(folder)
+            digest = _copy_with_hash(source, tmp_path)
+            # Исходник меняли во время копирования — копия несогласованна
+            if source_signature(source) != signature:
+                raise IOError("source changed while copying")
+            if os.path.getsize(tmp_path) != size:
+                raise IOError("copy size mismatch")
+            replace_file(tmp_path, local)
+        except Exception as ex:
+            self._warn("  WARNING: Cannot stage {}: {}".format(source, ex))
+            shutil.rmtree(folder, ignore_errors=True)
+            return None
+
+        self.entries[key] = {
+            "source": source,
+            "source_size": signature[0],
+            "source_mtime": signature[1],
+            "local": local,
+            "size": size,
+            "hash": digest,
+            "last_used": self.clock(),
+        }
+        self._save_index()
+        return local
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+text_index.py — триграммный индекс для поиска подстроки по строкам таблицы.
+
+Ищет то же, что RowFilter «[поле] LIKE '%term%' OR ...» без учёта
+регистра, но не перебирает все строки: индексируются различные значения
+полей (пути, категории и модели сильно повторяются), кандидаты
+отбираются пересечением множеств по триграммам запроса и проверяются
+вхождением подстроки.
+"""
+
+
+GRAM = 3
+
+
+def _grams(text):
+    return set(text[i : i + GRAM] for i in range(len(text) - GRAM + 1))
+
+
+class SubstringIndex(object):
+    """Индекс: подстрока -> множество номеров строк."""
+
+    def __init__(self):
+        self._value_ids = {}
+        self._values = []
+        self._rows = []
+        self._grams = {}
+        self._row_count = 0
+        self._last_term = None
+        self._last_values = None
+
+    @property
+    def row_count(self):
+        return self._row_count
+
+    def add(self, row_id, values):
+        """Добавляет значения полей строки row_id."""
+        self._row_count = max(self._row_count, row_id + 1)
+        for value in values:
+            value = (value or "").strip().lower()
+            if not value:
+                continue
+
+            value_id = self._value_ids.get(value)
+            if value_id is None:
+                value_id = len(self._values)
+                self._value_ids[value] = value_id
+                self._values.append(value)
+                self._rows.append([])
+                for gram in _grams(value):
+                    ids = self._grams.get(gram)
+                    if ids is None:
+                        ids = self._grams[gram] = set()
+                    ids.add(value_id)
+
+            rows = self._rows[value_id]
+            if not rows or rows[-1] != row_id:
+                rows.append(row_id)
+
+        self._last_term = None
+        self._last_values = None
+
+    def search(self, term):
+        """Номера строк, где какое-либо поле содержит term (None — без фильтра)."""
+        term = (term or "").strip().lower()
+        if not term:
+            return None
+
+        values = self._matching_values(term)
+        self._last_term, self._last_values = term, values
+
+        result = set()
+        for value_id in values:
+            result.update(self._rows[value_id])
+        return result
+
+    def _matching_values(self, term):
+        # При наборе запрос обычно уточняется — сужаем прошлый результат
+        if self._last_term is not None and self._last_term in term:
+            candidates = self._last_values
+        elif len(term) < GRAM:
+            candidates = range(len(self._values))
+        else:
+            sets = []
+            for gram in _grams(term):
+                ids = self._grams.get(gram)
+                if not ids:
+                    return []
+                sets.append(ids)
+            sets.sort(key=len)
+            candidates = set(sets[0])
+            for ids in sets[1:]:
+                candidates.intersection_update(ids)
+                if not candidates:
+                    return []
+
+        values = self._values
+        return [value_id for value_id in candidates if term in values[value_id]]
@@ -0,0 +1,391 @@
+# -*- coding: utf-8 -*-
+"""
+bench_clash_parsers.py — сравнение парсеров XML-отчётов Navisworks.
+
+Для каждого парсера и каждого его пути разбора (потоковый iterparse,
+дерево ElementTree / lxml, regex) измеряются время, пиковая память и
+число строк в секунду на синтетических отчётах заданного размера:
+
+- Пересечения (collisions_script.py);
+- ПересеченияNEW (lib/clash_report.py);
+- Анализ отчёта HTML (HTML_script.py);
+- архивный «Анализ отчёта» (script.py).
+
+Скрипты кнопок импортируют Revit API и pyRevit, поэтому из них
+загружаются только определения верхнего уровня (классы, функции,
+константы), а строки с недоступными импортами пропускаются. Каждый
+замер выполняется в отдельном процессе, чтобы пики памяти не смешивались.
+Пиковая память — по tracemalloc (выделения Python; память lxml
+в неё не попадает).
+
+Запуск:
+    python bench_clash_parsers.py --sizes 5,50 --save base.json
+    python bench_clash_parsers.py --sizes 5,50 --compare base.json
+"""
+
+from __future__ import print_function
+
+import argparse
+import ast
+import gc
+import io
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+EXT_DIR = os.path.join(os.path.dirname(HERE), "WWBIM.extension")
+LIB_DIR = os.path.join(EXT_DIR, "lib")
+PANEL_DIR = os.path.join(EXT_DIR, "WW.BIM.tab", "BIM.panel")
+if LIB_DIR not in sys.path:
+    sys.path.insert(0, LIB_DIR)
+if HERE not in sys.path:
+    sys.path.insert(0, HERE)
+
+from clash_report_generator import ReportSpec, write_report
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+MB = 1024.0 * 1024.0
+
+COLLISIONS_SCRIPT = os.path.join(
+    PANEL_DIR, "Пересечения.pushbutton", "collisions_script.py"
+)
+HTML_SCRIPT = os.path.join(
+    PANEL_DIR,
+    "Координация.stack",
+    "Координация.pulldown",
+    "Анализ отчёта HTML.pushbutton",
+    "HTML_script.py",
+)
+ARCHIVED_SCRIPT = os.path.join(
+    PANEL_DIR,
+    "Координация.stack",
+    "Архивные.pulldown",
+    "Анализ отчёта.pushbutton",
+    "script.py",
+)
+
+# Допустимое замедление при сравнении с сохранёнными результатами
+DEFAULT_THRESHOLD = 0.2
+
+
+# =============================================================================
+# ЗАГРУЗКА СКРИПТОВ БЕЗ REVIT
+# =============================================================================
+
+
+def load_definitions(path, name):
+    """Определения верхнего уровня скрипта кнопки как словарь.
+
+    Выполняются импорты, классы, функции и присваивания; узел, который
+    не удалось выполнить (импорт pyrevit/Autodesk, вызовы script.*),
+    пропускается. Тело main и блок __main__ не выполняются.
+    """
+    with io.open(path, "rb") as f:
+        source = f.read()
+    tree = ast.parse(source, path)
+
+    namespace = {"__name__": name, "__file__": path}
+    for node in tree.body:
+        if isinstance(node, ast.If):
+            continue
+        if isinstance(node, ast.FunctionDef) and node.name == "main":
+            continue
+        module = ast.parse("")
+        module.body = [node]
+        try:
+            exec(compile(module, path, "exec"), namespace)
+        except Exception:
+            pass
+    return namespace
+
+
+class _Backend(object):
+    """Временно скрывает lxml, чтобы парсер выбрал ElementTree."""
+
+    def __init__(self, use_lxml):
+        self.use_lxml = use_lxml
+        self._saved = {}
+
+    def __enter__(self):
+        if not self.use_lxml:
+            for name in ("lxml", "lxml.etree"):
+                self._saved[name] = sys.modules.get(name)
+                sys.modules[name] = None
+        return self
+
+    def __exit__(self, *exc):
+        for name, module in self._saved.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+        return False
+
+
+def has_lxml():
+    try:
+        from lxml import etree
+
+        return etree is not None
+    except ImportError:
+        return False
+
+
+# =============================================================================
+# ПАРСЕРЫ
+# =============================================================================
+
+
+def _collisions(method, use_lxml):
+    ns = load_definitions(COLLISIONS_SCRIPT, "collisions_script")
+
+    def parse(path):
+        with _Backend(use_lxml):
+            return getattr(ns["NavisworksReportParser"](path), method)()
+
+    return parse
+
+
+def _clash_report(method, use_lxml):
+    import clash_report
+
+    def parse(path):
+        with _Backend(use_lxml):
+            return getattr(clash_report.NavisworksReportParser(path), method)()
+
+    return parse
+
+
+def _html(method, use_lxml):
+    ns = load_definitions(HTML_SCRIPT, "HTML_script")
+
+    def parse(path):
+        return ns["_parse_with_elementtree"](ns["_load_and_sanitize_xml_text"](path))
+
+    return parse
+
+
+def _archived(method, use_lxml):
+    ns = load_definitions(ARCHIVED_SCRIPT, "archived_script")
+    if method == "regex":
+        return ns["parse_report_fallback"]
+
+    if use_lxml:
+        from lxml import etree as ET
+    else:
+        import xml.etree.ElementTree as ET
+    ns["ET"] = ET
+    ns["_USING_LXML"] = use_lxml
+    return ns["parse_report"]
+
+
+# (парсер, путь разбора, фабрика функции разбора, метод, нужен ли lxml)
+CASES = (
+    ("Пересечения", "дерево ET", _collisions, "_parse_with_xml_parser", False),
+    ("Пересечения", "дерево lxml", _collisions, "_parse_with_xml_parser", True),
+    ("Пересечения", "regex", _collisions, "_parse_with_regex", False),
+    ("ПересеченияNEW", "поток ET", _clash_report, "_parse_streaming", False),
+    ("ПересеченияNEW", "дерево ET", _clash_report, "_parse_with_xml_parser", False),
+    ("ПересеченияNEW", "дерево lxml", _clash_report, "_parse_with_xml_parser", True),
+    ("ПересеченияNEW", "regex", _clash_report, "_parse_with_regex", False),
+    ("HTML", "дерево ET", _html, "elementtree", False),
+    ("Архивный", "дерево ET", _archived, "tree", False),
+    ("Архивный", "дерево lxml", _archived, "tree", True),
+    ("Архивный", "regex", _archived, "regex", False),
+)
+
+
+def case_id(case):
+    return u"{} / {}".format(case[0], case[1])
+
+
+def count_rows(result):
+    """Число строк результата: dict проверка -> [строки] или список строк."""
+    if isinstance(result, dict):
+        return sum(len(rows) for rows in result.values())
+    return len(result or [])
+
+
+# =============================================================================
+# ЗАМЕРЫ
+# =============================================================================
+
+
+def _clock():
+    return getattr(time, "perf_counter", time.time)()
+
+
+def _measure(index, path, repeat, queue):
+    """Выполняется в дочернем процессе: лучшее время и пик памяти."""
+    _, _, factory, method, use_lxml = CASES[index]
+    try:
+        func = factory(method, use_lxml)
+        best = None
+        rows = 0
+        for _ in range(repeat):
+            gc.collect()
+            started = _clock()
+            result = func(path)
+            elapsed = _clock() - started
+            rows = count_rows(result)
+            del result
+            best = elapsed if best is None else min(best, elapsed)
+
+        peak = None
+        if tracemalloc is not None:
+            gc.collect()
+            tracemalloc.start()
+            func(path)
+            peak = tracemalloc.get_traced_memory()[1] / MB
+            tracemalloc.stop()
+
+        queue.put({"seconds": best, "peak_mb": peak, "rows": rows})
+    except Exception as ex:
+        queue.put({"error": u"{}: {}".format(type(ex).__name__, ex)})
+
+
+def run_case(index, path, repeat):
+    """Замер одного случая в отдельном процессе."""
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_measure, args=(index, path, repeat, queue))
+    process.start()
+    try:
+        result = queue.get()
+    finally:
+        process.join()
+    return result
+
+
+def ensure_report(directory, size_mb, spec):
+    path = os.path.join(directory, "synthetic_{}mb.xml".format(size_mb))
+    if not os.path.exists(path):
+        print("Генерация {} ...".format(os.path.basename(path)))
+        write_report(path, spec, int(size_mb * MB))
+    return path
+
+
+# =============================================================================
+# ВЫВОД И СРАВНЕНИЕ
+# =============================================================================
+
+
+def format_row(size_mb, case, result, baseline):
+    if result.get("error"):
+        return u"{:>6} | {:<30} | {}".format(size_mb, case_id(case), result["error"])
+
+    seconds = result["seconds"]
+    peak = result["peak_mb"]
+    delta = u""
+    if baseline and baseline.get("seconds"):
+        change = seconds / baseline["seconds"] - 1.0
+        delta = u"{:+.0%}".format(change)
+    return u"{:>6} | {:<30} | {:>9.2f} | {:>9} | {:>8} | {:>11.0f} | {:>7}".format(
+        size_mb,
+        case_id(case),
+        seconds,
+        u"—" if peak is None else u"{:.1f}".format(peak),
+        result["rows"],
+        result["rows"] / max(seconds, 1e-9),
+        delta,
+    )
+
+
+def find_regressions(results, baseline, threshold):
+    """Случаи, которые стали медленнее baseline больше чем на threshold."""
+    slower = []
+    for key, result in sorted(results.items()):
+        before = baseline.get(key)
+        if not before or not before.get("seconds") or not result.get("seconds"):
+            continue
+        change = result["seconds"] / before["seconds"] - 1.0
+        if change > threshold:
+            slower.append((key, change))
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк парсеров отчётов")
+    parser.add_argument("--sizes", default="5,50", help="размеры отчётов в МБ")
+    parser.add_argument("--dir", default=None, help="папка для отчётов")
+    parser.add_argument("--repeat", type=int, default=3, help="повторов на замер")
+    parser.add_argument(
+        "--only", default=None, help="подстрока в названии парсера / пути разбора"
+    )
+    parser.add_argument("--objects", type=int, default=2)
+    parser.add_argument("--dirty-rate", type=float, default=0.01)
+    parser.add_argument("--control-rate", type=float, default=0.005)
+    parser.add_argument("--save", default=None, help="сохранить результаты в JSON")
+    parser.add_argument("--compare", default=None, help="сравнить с JSON")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="допустимое замедление при --compare (0.2 = 20%%)",
+    )
+    args = parser.parse_args()
+
+    directory = args.dir or os.path.join(tempfile.gettempdir(), "wwbim_clash_bench")
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    spec = ReportSpec(
+        objects_per_result=args.objects,
+        dirty_rate=args.dirty_rate,
+        control_rate=args.control_rate,
+    )
+
+    baseline = {}
+    if args.compare:
+        with io.open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    lxml_ok = has_lxml()
+    header = u"{:>6} | {:<30} | {:>9} | {:>9} | {:>8} | {:>11} | {:>7}".format(
+        u"МБ", u"парсер / путь", u"время, с", u"пик, МБ", u"строк", u"строк/с", u"Δ"
+    )
+    print(header)
+    print(u"-" * len(header))
+
+    results = {}
+    for size_mb in [int(s) for s in args.sizes.split(",") if s.strip()]:
+        path = ensure_report(directory, size_mb, spec)
+        for index, case in enumerate(CASES):
+            if args.only and args.only.lower() not in case_id(case).lower():
+                continue
+            if case[4] and not lxml_ok:
+                print(u"{:>6} | {:<30} | нет lxml".format(size_mb, case_id(case)))
+                continue
+
+            key = u"{}MB {}".format(size_mb, case_id(case))
+            result = run_case(index, path, args.repeat)
+            results[key] = result
+            print(format_row(size_mb, case, result, baseline.get(key)))
+
+    if args.save:
+        with io.open(args.save, "w", encoding="utf-8") as f:
+            f.write(
+                u"{}".format(
+                    json.dumps(results, ensure_ascii=False, indent=1, sort_keys=True)
+                )
+            )
+
+    if baseline:
+        slower = find_regressions(results, baseline, args.threshold)
+        for key, change in slower:
+            print(u"Замедление {:+.0%}: {}".format(change, key))
+        if slower:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
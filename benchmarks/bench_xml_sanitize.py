@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+bench_xml_sanitize.py — сравнение очистки XML-отчётов Navisworks.
+
+Сравниваются прежний посимвольный XmlReader.sanitize из ПересеченияNEW,
+clash_xml.sanitize_xml_text и потоковый clash_xml.SanitizingReader
+на синтетических отчётах заданного размера.
+
+Запуск:
+    python bench_xml_sanitize.py --sizes 10,100,500
+"""
+
+from __future__ import print_function
+
+import argparse
+import io
+import os
+import re
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+LIB_DIR = os.path.join(os.path.dirname(HERE), "WWBIM.extension", "lib")
+if LIB_DIR not in sys.path:
+    sys.path.insert(0, LIB_DIR)
+if HERE not in sys.path:
+    sys.path.insert(0, HERE)
+
+import clash_xml
+from clash_report_generator import ReportSpec, write_report
+
+
+MB = 1024.0 * 1024.0
+
+_LEGACY_BAD_AMPERSAND = re.compile(
+    "&(?!amp;|lt;|gt;|apos;|quot;|#\\d+;|#x[0-9A-Fa-f]+;)", re.UNICODE
+)
+
+
+def legacy_strip_invalid_chars(text):
+    """Прежняя посимвольная реализация XmlReader._strip_invalid_chars."""
+    result = []
+    for char in text:
+        code = ord(char)
+        if (
+            code == 0x9
+            or code == 0xA
+            or code == 0xD
+            or (0x20 <= code <= 0xD7FF)
+            or (0xE000 <= code <= 0xFFFD)
+            or (0x10000 <= code <= 0x10FFFF)
+        ):
+            result.append(char)
+        else:
+            result.append(" ")
+    return "".join(result)
+
+
+def legacy_sanitize(text):
+    """Прежняя реализация XmlReader.sanitize."""
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    text = text.replace("\ufeff", " ")
+    text = legacy_strip_invalid_chars(text)
+    text = _LEGACY_BAD_AMPERSAND.sub("&amp;", text)
+    start = text.find("<")
+    if start > 0:
+        text = text[start:]
+    return text
+
+
+def read_text(path):
+    with io.open(path, "rb") as f:
+        return f.read().decode("utf-8-sig")
+
+
+def time_call(func, *args):
+    started = time.time()
+    result = func(*args)
+    return time.time() - started, result
+
+
+def drain_stream(path):
+    """Прогоняет файл через SanitizingReader блоками, как iterparse."""
+    total = 0
+    with clash_xml.SanitizingReader(path) as reader:
+        while True:
+            data = reader.read(64 * 1024)
+            if not data:
+                break
+            total += len(data)
+    return total
+
+
+def ensure_report(directory, size_mb):
+    path = os.path.join(directory, "synthetic_{}mb.xml".format(size_mb))
+    if not os.path.exists(path):
+        print("Генерация {} ...".format(os.path.basename(path)))
+        write_report(path, ReportSpec(), int(size_mb * MB))
+    return path
+
+
+def bench_size(path, legacy_limit_mb, check):
+    size = os.path.getsize(path)
+    text = read_text(path)
+
+    if size <= legacy_limit_mb * MB:
+        legacy_time, legacy_text = time_call(legacy_sanitize, text)
+        legacy_mark = ""
+    else:
+        # Оценка по префиксу: посимвольный цикл линеен по длине текста
+        sample = text[: int(len(text) * legacy_limit_mb * MB / size)]
+        sample_time, legacy_text = time_call(legacy_sanitize, sample)
+        legacy_time = sample_time * len(text) / float(max(len(sample), 1))
+        legacy_mark = "~"
+        check = False
+
+    fast_time, fast_text = time_call(clash_xml.sanitize_xml_text, text)
+    if check and legacy_text != fast_text:
+        raise AssertionError("Результат очистки отличается: {}".format(path))
+    del text, legacy_text, fast_text
+
+    stream_time, _ = time_call(drain_stream, path)
+
+    return size, legacy_time, legacy_mark, fast_time, stream_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк очистки XML")
+    parser.add_argument("--sizes", default="10,100,500", help="размеры в МБ")
+    parser.add_argument("--dir", default=None, help="папка для отчётов")
+    parser.add_argument(
+        "--legacy-limit-mb",
+        type=float,
+        default=100,
+        help="выше этого размера время прежней очистки оценивается по префиксу",
+    )
+    parser.add_argument("--no-check", action="store_true")
+    args = parser.parse_args()
+
+    directory = args.dir or os.path.join(tempfile.gettempdir(), "wwbim_clash_bench")
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    header = "{:>8} | {:>12} | {:>12} | {:>12} | {:>8}".format(
+        "МБ", "прежняя, с", "regex, с", "поток, с", "ускор."
+    )
+    rows = []
+    for size_mb in [int(s) for s in args.sizes.split(",") if s.strip()]:
+        path = ensure_report(directory, size_mb)
+        size, legacy, mark, fast, stream = bench_size(
+            path, args.legacy_limit_mb, not args.no_check
+        )
+        rows.append(
+            "{:>8.1f} | {:>12} | {:>12.2f} | {:>12.2f} | {:>7.1f}x".format(
+                size / MB,
+                "{}{:.2f}".format(mark, legacy),
+                fast,
+                stream,
+                legacy / max(fast, 1e-9),
+            )
+        )
+
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""
+clash_report_generator.py — генератор синтетических XML-отчётов Navisworks.
+
+Структура повторяет реальные отчёты о пересечениях (batchtest → clashtest →
+clashresult → clashobject: статус, дата создания, сетка, снимок, pathlink
+и smarttags) и специально содержит «грязные» места: неэкранированные
+амперсанды и недопустимые управляющие символы. Число проверок, результатов
+и объектов, доля «грязных» имён и снимки задаются параметрами.
+
+Запуск:
+    python clash_report_generator.py out.xml --size-mb 100
+"""
+
+from __future__ import print_function
+
+import argparse
+import io
+import random
+
+
+MODELS = (
+    "0005_МФК_АР_R23.nwc",
+    "0005_МФК_КР_R23.nwc",
+    "0005_МФК_ОВВ_R23.nwc",
+    "0005_МФК_ВК_R23.nwc",
+    "0005_МФК_ЭОМ_R23.nwc",
+    "0005_МФК_ИТП_R23.nwc",
+)
+
+CATEGORIES = (
+    "Стены",
+    "Перекрытия",
+    "Воздуховоды",
+    "Трубы",
+    "Соединительные детали трубопроводов",
+    "Арматура трубопроводов",
+    "Кабельные лотки",
+    "Несущие колонны",
+)
+
+# Имена с «грязными» амперсандами, которые ломают строгий парсер
+DIRTY_NAMES = ("Т&К узел", "R&D", "Стена & проём", "AT&T &nbsp")
+
+CONTROL_CHARS = ("\x01", "\x0b", "\x0c", "\x1f")
+
+STATUSES = ("new", "active", "reviewed", "approved", "resolved")
+
+RESULT_STATUS_TEXT = {
+    "new": "Создать",
+    "active": "Активн.",
+    "reviewed": "Проанализировано",
+    "approved": "Подтверждено",
+    "resolved": "Исправлено",
+}
+
+HEADER = (
+    '<?xml version="1.0" encoding="UTF-8" ?>\n'
+    '<exchange xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" units="m" '
+    'filename="" filepath="">\n'
+    '  <batchtest name="Report" internal_name="Report" units="m">\n'
+    "    <clashtests>\n"
+)
+FOOTER = "    </clashtests>\n  </batchtest>\n</exchange>\n"
+
+
+class ReportSpec(object):
+    """Параметры синтетического отчёта."""
+
+    def __init__(
+        self,
+        tests=10,
+        results_per_test=1000,
+        objects_per_result=2,
+        dirty_rate=0.01,
+        control_rate=0.005,
+        snapshots=True,
+        bom=False,
+        seed=1,
+    ):
+        self.tests = tests
+        self.results_per_test = results_per_test
+        self.objects_per_result = objects_per_result
+        self.dirty_rate = dirty_rate
+        self.control_rate = control_rate
+        self.snapshots = snapshots
+        self.bom = bom
+        self.seed = seed
+
+
+def _clash_object(rnd, spec, element_id):
+    model = rnd.choice(MODELS)
+    category = rnd.choice(CATEGORIES)
+    family = rnd.choice(CATEGORIES) + "_" + str(rnd.randint(1, 50))
+    if rnd.random() < spec.dirty_rate:
+        family = rnd.choice(DIRTY_NAMES)
+    if rnd.random() < spec.control_rate:
+        family += rnd.choice(CONTROL_CHARS)
+
+    return (
+        "              <clashobject>\n"
+        "                <objectattribute>\n"
+        "                  <name>ID объекта</name>\n"
+        "                  <value>{eid}</value>\n"
+        "                </objectattribute>\n"
+        "                <pathlink>\n"
+        "                  <node>Файл</node>\n"
+        "                  <node>Файл</node>\n"
+        "                  <node>{model}</node>\n"
+        "                  <node>{floor:02d}_Этаж</node>\n"
+        "                  <node>{category}</node>\n"
+        "                  <node>{family}</node>\n"
+        "                  <node>Твердое тело</node>\n"
+        "                </pathlink>\n"
+        "                <smarttags>\n"
+        "                  <smarttag>\n"
+        "                    <name>Объект Id</name>\n"
+        "                    <value>{eid}</value>\n"
+        "                  </smarttag>\n"
+        "                </smarttags>\n"
+        "              </clashobject>\n"
+    ).format(
+        eid=element_id,
+        model=model,
+        floor=rnd.randint(1, 30),
+        category=category,
+        family=family,
+    )
+
+
+def _clash_result(rnd, spec, test_index, result_index):
+    name = "Конфликт{}".format(result_index + 1)
+    if rnd.random() < spec.dirty_rate:
+        name += " " + rnd.choice(DIRTY_NAMES)
+
+    href = ""
+    if spec.snapshots:
+        href = ' href="report_files\\cd{:06d}_{:06d}.jpg"'.format(
+            test_index, result_index
+        )
+
+    status = rnd.choice(STATUSES)
+    parts = [
+        '          <clashresult name="{}"{} guid="{:08x}-0000-0000-0000-{:012x}" '
+        'status="{}" distance="{:.3f}">\n'.format(
+            name,
+            href,
+            test_index,
+            result_index,
+            status,
+            -rnd.uniform(0.001, 0.5),
+        ),
+        "            <description>Жесткий</description>\n",
+        "            <resultstatus>{}</resultstatus>\n".format(RESULT_STATUS_TEXT[status]),
+        "            <clashpoint>\n",
+        '              <pos3f x="{:.3f}" y="{:.3f}" z="{:.3f}"/>\n'.format(
+            rnd.uniform(-100, 100), rnd.uniform(-100, 100), rnd.uniform(0, 120)
+        ),
+        "            </clashpoint>\n",
+        "            <gridlocation>{}-{} : {:02d}_Этаж</gridlocation>\n".format(
+            rnd.choice("АБВГДЕ"), rnd.randint(1, 20), rnd.randint(1, 30)
+        ),
+        "            <createddate>\n",
+        '              <date year="2025" month="{}" day="{}" hour="{}" minute="{}" '
+        'second="{}"/>\n'.format(
+            rnd.randint(1, 12),
+            rnd.randint(1, 28),
+            rnd.randint(0, 23),
+            rnd.randint(0, 59),
+            rnd.randint(0, 59),
+        ),
+        "            </createddate>\n",
+        "            <clashobjects>\n",
+    ]
+    for _ in range(spec.objects_per_result):
+        parts.append(_clash_object(rnd, spec, rnd.randint(100000, 9999999)))
+    parts.append("            </clashobjects>\n          </clashresult>\n")
+    return "".join(parts)
+
+
+def _clash_test_open(test_index, total):
+    return (
+        '      <clashtest name="{idx}_Тест {idx}" test_type="hard" status="ok" '
+        'tolerance="0.050" merge_composites="0">\n'
+        '        <summary total="{total}" new="0" active="{total}" reviewed="0" '
+        'approved="0" resolved="0"/>\n'
+        "        <clashresults>\n"
+    ).format(idx=test_index + 1, total=total)
+
+
+def _clash_test_close():
+    return "        </clashresults>\n      </clashtest>\n"
+
+
+def _emit(f, text):
+    """Пишет текст с переносами Windows, возвращает число байт."""
+    data = text.replace("\n", "\r\n").encode("utf-8")
+    f.write(data)
+    return len(data)
+
+
+def write_report(path, spec=None, target_bytes=None):
+    """Пишет отчёт на диск и возвращает его размер в байтах.
+
+    При заданном target_bytes число результатов в проверках растёт,
+    пока файл не достигнет нужного размера.
+    """
+    spec = spec or ReportSpec()
+    rnd = random.Random(spec.seed)
+
+    with io.open(path, "wb") as f:
+        written = 0
+        if spec.bom:
+            f.write(b"\xef\xbb\xbf")
+            written = 3
+        written += _emit(f, HEADER)
+        test_index = 0
+        while True:
+            written += _emit(f, _clash_test_open(test_index, spec.results_per_test))
+            for result_index in range(spec.results_per_test):
+                written += _emit(f, _clash_result(rnd, spec, test_index, result_index))
+                if target_bytes and written >= target_bytes:
+                    break
+            written += _emit(f, _clash_test_close())
+            test_index += 1
+
+            if target_bytes:
+                if written >= target_bytes:
+                    break
+            elif test_index >= spec.tests:
+                break
+        written += _emit(f, FOOTER)
+
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Синтетический отчёт Navisworks")
+    parser.add_argument("path")
+    parser.add_argument("--tests", type=int, default=10)
+    parser.add_argument("--results", type=int, default=1000)
+    parser.add_argument("--objects", type=int, default=2)
+    parser.add_argument("--size-mb", type=float, default=None)
+    parser.add_argument("--dirty-rate", type=float, default=0.01)
+    parser.add_argument("--control-rate", type=float, default=0.005)
+    parser.add_argument("--no-snapshots", action="store_true")
+    parser.add_argument("--bom", action="store_true", help="UTF-8 BOM в начале файла")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    spec = ReportSpec(
+        tests=args.tests,
+        results_per_test=args.results,
+        objects_per_result=args.objects,
+        dirty_rate=args.dirty_rate,
+        control_rate=args.control_rate,
+        snapshots=not args.no_snapshots,
+        bom=args.bom,
+        seed=args.seed,
+    )
+    target = int(args.size_mb * 1024 * 1024) if args.size_mb else None
+    size = write_report(args.path, spec, target)
+    print("{}: {:.1f} МБ".format(args.path, size / 1024.0 / 1024.0))
+
+
+if __name__ == "__main__":
+    main()